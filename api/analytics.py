@@ -0,0 +1,102 @@
+import asyncio
+import numpy as np
+from api import crud
+from api.cache import table_version
+
+PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+DEFAULT_BINS = 20
+MAX_BINS = 200
+
+
+def summarize(values):
+    """
+    Summary statistics of the EBITDA column.
+
+    Input:
+        values (np.ndarray): EBITDA 2023 of the companies that have one, sorted ascending.
+
+    Output:
+        dict: count, total, mean, std, min, max and the PERCENTILES (None without values).
+    """
+    if not len(values):
+        return {
+            "count": 0, "total": 0.0, "mean": None, "std": None, "min": None, "max": None,
+            "percentiles": {str(p): None for p in PERCENTILES},
+        }
+
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        "count": int(len(values)),
+        "total": float(values.sum()),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values[0]),
+        "max": float(values[-1]),
+        "percentiles": {str(p): float(value) for p, value in zip(PERCENTILES, percentiles)},
+    }
+
+
+def histogram(values, bins=DEFAULT_BINS, low=None, high=None):
+    """
+    Counts the companies in `bins` buckets of equal width between low and high (the minimum and
+    maximum EBITDA by default). Values outside the range are left out.
+
+    Output:
+        list[dict]: One {"low", "high", "count"} per bucket.
+    """
+    if low is None:
+        low = float(values[0]) if len(values) else 0.0
+    if high is None:
+        high = float(values[-1]) if len(values) else 0.0
+    if high <= low:
+        high = low + 1.0
+
+    counts, edges = np.histogram(values, bins=bins, range=(low, high))
+    return [
+        {"low": float(edges[i]), "high": float(edges[i + 1]), "count": int(counts[i])}
+        for i in range(bins)
+    ]
+
+
+class EbitdaColumn:
+    """
+    The EBITDA column materialized as a sorted NumPy array, loaded once per table version.
+
+    Every analytics response is computed from this array, and the summary is kept until the
+    table changes, so repeated calls never go back to the database. Together with the ETags of
+    the endpoints an unchanged table serves them without any computation.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.values = np.empty(0)
+        self.summary = None
+        self.lock = asyncio.Lock()
+        self.stats = {"loads": 0}
+
+    async def current(self):
+        # While the table version is unknown the column is read every time
+        version = table_version.current
+        if version is not None and self.version == version:
+            return self.values
+
+        async with self.lock:
+            # Another request may have loaded this version while we waited
+            if version is None or self.version != version:
+                values = await crud.get_ebitda_values()
+                if values is None:
+                    raise RuntimeError("The EBITDA column could not be read")
+                self.values = np.asarray(values, dtype=np.float64)
+                self.summary = None
+                self.version = version
+                self.stats["loads"] += 1
+        return self.values
+
+    async def get_summary(self):
+        values = await self.current()
+        if self.summary is None:
+            self.summary = summarize(values)
+        return self.summary
+
+
+ebitda_column = EbitdaColumn()
@@ -0,0 +1,121 @@
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+
+
+async def read_response(reader):
+    """
+    Reads one HTTP/1.1 response from a keep-alive connection.
+
+    Input:
+        reader (asyncio.StreamReader): The connection.
+
+    Output:
+        tuple[int, bytes]: The status code and the body.
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        body = b""
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                return status, body
+            body += chunk[:-2]
+
+    return status, await reader.readexactly(int(headers.get("content-length", 0)))
+
+
+async def client(url, count, latencies, errors):
+    """
+    Sends `count` GET requests one after the other over a single keep-alive connection.
+    """
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    request = f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: keep-alive\r\n\r\n".encode()
+
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, _ = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def percentile_ms(latencies, percent):
+    if not latencies:
+        return 0.0
+    ordered = sorted(latencies)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index] * 1000
+
+
+async def run_benchmark(url, concurrency=50, requests=1000):
+    """
+    Runs `concurrency` clients in parallel against one URL of the API.
+
+    Input:
+        url (str): The endpoint, e.g. http://localhost:8000/companies/
+        concurrency (int): Number of simultaneous connections.
+        requests (int): Total number of requests, split between the connections.
+
+    Output:
+        dict: Requests sent, errors, elapsed seconds, requests per second and latency percentiles (ms).
+    """
+    latencies = []
+    errors = []
+    per_client = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(url, count, latencies, errors) for count in per_client if count))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile_ms(latencies, 50), 2),
+        "p95_ms": round(percentile_ms(latencies, 95), 2),
+        "p99_ms": round(percentile_ms(latencies, 99), 2),
+    }
+
+
+def main(argv=None):
+    """
+    Load benchmark of the API, e.g. against a local server started with
+    `uvicorn api.main:app --workers 1`:
+
+        python -m api.benchmark http://localhost:8000/companies/A46103834 --concurrency 200
+    """
+    parser = argparse.ArgumentParser(description="Measure the throughput of an API endpoint.")
+    parser.add_argument("url", help="Endpoint to request.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of simultaneous connections.")
+    parser.add_argument("--requests", type=int, default=1000, help="Total number of requests.")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_benchmark(args.url, args.concurrency, args.requests))
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
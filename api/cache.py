@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Clients may keep responses but must revalidate them; an unchanged table answers with a 304
+CACHE_CONTROL = "private, no-cache"
+
+
+class TableVersion:
+    """
+    Version of the companies table, as last read from the database.
+
+    The table triggers (see db/load_companies.py) increment the companies_version row once in
+    every transaction that changes the table, and send the new value in their notifications,
+    so every API process and every restart sees the same version for the same data. The epoch
+    of the row is drawn when it is created, which keeps a recreated database from reusing the
+    versions, and ETags, of the previous one. Until the version has been read it is unknown
+    and responses are sent without an ETag.
+    """
+
+    def __init__(self):
+        self.epoch = None
+        self.counter = None
+        self.lock = threading.Lock()
+
+    @property
+    def current(self):
+        if self.epoch is None:
+            return None
+        return f"{self.epoch}.{self.counter}"
+
+    def update(self, epoch, counter):
+        """
+        Moves to a version read from the database. Notifications and writes can arrive out
+        of order, so within one epoch the version never goes back.
+
+        Input:
+            epoch (str): The epoch of the companies_version row.
+            counter (int): Its version.
+
+        Output:
+            str: The current version.
+        """
+        with self.lock:
+            if epoch != self.epoch or counter > self.counter:
+                self.epoch, self.counter = epoch, counter
+            return self.current
+
+    def etag(self, key):
+        """
+        Strong ETag of one resource at the current version.
+
+        Input:
+            key (str): Identifies the resource, e.g. the CIF or the normalized query string.
+
+        Output:
+            str | None: The quoted ETag, None while the version is unknown.
+        """
+        version = self.current
+        if version is None:
+            return None
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return f'"{version}-{digest}"'
+
+
+class ResponseCache:
+    """
+    Small LRU of serialized response bodies by ETag. Entries of older versions are never hit
+    again, they are simply pushed out by the new ones.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"not_modified": 0, "hits": 0, "misses": 0}
+
+    def get(self, etag):
+        with self.lock:
+            entry = self.entries.get(etag)
+            if entry is not None:
+                self.entries.move_to_end(etag)
+            self.stats["hits" if entry is not None else "misses"] += 1
+            return entry
+
+    def put(self, etag, entry):
+        with self.lock:
+            self.entries[etag] = entry
+            self.entries.move_to_end(etag)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def count(self, outcome):
+        with self.lock:
+            self.stats[outcome] += 1
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Checks an If-None-Match header against an ETag ('*' and lists of ETags are accepted).
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+table_version = TableVersion()
+response_cache = ResponseCache()
@@ -1,91 +1,348 @@
-from db.connection import connect_to_database
-
-def get_companies():
-    conn = connect_to_database()
-    if conn:
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT * FROM companies")
-                companies = cursor.fetchall()
-                return companies
-        except Exception as error:
-            print(f"Error fetching companies: {error}")
-        finally:
-            conn.close()
-    return []
-
-def get_company_by_cif(cif: str):
-    conn = connect_to_database()
-    if conn:
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT * FROM companies WHERE CIF = %s", (cif,))
-                company = cursor.fetchone()
-                return company
-        except Exception as error:
-            print(f"Error fetching company: {error}")
-        finally:
-            conn.close()
+from decimal import Decimal
+from api.cache import table_version
+from api.pagination import SORTS
+from api.snapshot import COLUMNS, read_table_version, snapshot
+from db.async_connection import async_connection
+from metrics.registry import histogram
+from scrap_job.names import normalize_company_name
+
+# Connections are borrowed from the process-wide async pool. The pool commits the transaction
+# when the block ends and rolls it back if the block raises. Every write reads the table
+# version, incremented by the table triggers in its transaction, and moves to it after the
+# commit, which invalidates the ETags of the read endpoints.
+#
+# When the in-memory snapshot is enabled (API_SNAPSHOT=1) and loaded, lookups by CIF and
+# EBITDA-sorted pages are read from it, and writes are applied to it right after the commit
+# so that this process reads its own writes before the table notification arrives.
+
+QUERY_SECONDS = histogram("db_query_seconds", "Time of the database queries of the API, by operation.", ("operation",))
+
+async def execute(conn, operation, *args):
+    with QUERY_SECONDS.time(operation=operation):
+        return await conn.execute(*args)
+
+def table_changed(version):
+    """
+    Moves this process to the table version read in the transaction of a committed write,
+    before the notification of the change arrives.
+    """
+    if version is not None:
+        table_version.update(*version)
+
+async def get_companies(limit=None, after=None, sort="cif", ebitda_min=None, ebitda_max=None, name_prefix=None):
+    """
+    Reads one page of companies with keyset pagination: the page starts right after the
+    (sort value, cif) pair `after` instead of skipping rows with OFFSET, so every page costs
+    the same index range scan however deep it is.
+
+    Input:
+        limit (int | None): Maximum number of rows, None for all of them.
+        after (tuple | None): (sort value, cif) of the last row of the previous page.
+        sort (str): One of api.pagination.SORTS.
+        ebitda_min (float | None): Minimum EBITDA 2023.
+        ebitda_max (float | None): Maximum EBITDA 2023.
+        name_prefix (str | None): Beginning of the company name.
+
+    Output:
+        list[tuple]: The rows, in the companies table column order.
+
+    Raises:
+        RuntimeError: If the table could not be read.
+    """
+    column, direction = SORTS[sort]
+    if snapshot.ready and column == "ebitda_2023" and not name_prefix:
+        return snapshot.page_by_ebitda(limit, after, direction == "DESC", ebitda_min, ebitda_max)
+
+    conditions = []
+    params = []
+
+    if column == "ebitda_2023":
+        # Companies without EBITDA have no position in an EBITDA ranking
+        conditions.append("ebitda_2023 IS NOT NULL")
+    # Bounds arrive as floats, which would be bound as float8: 'numeric >= float8' casts the
+    # column, and the EBITDA index could not serve the range
+    if ebitda_min is not None:
+        conditions.append("ebitda_2023 >= %s")
+        params.append(Decimal(str(ebitda_min)))
+    if ebitda_max is not None:
+        conditions.append("ebitda_2023 <= %s")
+        params.append(Decimal(str(ebitda_max)))
+    if name_prefix:
+        escaped = name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("company_name LIKE %s")
+        params.append(escaped + "%")
+    if after is not None:
+        operator = ">" if direction == "ASC" else "<"
+        if column == "cif":
+            conditions.append(f"cif {operator} %s")
+            params.append(after[1])
+        else:
+            conditions.append(f"({column}, cif) {operator} (%s, %s)")
+            params.extend(after)
+
+    query = f"SELECT {COLUMNS} FROM companies"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {column} {direction}" + ("" if column == "cif" else f", cif {direction}")
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    try:
+        async with async_connection() as conn:
+            cursor = await execute(conn, "get_companies", query, params)
+            companies = await cursor.fetchall()
+            return companies
+    except Exception as error:
+        print(f"Error fetching companies: {error}")
+        raise RuntimeError("The companies could not be read") from error
+
+async def stream_companies(batch_size):
+    """
+    Reads the whole table through a server-side cursor, batch_size rows at a time, so that
+    only one batch is in memory however large the table is.
+
+    Input:
+        batch_size (int): Number of rows fetched per round trip.
+
+    Output:
+        async iterator[list[tuple]]: Batches of rows ordered by CIF.
+    """
+    async with async_connection() as conn:
+        async with conn.cursor(name="companies_export") as cursor:
+            with QUERY_SECONDS.time(operation="stream_companies"):
+                await cursor.execute(f"SELECT {COLUMNS} FROM companies ORDER BY cif")
+            while rows := await cursor.fetchmany(batch_size):
+                yield rows
+
+async def search_companies(query, limit=10):
+    """
+    Finds companies by name: names that start with the query first, then names similar to it
+    (trigram similarity, so typos and missing words still match). Both sides are compared as
+    normalized by normalize_company_name(), which makes the search accent and case insensitive
+    and treats 'S.A.U.' and 'Sociedad Anonima' as 'SA'. Served by the companies_search_key
+    indexes created by db/load_companies.py.
+
+    Input:
+        query (str): The name, or part of it, typed by the user.
+        limit (int): Maximum number of results.
+
+    Output:
+        list[tuple]: The rows, in the companies table column order, followed by their score
+        (the similarity, plus 1 for a prefix match), best first.
+
+    Raises:
+        RuntimeError: If the table could not be read.
+    """
+    key = normalize_company_name(query)
+    if not key:
+        return []
+
+    try:
+        async with async_connection() as conn:
+            cursor = await execute(
+                conn, "search_companies",
+                f"""
+                SELECT {COLUMNS}, score FROM (
+                    SELECT *,
+                        similarity(companies_search_key(company_name), %(key)s)
+                        + CASE WHEN companies_search_key(company_name) LIKE %(prefix)s THEN 1 ELSE 0 END AS score
+                    FROM companies
+                    WHERE companies_search_key(company_name) LIKE %(prefix)s
+                       OR companies_search_key(company_name) %% %(key)s
+                ) AS matches
+                ORDER BY score DESC, cif
+                LIMIT %(limit)s
+                """,
+                # A normalized name has no LIKE wildcards to escape
+                {"key": key, "prefix": key + "%", "limit": limit}
+            )
+            return await cursor.fetchall()
+    except Exception as error:
+        print(f"Error searching companies: {error}")
+        raise RuntimeError("The companies could not be searched") from error
+
+async def get_ebitda_values():
+    """
+    Reads the EBITDA 2023 of every company that has one, sorted ascending, for the analytics.
+
+    Output:
+        list[float] | None: The values, or None if they could not be read.
+    """
+    if snapshot.ready:
+        return [ebitda for ebitda, _ in snapshot.by_ebitda]
+
+    try:
+        async with async_connection() as conn:
+            cursor = await execute(
+                conn, "get_ebitda_values",
+                "SELECT ebitda_2023::float8 FROM companies WHERE ebitda_2023 IS NOT NULL ORDER BY ebitda_2023"
+            )
+            return [row[0] for row in await cursor.fetchall()]
+    except Exception as error:
+        print(f"Error fetching EBITDA values: {error}")
     return None
 
-def delete_company_by_cif(cif: str):
-    conn = connect_to_database()
-    if conn:
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute("DELETE FROM companies WHERE CIF = %s", (cif,))
-                conn.commit()
-                return True
-        except Exception as error:
-            print(f"Error deleting company: {error}")
-            conn.rollback()
-        finally:
-            conn.close()
+async def get_company_by_cif(cif: str):
+    if snapshot.ready:
+        return snapshot.get(cif)
+
+    try:
+        async with async_connection() as conn:
+            cursor = await execute(
+                conn, "get_company_by_cif", f"SELECT {COLUMNS} FROM companies WHERE CIF = %s", (cif,)
+            )
+            company = await cursor.fetchone()
+            return company
+    except Exception as error:
+        print(f"Error fetching company: {error}")
+        raise RuntimeError("The company could not be read") from error
+
+async def delete_company_by_cif(cif: str):
+    try:
+        async with async_connection() as conn:
+            await execute(conn, "delete_company_by_cif", "DELETE FROM companies WHERE CIF = %s", (cif,))
+            version = await read_table_version(conn)
+        if snapshot.ready:
+            snapshot.remove(cif)
+        table_changed(version)
+        return True
+    except Exception as error:
+        print(f"Error deleting company: {error}")
     return False
 
-def update_company_by_cif(cif: str, company_name: str, ebitda_source: str, cif_source: str, ebitda_2023: float):
-    conn = connect_to_database()
-    if conn:
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    """
-                    UPDATE companies
-                    SET company_name = %s,
-                        ebitda_source = %s,
-                        cif_source = %s,
-                        ebitda_2023 = %s
-                    WHERE CIF = %s
-                    """,
-                    (company_name, ebitda_source, cif_source, ebitda_2023, cif)
-                )
-                conn.commit()
-                return True
-        except Exception as error:
-            print(f"Error updating company: {error}")
-            conn.rollback()
-        finally:
-            conn.close()
+async def update_company_by_cif(cif: str, company_name: str, ebitda_source: str, cif_source: str, ebitda_2023: float):
+    try:
+        async with async_connection() as conn:
+            cursor = await execute(
+                conn, "update_company_by_cif",
+                """
+                UPDATE companies
+                SET company_name = %s,
+                    ebitda_source = %s,
+                    cif_source = %s,
+                    ebitda_2023 = %s
+                WHERE CIF = %s
+                """,
+                (company_name, ebitda_source, cif_source, ebitda_2023, cif)
+            )
+            version = await read_table_version(conn)
+        if snapshot.ready and cursor.rowcount:
+            snapshot.upsert((company_name, ebitda_source, cif_source, cif, ebitda_2023))
+        table_changed(version)
+        return True
+    except Exception as error:
+        print(f"Error updating company: {error}")
     return False
 
-def create_company(company_name: str, ebitda_source: str | None, cif_source: str | None, cif: str, ebitda_2023: float | None):
-    conn = connect_to_database()
-    if conn:
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    """
-                    INSERT INTO companies (company_name, ebitda_source, cif_source, cif, ebitda_2023)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    (company_name, ebitda_source, cif_source, cif, ebitda_2023)
-                )
-                conn.commit()
-                print("Company created successfully!")
-                return True
-        except Exception as error:
-            print(f"Error creating company: {error}")
-            conn.rollback()
-        finally:
-            conn.close()
-    return False
\ No newline at end of file
+async def create_company(company_name: str, ebitda_source: str | None, cif_source: str | None, cif: str, ebitda_2023: float | None):
+    try:
+        async with async_connection() as conn:
+            await execute(
+                conn, "create_company",
+                """
+                INSERT INTO companies (company_name, ebitda_source, cif_source, cif, ebitda_2023)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (company_name, ebitda_source, cif_source, cif, ebitda_2023)
+            )
+            version = await read_table_version(conn)
+        if snapshot.ready:
+            snapshot.upsert((company_name, ebitda_source, cif_source, cif, ebitda_2023))
+        table_changed(version)
+        return True
+    except Exception as error:
+        print(f"Error creating company: {error}")
+    return False
+
+# Batch operations send every company in one statement, as arrays expanded with unnest(), and
+# commit once. They return the outcome of each CIF, or None if the transaction failed.
+
+def batch_arrays(companies):
+    """
+    Turns rows (company_name, ebitda_source, cif_source, cif, ebitda_2023) into one list per
+    column. A CIF sent twice keeps its last row.
+    """
+    rows = list({row[3]: row for row in companies}.values())
+    return rows, [list(column) for column in zip(*rows)] if rows else [[], [], [], [], []]
+
+async def create_companies(companies):
+    rows, columns = batch_arrays(companies)
+    try:
+        async with async_connection() as conn:
+            cursor = await execute(
+                conn, "create_companies",
+                """
+                INSERT INTO companies (company_name, ebitda_source, cif_source, cif, ebitda_2023)
+                SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[], %s::numeric[])
+                ON CONFLICT (cif) DO NOTHING
+                RETURNING cif
+                """,
+                columns
+            )
+            created = {row[0] for row in await cursor.fetchall()}
+            version = await read_table_version(conn)
+    except Exception as error:
+        print(f"Error creating companies: {error}")
+        return None
+
+    if snapshot.ready:
+        for row in rows:
+            if row[3] in created:
+                snapshot.upsert(row)
+    if created:
+        table_changed(version)
+    return {row[3]: "created" if row[3] in created else "exists" for row in rows}
+
+async def update_companies(companies):
+    rows, columns = batch_arrays(companies)
+    try:
+        async with async_connection() as conn:
+            cursor = await execute(
+                conn, "update_companies",
+                """
+                UPDATE companies
+                SET company_name = batch.company_name,
+                    ebitda_source = batch.ebitda_source,
+                    cif_source = batch.cif_source,
+                    ebitda_2023 = batch.ebitda_2023
+                FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[], %s::numeric[])
+                    AS batch (company_name, ebitda_source, cif_source, cif, ebitda_2023)
+                WHERE companies.cif = batch.cif
+                RETURNING companies.cif
+                """,
+                columns
+            )
+            updated = {row[0] for row in await cursor.fetchall()}
+            version = await read_table_version(conn)
+    except Exception as error:
+        print(f"Error updating companies: {error}")
+        return None
+
+    if snapshot.ready:
+        for row in rows:
+            if row[3] in updated:
+                snapshot.upsert(row)
+    if updated:
+        table_changed(version)
+    return {row[3]: "updated" if row[3] in updated else "not_found" for row in rows}
+
+async def delete_companies(cifs):
+    cifs = list(dict.fromkeys(cifs))
+    try:
+        async with async_connection() as conn:
+            cursor = await execute(
+                conn, "delete_companies", "DELETE FROM companies WHERE cif = ANY(%s) RETURNING cif", (cifs,)
+            )
+            deleted = {row[0] for row in await cursor.fetchall()}
+            version = await read_table_version(conn)
+    except Exception as error:
+        print(f"Error deleting companies: {error}")
+        return None
+
+    if snapshot.ready:
+        for cif in deleted:
+            snapshot.remove(cif)
+    if deleted:
+        table_changed(version)
+    return {cif: "deleted" if cif in deleted else "not_found" for cif in cifs}
@@ -0,0 +1,63 @@
+import io
+import csv
+import json
+import zlib
+from decimal import Decimal
+
+EXPORT_BATCH_SIZE = 2000
+
+CSV_HEADER = ["company_name", "ebitda_source", "cif_source", "cif", "ebitda_2023"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def json_value(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+async def ndjson_chunks(batches):
+    """
+    Serializes batches of rows as newline-delimited JSON, one chunk per batch.
+
+    Input:
+        batches (async iterable[list[tuple]]): Rows in the companies table column order.
+
+    Output:
+        async iterator[bytes]: The encoded chunks.
+    """
+    async for rows in batches:
+        lines = [
+            json.dumps(dict(zip(CSV_HEADER, map(json_value, row))), ensure_ascii=False)
+            for row in rows
+        ]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def csv_chunks(batches):
+    """
+    Serializes batches of rows as CSV: the header first, then one chunk per batch.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue().encode()
+
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+async def gzip_chunks(chunks):
+    """
+    Compresses a stream of chunks as one gzip member. Every chunk is flushed right away so the
+    client receives data while the export goes on.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
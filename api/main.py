@@ -1,12 +1,48 @@
 import os
+from typing import Literal
+from urllib.parse import urlencode
+from contextlib import asynccontextmanager
+from pydantic import TypeAdapter
 from . import crud, schemas
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from .analytics import DEFAULT_BINS, MAX_BINS, ebitda_column, histogram
+from .cache import CACHE_CONTROL, etag_matches, response_cache, table_version
+from .instrumentation import PROMETHEUS_MEDIA_TYPE, RequestMetricsMiddleware
+from .export import EXPORT_BATCH_SIZE, MEDIA_TYPES, csv_chunks, gzip_chunks, ndjson_chunks
+from .snapshot import ChangeListener, SnapshotSync, snapshot, snapshot_enabled
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, SORTS, decode_cursor, encode_cursor
+from db.async_connection import close_async_pool, open_async_pool
+from metrics.registry import registry
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Database connections are opened once and shared by all the requests
+    await open_async_pool()
+    # The table version, which the ETags are built from, is read from the database and then
+    # taken from the notification of every change; with the snapshot, the changed rows are
+    # also reloaded into it
+    options = {
+        "on_change": table_version.update,
+        "mode": os.getenv("API_SNAPSHOT_MODE", "listen"),
+        "poll_interval": float(os.getenv("API_SNAPSHOT_POLL_INTERVAL", "30")),
+    }
+    if snapshot_enabled():
+        sync = SnapshotSync(snapshot, **options)
+    else:
+        sync = ChangeListener(**options)
+    sync.start()
+    yield
+    await sync.stop()
+    await close_async_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+
+MAX_BATCH_SIZE = 10000
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -20,49 +56,260 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+app.add_middleware(RequestMetricsMiddleware)
+
+COMPANY_LIST = TypeAdapter(list[schemas.Company])
+SEARCH_RESULTS = TypeAdapter(list[schemas.SearchResult])
+HISTOGRAM = TypeAdapter(list[schemas.HistogramBucket])
+
+
+def company_from_row(row):
+    return schemas.Company(
+        company_name=row[0],
+        ebitda_source=row[1],
+        cif_source=row[2],
+        cif=row[3],
+        ebitda_2023=row[4]
+    )
+
+
+async def cached_json(request: Request, key: str, build):
+    """
+    Answers a read request from the table version: a client that already holds the current
+    version gets a 304, and a body serialized earlier for this version is sent again as is.
+    Only a new version runs build(), which queries the database and returns (body, headers).
+    While the version has not been read from the database yet, nothing is cached.
+    """
+    etag = table_version.etag(key)
+    if etag is None:
+        body, extra_headers = await build()
+        return Response(content=body, media_type="application/json", headers=extra_headers)
+
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.count("not_modified")
+        return Response(status_code=304, headers=headers)
+
+    entry = response_cache.get(etag)
+    if entry is None:
+        entry = await build()
+        response_cache.put(etag, entry)
+
+    body, extra_headers = entry
+    return Response(content=body, media_type="application/json", headers={**headers, **extra_headers})
+
+
+async def available(read, *args, **kwargs):
+    """
+    Runs a read of the table, or of the EBITDA column, for build(). A read that failed answers
+    503 by raising, so that nothing is cached for the version and the next request tries again.
+    """
+    try:
+        return await read(*args, **kwargs)
+    except RuntimeError as error:
+        raise HTTPException(status_code=503, detail=str(error))
+
+
+@app.get("/metrics")
+def read_metrics():
+    # Request latencies, database query and pool wait times of this process, for Prometheus
+    return Response(content=registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
 
 @app.get("/companies/", response_model=list[schemas.Company])
-def read_companies():
-    companies = crud.get_companies()
-    if companies:
-        return [
-            schemas.Company(
-                company_name=c[0],
-                ebitda_source=c[1],
-                cif_source=c[2],
-                cif=c[3],
-                ebitda_2023=c[4]
-            )
-            for c in companies
+async def read_companies(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    sort: Literal[tuple(SORTS)] = "cif",
+    ebitda_min: float | None = None,
+    ebitda_max: float | None = None,
+    name_prefix: str | None = None,
+):
+    # When there are more rows, the cursor of the next page is sent in the X-Next-Cursor header
+    # so that the body keeps being a plain list of companies
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort)
+        except ValueError as error:
+            raise HTTPException(status_code=400, detail=str(error))
+
+    async def build():
+        companies = await available(
+            crud.get_companies,
+            limit=limit + 1,
+            after=after,
+            sort=sort,
+            ebitda_min=ebitda_min,
+            ebitda_max=ebitda_max,
+            name_prefix=name_prefix,
+        )
+        headers = {}
+        if len(companies) > limit:
+            companies = companies[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(sort, companies[-1])
+        return COMPANY_LIST.dump_json([company_from_row(c) for c in companies]), headers
+
+    key = "companies?" + urlencode(sorted(request.query_params.multi_items()))
+    return await cached_json(request, key, build)
+
+
+async def logged_stream(chunks):
+    # The status line is already sent when a streamed export fails, the error can only be logged
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as error:
+        print(f"Error exporting companies: {error}")
+        raise
+
+
+def batch_result(outcomes):
+    counts = {}
+    for status in outcomes.values():
+        counts[status] = counts.get(status, 0) + 1
+    return schemas.BatchResult(
+        results=[schemas.BatchItemResult(cif=cif, status=status) for cif, status in outcomes.items()],
+        counts=counts,
+    )
+
+
+def check_batch_size(items):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"A batch holds at most {MAX_BATCH_SIZE} companies")
+
+
+def company_row(company):
+    return (company.company_name, company.ebitda_source, company.cif_source, company.cif, company.ebitda_2023)
+
+
+# The batch routes, the search and the export are declared before /companies/{cif}, which
+# would otherwise take 'batch', 'search' or 'export' for a CIF. Each batch is one statement and
+# one commit.
+@app.post("/companies/batch", response_model=schemas.BatchResult)
+async def create_companies(companies: list[schemas.Company]):
+    check_batch_size(companies)
+    outcomes = await crud.create_companies([company_row(company) for company in companies])
+    if outcomes is None:
+        raise HTTPException(status_code=400, detail="Companies could not be created")
+    return batch_result(outcomes)
+
+
+@app.put("/companies/batch", response_model=schemas.BatchResult)
+async def update_companies(companies: list[schemas.Company]):
+    check_batch_size(companies)
+    outcomes = await crud.update_companies([company_row(company) for company in companies])
+    if outcomes is None:
+        raise HTTPException(status_code=400, detail="Companies could not be updated")
+    return batch_result(outcomes)
+
+
+@app.delete("/companies/batch", response_model=schemas.BatchResult)
+async def delete_companies(cifs: list[str] = Body(...)):
+    check_batch_size(cifs)
+    outcomes = await crud.delete_companies(cifs)
+    if outcomes is None:
+        raise HTTPException(status_code=400, detail="Companies could not be deleted")
+    return batch_result(outcomes)
+
+
+@app.get("/companies/search", response_model=list[schemas.SearchResult])
+async def search_companies(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=100),
+):
+    async def build():
+        rows = await available(crud.search_companies, q, limit)
+        results = [
+            schemas.SearchResult(**company_from_row(row).model_dump(), score=round(float(row[5]), 4))
+            for row in rows
         ]
-    return []
+        return SEARCH_RESULTS.dump_json(results), {}
 
+    key = "search?" + urlencode(sorted(request.query_params.multi_items()))
+    return await cached_json(request, key, build)
 
-@app.get("/companies/{cif}", response_model=schemas.Company)
-def read_company(cif: str):
-    company = crud.get_company_by_cif(cif)
-    if company:
-        return schemas.Company(
-            company_name=company[0],
-            ebitda_source=company[1],
-            cif_source=company[2],
-            cif=company[3],
-            ebitda_2023=company[4]
+
+@app.get("/companies/export")
+async def export_companies(format: Literal["ndjson", "csv"] = "ndjson", gzip: bool = False):
+    batches = crud.stream_companies(EXPORT_BATCH_SIZE)
+    chunks = ndjson_chunks(batches) if format == "ndjson" else csv_chunks(batches)
+    headers = {"Content-Disposition": f'attachment; filename="companies.{format}"'}
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(logged_stream(chunks), media_type=MEDIA_TYPES[format], headers=headers)
+
+
+# Analytics are computed from the EBITDA column materialized once per table version, and their
+# responses are cached by ETag like the other reads: a repeated call costs a dictionary lookup.
+@app.get("/analytics/summary", response_model=schemas.EbitdaSummary)
+async def read_ebitda_summary(request: Request):
+    async def build():
+        summary = await available(ebitda_column.get_summary)
+        return schemas.EbitdaSummary(**summary).model_dump_json().encode(), {}
+
+    return await cached_json(request, "analytics/summary", build)
+
+
+@app.get("/analytics/histogram", response_model=list[schemas.HistogramBucket])
+async def read_ebitda_histogram(
+    request: Request,
+    bins: int = Query(DEFAULT_BINS, ge=1, le=MAX_BINS),
+    low: float | None = None,
+    high: float | None = None,
+):
+    async def build():
+        buckets = histogram(await available(ebitda_column.current), bins, low, high)
+        return HISTOGRAM.dump_json([schemas.HistogramBucket(**bucket) for bucket in buckets]), {}
+
+    key = "analytics/histogram?" + urlencode(sorted(request.query_params.multi_items()))
+    return await cached_json(request, key, build)
+
+
+@app.get("/analytics/top", response_model=list[schemas.Company])
+async def read_ebitda_ranking(
+    request: Request,
+    n: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    order: Literal["desc", "asc"] = "desc",
+):
+    async def build():
+        # The EBITDA index (or the snapshot) gives the ranking without sorting the table
+        companies = await available(
+            crud.get_companies, limit=n, sort="-ebitda_2023" if order == "desc" else "ebitda_2023"
         )
-    raise HTTPException(status_code=404, detail="Company not found")
+        return COMPANY_LIST.dump_json([company_from_row(c) for c in companies]), {}
+
+    key = "analytics/top?" + urlencode(sorted(request.query_params.multi_items()))
+    return await cached_json(request, key, build)
+
+
+@app.get("/companies/{cif}", response_model=schemas.Company)
+async def read_company(request: Request, cif: str):
+    async def build():
+        company = await available(crud.get_company_by_cif, cif)
+        if company:
+            return company_from_row(company).model_dump_json().encode(), {}
+        raise HTTPException(status_code=404, detail="Company not found")
+
+    return await cached_json(request, f"company/{cif}", build)
 
 
 @app.delete("/companies/{cif}")
-def delete_company(cif: str):
-    if crud.delete_company_by_cif(cif):
+async def delete_company(cif: str):
+    if await crud.delete_company_by_cif(cif):
         return {"message": f"Company with CIF {cif} deleted successfully"}
     raise HTTPException(status_code=404, detail="Company not found")
 
 
 @app.put("/companies/{cif}", response_model=schemas.Company)
-def update_company(cif: str, company: schemas.Company):
-    if crud.update_company_by_cif(
+async def update_company(cif: str, company: schemas.Company):
+    if await crud.update_company_by_cif(
         cif=cif,
         company_name=company.company_name,
         ebitda_source=company.ebitda_source,
@@ -74,10 +321,9 @@ def update_company(cif: str, company: schemas.Company):
 
 
 @app.post("/companies/", response_model=schemas.Company)
-def create_company(company: schemas.Company):
-    print("Received payload:", company.dict())
+async def create_company(company: schemas.Company):
     try:
-        if crud.create_company(
+        if await crud.create_company(
             company_name=company.company_name,
             ebitda_source=company.ebitda_source,
             cif_source=company.cif_source,
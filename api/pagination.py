@@ -0,0 +1,64 @@
+import json
+import base64
+from decimal import Decimal
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Sort option -> (column, direction). The CIF is always the tie-breaker, so that every row has
+# a unique position and a page boundary can be expressed as "after (value, cif)".
+SORTS = {
+    "cif": ("cif", "ASC"),
+    "-cif": ("cif", "DESC"),
+    "company_name": ("company_name", "ASC"),
+    "-company_name": ("company_name", "DESC"),
+    "ebitda_2023": ("ebitda_2023", "ASC"),
+    "-ebitda_2023": ("ebitda_2023", "DESC"),
+}
+
+
+def encode_cursor(sort, row):
+    """
+    Builds the opaque cursor of the page that follows `row`.
+
+    Input:
+        sort (str): The sort option of the request.
+        row (tuple): The last row of the page, in the companies table column order.
+
+    Output:
+        str: URL-safe cursor.
+    """
+    column, _ = SORTS[sort]
+    value = row[4] if column == "ebitda_2023" else row[0] if column == "company_name" else row[3]
+    if isinstance(value, (Decimal, float)):
+        # Sent as text so the database compares the exact NUMERIC value
+        value = str(value)
+    payload = json.dumps([sort, value, row[3]], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    """
+    Reads a cursor built by encode_cursor().
+
+    Input:
+        cursor (str): The cursor sent by the client.
+        sort (str): The sort option of the request; it must be the one the cursor was built for.
+
+    Output:
+        tuple: (sort value, cif) of the last row already returned.
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another sort order.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, cif = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if SORTS[sort][0] == "ebitda_2023":
+            value = Decimal(value)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if cursor_sort != sort or not isinstance(cif, str):
+        raise ValueError("The cursor does not match the sort order")
+    return value, cif
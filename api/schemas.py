@@ -8,4 +8,33 @@ class Company(BaseModel):
     ebitda_2023: float
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class BatchItemResult(BaseModel):
+    cif: str
+    status: str
+
+
+class BatchResult(BaseModel):
+    results: list[BatchItemResult]
+    counts: dict[str, int]
+
+
+class SearchResult(Company):
+    score: float
+
+
+class EbitdaSummary(BaseModel):
+    count: int
+    total: float
+    mean: float | None
+    std: float | None
+    min: float | None
+    max: float | None
+    percentiles: dict[str, float | None]
+
+
+class HistogramBucket(BaseModel):
+    low: float
+    high: float
+    count: int
@@ -0,0 +1,272 @@
+import os
+import json
+import asyncio
+from bisect import bisect_left, bisect_right, insort
+import psycopg
+from db.async_connection import async_connection, conninfo
+
+CHANNEL = "companies_changed"
+COLUMNS = "company_name, ebitda_source, cif_source, cif, ebitda_2023"
+VERSION_QUERY = "SELECT epoch, version FROM companies_version"
+
+
+async def read_table_version(conn):
+    """
+    Reads the version of the companies table, which the table triggers increment in every
+    transaction that changes it.
+
+    Input:
+        conn (AsyncConnection): An open connection.
+
+    Output:
+        tuple[str, int] | None: (epoch, version), None if the table has no version row.
+    """
+    cursor = await conn.execute(VERSION_QUERY)
+    return await cursor.fetchone()
+
+
+class CompanySnapshot:
+    """
+    In-memory copy of the companies table for the read endpoints.
+
+    Rows are kept as tuples in the table column order, in a dict by CIF (O(1) lookups), and the
+    companies that have an EBITDA are also kept in a list of (ebitda, cif) sorted with bisect,
+    which serves EBITDA-sorted keyset pages without a query. The EBITDA is stored as a float and
+    a CIF source equal to the EBITDA source shares the same string.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.by_ebitda = []
+        self.ready = False
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def compact(row):
+        company_name, ebitda_source, cif_source, cif, ebitda_2023 = row
+        if cif_source == ebitda_source:
+            cif_source = ebitda_source
+        ebitda_2023 = float(ebitda_2023) if ebitda_2023 is not None else None
+        return company_name, ebitda_source, cif_source, cif, ebitda_2023
+
+    def replace(self, rows):
+        """
+        Replaces the whole snapshot, e.g. after loading the table.
+        """
+        compacted = {}
+        for row in rows:
+            row = self.compact(row)
+            compacted[row[3]] = row
+        self.rows = compacted
+        self.by_ebitda = sorted((row[4], cif) for cif, row in compacted.items() if row[4] is not None)
+        self.ready = True
+
+    def upsert(self, row):
+        row = self.compact(row)
+        self.remove(row[3])
+        self.rows[row[3]] = row
+        if row[4] is not None:
+            insort(self.by_ebitda, (row[4], row[3]))
+
+    def remove(self, cif):
+        row = self.rows.pop(cif, None)
+        if row is not None and row[4] is not None:
+            index = bisect_left(self.by_ebitda, (row[4], cif))
+            if index < len(self.by_ebitda) and self.by_ebitda[index] == (row[4], cif):
+                del self.by_ebitda[index]
+
+    def get(self, cif):
+        return self.rows.get(cif)
+
+    def page_by_ebitda(self, limit, after=None, descending=False, ebitda_min=None, ebitda_max=None):
+        """
+        Same page as crud.get_companies() with an EBITDA sort, read from the sorted index.
+
+        Input:
+            limit (int | None): Maximum number of rows.
+            after (tuple | None): (ebitda, cif) of the last row of the previous page.
+            descending (bool): Highest EBITDA first.
+            ebitda_min (float | None): Minimum EBITDA 2023.
+            ebitda_max (float | None): Maximum EBITDA 2023.
+
+        Output:
+            list[tuple]: The rows, in the companies table column order.
+        """
+        keys = self.by_ebitda
+        # (value,) sorts before every (value, cif) key and (value, "\uffff") after them
+        start = 0 if ebitda_min is None else bisect_left(keys, (float(ebitda_min),))
+        end = len(keys) if ebitda_max is None else bisect_right(keys, (float(ebitda_max), "\uffff"))
+
+        if descending:
+            if after is not None:
+                end = min(end, bisect_left(keys, (float(after[0]), after[1])))
+            indexes = range(end - 1, start - 1, -1)
+        else:
+            if after is not None:
+                start = max(start, bisect_right(keys, (float(after[0]), after[1])))
+            indexes = range(start, end)
+
+        if limit is not None:
+            indexes = indexes[:limit]
+        return [self.rows[keys[index][1]] for index in indexes]
+
+
+class SnapshotSync:
+    """
+    Keeps a CompanySnapshot in step with the database.
+
+    The table triggers (see db/load_companies.py) send a notification with the CIF and the
+    new table version of every inserted, updated or deleted row. The listener collects them in small batches and reloads
+    only those CIFs; a TRUNCATE or a very large batch (a bulk load) reloads the whole table.
+    Every API process listens, so all of them converge on the same data. If notifications are
+    not available the snapshot is reloaded every poll_interval seconds instead.
+    """
+
+    def __init__(self, snapshot, on_change=None, mode="listen", poll_interval=30.0,
+                 batch_window=0.05, reload_threshold=1000):
+        self.snapshot = snapshot
+        self.on_change = on_change
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.batch_window = batch_window
+        self.reload_threshold = reload_threshold
+        self.task = None
+        self.stats = {"reloads": 0, "notifications": 0}
+
+    async def reload(self):
+        async with async_connection() as conn:
+            # The rows and the version are read from the same snapshot of the database
+            await conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            version = await read_table_version(conn)
+            cursor = await conn.execute(f"SELECT {COLUMNS} FROM companies")
+            rows = await cursor.fetchall()
+        self.snapshot.replace(rows)
+        self.stats["reloads"] += 1
+        self.changed(version)
+
+    def changed(self, version):
+        """
+        Passes the (epoch, version) of the table to on_change, if it is known.
+        """
+        if self.on_change is not None and version is not None:
+            self.on_change(*version)
+
+    async def apply(self, payloads):
+        """
+        Applies a batch of notification payloads to the snapshot.
+
+        Input:
+            payloads (list[str]): JSON payloads {"op": ..., "cif": ..., "old_cif": ...,
+                                  "epoch": ..., "version": ...}.
+
+        Output:
+            None
+        """
+        self.stats["notifications"] += len(payloads)
+        events = [json.loads(payload) for payload in payloads]
+        if len(events) > self.reload_threshold or any(event["op"] == "TRUNCATE" for event in events):
+            await self.reload()
+            return
+
+        cifs = set()
+        for event in events:
+            cifs.add(event["cif"])
+            if event.get("old_cif"):
+                cifs.add(event["old_cif"])
+
+        async with async_connection() as conn:
+            cursor = await conn.execute(f"SELECT {COLUMNS} FROM companies WHERE cif = ANY(%s)", (list(cifs),))
+            rows = await cursor.fetchall()
+
+        # CIFs that are not in the table anymore were deleted
+        for cif in cifs - {row[3] for row in rows}:
+            self.snapshot.remove(cif)
+        for row in rows:
+            self.snapshot.upsert(row)
+        self.changed(latest_version(events))
+
+    async def listen(self):
+        conn = await psycopg.AsyncConnection.connect(conninfo(), autocommit=True)
+        async with conn:
+            await conn.execute(f"LISTEN {CHANNEL}")
+            # Loaded after LISTEN, so that no change is missed in between
+            await self.reload()
+            while True:
+                batch = [notify.payload async for notify in conn.notifies(stop_after=1)]
+                batch += [
+                    notify.payload
+                    async for notify in conn.notifies(timeout=self.batch_window, stop_after=self.reload_threshold)
+                ]
+                if len(batch) > self.reload_threshold:
+                    # A bulk change: its remaining notifications are dropped, the reload made
+                    # after them covers every row
+                    while [notify async for notify in conn.notifies(timeout=self.batch_window, stop_after=10000)]:
+                        pass
+                await self.apply(batch)
+
+    async def run(self):
+        while True:
+            if self.mode == "listen":
+                try:
+                    await self.listen()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    print(f"Companies snapshot notifications unavailable, polling instead: {error}")
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                print(f"Error reloading the companies snapshot: {error}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+class ChangeListener(SnapshotSync):
+    """
+    Follows the table version announced by the table triggers, for the API processes that run
+    without a snapshot: rows written outside the API (the loader, the scraper's database sink)
+    then change the ETags and leave the cached responses too. Without notifications the
+    version is read again every poll_interval seconds.
+    """
+
+    def __init__(self, on_change, mode="listen", poll_interval=30.0, batch_window=0.05):
+        super().__init__(None, on_change, mode, poll_interval, batch_window)
+
+    async def reload(self):
+        async with async_connection() as conn:
+            version = await read_table_version(conn)
+        self.stats["reloads"] += 1
+        self.changed(version)
+
+    async def apply(self, payloads):
+        self.stats["notifications"] += len(payloads)
+        self.changed(latest_version([json.loads(payload) for payload in payloads]))
+
+
+def latest_version(events):
+    """
+    (epoch, version) of the last of a batch of notifications: they arrive in commit order.
+    """
+    return events[-1]["epoch"], events[-1]["version"]
+
+
+snapshot = CompanySnapshot()
+
+
+def snapshot_enabled():
+    return os.getenv("API_SNAPSHOT", "0").lower() in ("1", "true", "yes")
@@ -0,0 +1,92 @@
+import json
+import asyncio
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, patch
+from api.analytics import EbitdaColumn, histogram, summarize
+from api.cache import table_version
+from api.main import read_ebitda_histogram, read_ebitda_summary
+from api.tests.test_main import make_request, table_changed
+
+VALUES = [-5.0, 10.0, 20.0, 30.0, 145.0]
+
+
+@pytest.fixture(autouse=True)
+def new_table_version():
+    table_changed()
+
+
+def test_summarize():
+    summary = summarize(np.array(VALUES))
+
+    assert summary["count"] == 5
+    assert summary["total"] == 200.0
+    assert summary["mean"] == 40.0
+    assert (summary["min"], summary["max"]) == (-5.0, 145.0)
+    assert summary["percentiles"]["50"] == 20.0
+
+
+def test_summarize_without_values():
+    summary = summarize(np.empty(0))
+
+    assert summary["count"] == 0
+    assert summary["mean"] is None
+    assert summary["percentiles"]["99"] is None
+
+
+def test_histogram():
+    buckets = histogram(np.array(VALUES), bins=3, low=0, high=30)
+
+    # -5 and 145 are out of the range, 30 falls in the last bucket
+    assert [bucket["count"] for bucket in buckets] == [0, 1, 2]
+    assert buckets[1] == {"low": 10.0, "high": 20.0, "count": 1}
+
+
+@patch("api.analytics.crud.get_ebitda_values", new_callable=AsyncMock)
+def test_column_is_loaded_once_per_table_version(mock_get_ebitda_values):
+    mock_get_ebitda_values.return_value = VALUES
+    column = EbitdaColumn()
+
+    async def read_twice():
+        await column.get_summary()
+        return await column.get_summary()
+
+    assert asyncio.run(read_twice())["count"] == 5
+    assert mock_get_ebitda_values.await_count == 1
+
+    table_changed()
+    mock_get_ebitda_values.return_value = VALUES[:2]
+
+    assert asyncio.run(column.get_summary())["count"] == 2
+    assert column.stats["loads"] == 2
+
+
+@patch("api.analytics.crud.get_ebitda_values", new_callable=AsyncMock)
+def test_summary_endpoint_is_cached(mock_get_ebitda_values):
+    mock_get_ebitda_values.return_value = VALUES
+
+    first = asyncio.run(read_ebitda_summary(make_request()))
+    second = asyncio.run(read_ebitda_summary(make_request(headers={"If-None-Match": first.headers["ETag"]})))
+
+    assert json.loads(first.body)["total"] == 200.0
+    assert second.status_code == 304
+
+
+@patch("api.analytics.crud.get_ebitda_values", new_callable=AsyncMock)
+def test_histogram_endpoint(mock_get_ebitda_values):
+    mock_get_ebitda_values.return_value = VALUES
+
+    response = asyncio.run(read_ebitda_histogram(make_request("bins=2"), bins=2, low=None, high=None))
+
+    assert [bucket["count"] for bucket in json.loads(response.body)] == [4, 1]
+
+
+@patch("api.analytics.crud.get_ebitda_values", new_callable=AsyncMock)
+def test_unreadable_column(mock_get_ebitda_values):
+    mock_get_ebitda_values.return_value = None
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_ebitda_summary(make_request()))
+
+    assert error.value.status_code == 503
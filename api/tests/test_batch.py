@@ -0,0 +1,115 @@
+import asyncio
+import itertools
+import pytest
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock, patch
+from api import crud, schemas
+from api.cache import table_version
+from api.main import create_companies, delete_companies, update_companies
+
+MERCADONA = ("MERCADONA SA", "http://example.com/m", "http://example.com/m", "A46103834", 1956941000.0)
+SEAT = ("SEAT SA", "http://example.com/s", "http://example.com/s", "A28049161", 1111000000.0)
+VERSIONS = itertools.count(1)
+
+
+def mock_connection(returned_cifs):
+    conn = MagicMock()
+    cursor = MagicMock()
+    cursor.fetchall = AsyncMock(return_value=[(cif,) for cif in returned_cifs])
+    # The table version read after the write
+    cursor.fetchone = AsyncMock(return_value=("batch", next(VERSIONS)))
+    conn.execute = AsyncMock(return_value=cursor)
+
+    @asynccontextmanager
+    async def connection():
+        yield conn
+
+    return connection, conn
+
+
+def company(row):
+    return schemas.Company(company_name=row[0], ebitda_source=row[1], cif_source=row[2], cif=row[3], ebitda_2023=row[4])
+
+
+def test_create_companies_in_one_statement():
+    connection, conn = mock_connection(["A46103834"])
+    renamed = ("MERCADONA SAU",) + MERCADONA[1:]
+    version = table_version.current
+
+    with patch("api.crud.async_connection", connection):
+        outcomes = asyncio.run(crud.create_companies([MERCADONA, SEAT, renamed]))
+
+    assert outcomes == {"A46103834": "created", "A28049161": "exists"}
+    assert conn.execute.await_count == 2
+    query, columns = conn.execute.await_args_list[0].args
+    assert "unnest" in query and "ON CONFLICT (cif) DO NOTHING" in query
+    # The CIF sent twice keeps its last row
+    assert columns[0] == ["MERCADONA SAU", "SEAT SA"]
+    assert columns[3] == ["A46103834", "A28049161"]
+    assert table_version.current != version
+
+
+def test_update_companies_reports_unknown_cifs():
+    connection, conn = mock_connection(["A28049161"])
+
+    with patch("api.crud.async_connection", connection):
+        outcomes = asyncio.run(crud.update_companies([MERCADONA, SEAT]))
+
+    assert outcomes == {"A46103834": "not_found", "A28049161": "updated"}
+    assert "FROM unnest" in conn.execute.await_args_list[0].args[0]
+
+
+def test_delete_companies():
+    connection, conn = mock_connection(["A46103834"])
+    version = table_version.current
+
+    with patch("api.crud.async_connection", connection):
+        outcomes = asyncio.run(crud.delete_companies(["A46103834", "X00000000", "A46103834"]))
+
+    assert outcomes == {"A46103834": "deleted", "X00000000": "not_found"}
+    conn.execute.assert_any_await(
+        "DELETE FROM companies WHERE cif = ANY(%s) RETURNING cif", (["A46103834", "X00000000"],)
+    )
+    assert table_version.current != version
+
+
+def test_failed_batch_returns_none():
+    conn = MagicMock()
+    conn.execute = AsyncMock(side_effect=Exception("deadlock detected"))
+
+    @asynccontextmanager
+    async def connection():
+        yield conn
+
+    with patch("api.crud.async_connection", connection):
+        assert asyncio.run(crud.delete_companies(["A46103834"])) is None
+
+
+@patch("api.main.crud.create_companies", new_callable=AsyncMock)
+def test_batch_endpoint_counts_each_status(mock_create_companies):
+    mock_create_companies.return_value = {"A46103834": "created", "A28049161": "exists"}
+
+    result = asyncio.run(create_companies([company(MERCADONA), company(SEAT)]))
+
+    assert mock_create_companies.await_args.args[0] == [MERCADONA, SEAT]
+    assert result.counts == {"created": 1, "exists": 1}
+    assert result.results[1] == schemas.BatchItemResult(cif="A28049161", status="exists")
+
+
+@patch("api.main.crud.update_companies", new_callable=AsyncMock)
+def test_batch_endpoint_failure(mock_update_companies):
+    mock_update_companies.return_value = None
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(update_companies([company(MERCADONA)]))
+
+    assert error.value.status_code == 400
+
+
+@patch("api.main.MAX_BATCH_SIZE", 2)
+def test_batch_size_is_limited():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(delete_companies(["A", "B", "C"]))
+
+    assert error.value.status_code == 413
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from api.benchmark import run_benchmark
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"[]" if self.path == "/companies/" else b'{"detail":"Not Found"}'
+        self.send_response(200 if self.path == "/companies/" else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JsonHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_run_benchmark(api_server):
+    report = asyncio.run(run_benchmark(f"{api_server}/companies/", concurrency=4, requests=50))
+
+    assert report["requests"] == 50
+    assert report["errors"] == 0
+    assert report["requests_per_second"] > 0
+    assert report["p50_ms"] <= report["p99_ms"]
+
+
+def test_run_benchmark_counts_errors(api_server):
+    report = asyncio.run(run_benchmark(f"{api_server}/missing", concurrency=2, requests=4))
+
+    assert report["errors"] == 4
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from decimal import Decimal
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from api import crud
+from api.cache import table_version
+
+COMPANY = ("MERCADONA SA", "http://example.com", "http://example.com", "A46103834", 1956941000)
+
+
+def mock_connection(rows=(), error=None, version=None):
+    conn = MagicMock()
+    cursor = MagicMock()
+    cursor.fetchall = AsyncMock(return_value=list(rows))
+    cursor.fetchone = AsyncMock(return_value=rows[0] if rows else version)
+    conn.execute = AsyncMock(return_value=cursor, side_effect=error)
+
+    @asynccontextmanager
+    async def connection():
+        yield conn
+
+    return connection, conn
+
+
+def test_get_companies():
+    connection, conn = mock_connection([COMPANY])
+
+    with patch("api.crud.async_connection", connection):
+        assert asyncio.run(crud.get_companies()) == [COMPANY]
+
+    conn.execute.assert_awaited_once_with(
+        "SELECT company_name, ebitda_source, cif_source, cif, ebitda_2023 FROM companies ORDER BY cif ASC", []
+    )
+
+
+def test_get_company_by_cif():
+    connection, conn = mock_connection([COMPANY])
+
+    with patch("api.crud.async_connection", connection):
+        assert asyncio.run(crud.get_company_by_cif("A46103834")) == COMPANY
+
+    conn.execute.assert_awaited_once_with(
+        "SELECT company_name, ebitda_source, cif_source, cif, ebitda_2023 FROM companies WHERE CIF = %s", ("A46103834",)
+    )
+
+
+def test_read_errors_are_raised():
+    connection, _ = mock_connection(error=Exception("connection refused"))
+
+    with patch("api.crud.async_connection", connection):
+        for read in (crud.get_companies(), crud.search_companies("mercadona"), crud.get_company_by_cif("A46103834")):
+            with pytest.raises(RuntimeError):
+                asyncio.run(read)
+
+
+def test_create_company_error_returns_false():
+    connection, _ = mock_connection(error=Exception("duplicate key"))
+
+    with patch("api.crud.async_connection", connection):
+        assert asyncio.run(crud.create_company(*COMPANY)) is False
+
+
+def test_get_companies_keyset_page():
+    connection, conn = mock_connection([COMPANY])
+
+    with patch("api.crud.async_connection", connection):
+        asyncio.run(crud.get_companies(
+            limit=51, after=(Decimal("1956941000"), "A46103834"), sort="-ebitda_2023",
+            ebitda_min=3000000.5, name_prefix="MERC_",
+        ))
+
+    query, params = conn.execute.await_args.args
+    assert query == (
+        "SELECT company_name, ebitda_source, cif_source, cif, ebitda_2023 FROM companies"
+        " WHERE ebitda_2023 IS NOT NULL AND ebitda_2023 >= %s AND company_name LIKE %s"
+        " AND (ebitda_2023, cif) < (%s, %s)"
+        " ORDER BY ebitda_2023 DESC, cif DESC LIMIT %s"
+    )
+    assert params == [Decimal("3000000.5"), "MERC\\_%", Decimal("1956941000"), "A46103834", 51]
+    # Bound as numeric, like the column, so that the EBITDA index serves the range
+    assert isinstance(params[0], Decimal)
+
+
+def test_writes_move_to_the_table_version_of_their_transaction():
+    connection, conn = mock_connection(version=("crud", 41))
+    table_version.update("crud", 40)
+
+    with patch("api.crud.async_connection", connection):
+        assert asyncio.run(crud.delete_company_by_cif("A46103834"))
+
+    # Read before the commit, so it includes the write
+    conn.execute.assert_awaited_with("SELECT epoch, version FROM companies_version")
+    assert table_version.current == "crud.41"
+
+
+def test_failed_writes_keep_the_table_version():
+    connection, _ = mock_connection(error=Exception("duplicate key"))
+    version = table_version.current
+
+    with patch("api.crud.async_connection", connection):
+        assert not asyncio.run(crud.create_company(*COMPANY))
+
+    assert table_version.current == version
+
+
+def test_search_companies_normalizes_the_query():
+    connection, conn = mock_connection([COMPANY + (1.5,)])
+
+    with patch("api.crud.async_connection", connection):
+        assert asyncio.run(crud.search_companies("Mércadona S.A.U.", limit=5)) == [COMPANY + (1.5,)]
+
+    query, params = conn.execute.await_args.args
+    assert "companies_search_key(company_name) %% %(key)s" in query
+    assert params == {"key": "mercadona sa", "prefix": "mercadona sa%", "limit": 5}
+
+
+def test_search_companies_without_a_name():
+    connection, conn = mock_connection()
+
+    with patch("api.crud.async_connection", connection):
+        assert asyncio.run(crud.search_companies(" .,- ")) == []
+
+    conn.execute.assert_not_called()
+
+
+def test_get_ebitda_values():
+    connection, conn = mock_connection([(1.5,), (20.0,)])
+
+    with patch("api.crud.async_connection", connection):
+        assert asyncio.run(crud.get_ebitda_values()) == [1.5, 20.0]
+
+    assert "ORDER BY ebitda_2023" in conn.execute.await_args.args[0]
@@ -0,0 +1,96 @@
+import io
+import csv
+import gzip
+import json
+import asyncio
+from decimal import Decimal
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from api import crud
+from api.export import csv_chunks, gzip_chunks, ndjson_chunks
+from api.main import export_companies
+
+ROWS = [
+    ("MERCADONA SA", "http://example.com/m", "http://example.com/m", "A46103834", Decimal("1956941000")),
+    ("ENGIE ESPAÑA SL", "http://example.com/e", "http://example.com/e", "B82508441", None),
+    ("SEAT, SA", "http://example.com/s", "http://example.com/s", "A28049161", Decimal("1111000000.50")),
+]
+
+
+async def batches(rows=ROWS, size=2):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_ndjson_chunks():
+    chunks = asyncio.run(collect(ndjson_chunks(batches())))
+
+    # One chunk per batch
+    assert len(chunks) == 2
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line) for line in lines][1] == {
+        "company_name": "ENGIE ESPAÑA SL",
+        "ebitda_source": "http://example.com/e",
+        "cif_source": "http://example.com/e",
+        "cif": "B82508441",
+        "ebitda_2023": None,
+    }
+    assert json.loads(lines[2])["ebitda_2023"] == 1111000000.5
+
+
+def test_csv_chunks_start_with_the_header():
+    chunks = asyncio.run(collect(csv_chunks(batches())))
+
+    assert chunks[0] == b"company_name,ebitda_source,cif_source,cif,ebitda_2023\r\n"
+    rows = list(csv.reader(b"".join(chunks).decode().splitlines()))
+    assert rows[3] == ["SEAT, SA", "http://example.com/s", "http://example.com/s", "A28049161", "1111000000.50"]
+
+
+def test_gzip_chunks_can_be_decompressed_as_they_arrive():
+    chunks = asyncio.run(collect(gzip_chunks(ndjson_chunks(batches()))))
+    plain = b"".join(asyncio.run(collect(ndjson_chunks(batches()))))
+
+    assert gzip.decompress(b"".join(chunks)) == plain
+    # The first batch can be decoded before the export ends
+    first = gzip.GzipFile(fileobj=io.BytesIO(chunks[0])).read1()
+    assert first.startswith(b'{"company_name": "MERCADONA SA"')
+
+
+def test_stream_companies_uses_a_server_side_cursor():
+    cursor = MagicMock()
+    cursor.execute = AsyncMock()
+    cursor.fetchmany = AsyncMock(side_effect=[ROWS[:2], ROWS[2:], []])
+    conn = MagicMock()
+
+    @asynccontextmanager
+    async def named_cursor(name):
+        assert name == "companies_export"
+        yield cursor
+
+    conn.cursor = named_cursor
+
+    @asynccontextmanager
+    async def connection():
+        yield conn
+
+    with patch("api.crud.async_connection", connection):
+        result = asyncio.run(collect(crud.stream_companies(2)))
+
+    assert result == [ROWS[:2], ROWS[2:]]
+    cursor.fetchmany.assert_awaited_with(2)
+
+
+@patch("api.main.crud.stream_companies")
+def test_export_endpoint(mock_stream_companies):
+    mock_stream_companies.return_value = batches()
+
+    response = asyncio.run(export_companies(format="csv", gzip=True))
+    body = b"".join(asyncio.run(collect(response.body_iterator)))
+
+    assert response.media_type == "text/csv; charset=utf-8"
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body).decode().count("\r\n") == 4
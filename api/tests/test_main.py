@@ -0,0 +1,244 @@
+import json
+import asyncio
+import itertools
+import pytest
+from decimal import Decimal
+from fastapi import HTTPException, Request
+from unittest.mock import AsyncMock, patch
+from api.cache import TableVersion, etag_matches, table_version
+from api.instrumentation import REQUEST_SECONDS, RequestMetricsMiddleware
+from api.main import read_companies, read_company, read_metrics, search_companies
+from api.pagination import decode_cursor, encode_cursor
+
+COMPANY = ("MERCADONA SA", "http://example.com", "http://example.com", "A46103834", 1956941000)
+SECOND = ("SEAT SA", "http://example.com", "http://example.com", "A28049161", Decimal("1111000000"))
+VERSIONS = itertools.count(1)
+
+
+def make_request(query="", headers=None):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/companies/",
+        "query_string": query.encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+
+
+def table_changed():
+    # Like the notification of a change to the table
+    table_version.update("test", next(VERSIONS))
+
+
+@pytest.fixture(autouse=True)
+def new_table_version():
+    # Responses cached by other tests belong to an older version
+    table_changed()
+
+
+@patch("api.main.crud.get_companies", new_callable=AsyncMock)
+def test_read_companies_keeps_the_response_shape(mock_get_companies):
+    mock_get_companies.return_value = [COMPANY]
+
+    response = asyncio.run(read_companies(make_request(), limit=100, cursor=None, sort="cif"))
+
+    assert json.loads(response.body) == [{
+        "company_name": "MERCADONA SA",
+        "ebitda_source": "http://example.com",
+        "cif_source": "http://example.com",
+        "cif": "A46103834",
+        "ebitda_2023": 1956941000.0,
+    }]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+
+@patch("api.main.crud.get_companies", new_callable=AsyncMock)
+def test_read_companies_sends_the_next_cursor(mock_get_companies):
+    mock_get_companies.return_value = [COMPANY, SECOND, COMPANY]
+
+    response = asyncio.run(read_companies(make_request("limit=2"), limit=2, cursor=None, sort="-ebitda_2023"))
+
+    assert [company["cif"] for company in json.loads(response.body)] == ["A46103834", "A28049161"]
+    assert mock_get_companies.await_args.kwargs["limit"] == 3
+    assert decode_cursor(response.headers["X-Next-Cursor"], "-ebitda_2023") == (Decimal("1111000000"), "A28049161")
+
+
+@patch("api.main.crud.get_companies", new_callable=AsyncMock)
+def test_read_companies_last_page_has_no_cursor(mock_get_companies):
+    mock_get_companies.return_value = [COMPANY]
+
+    response = asyncio.run(read_companies(make_request("limit=2"), limit=2, cursor=None, sort="cif"))
+
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_read_companies_rejects_a_cursor_of_another_sort():
+    cursor = encode_cursor("company_name", COMPANY)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_companies(make_request(), limit=2, cursor=cursor, sort="cif"))
+
+    assert error.value.status_code == 400
+
+
+@patch("api.main.crud.get_companies", new_callable=AsyncMock)
+def test_unchanged_table_answers_304_without_a_query(mock_get_companies):
+    mock_get_companies.return_value = [COMPANY]
+    first = asyncio.run(read_companies(make_request(), limit=100, cursor=None, sort="cif"))
+    etag = first.headers["ETag"]
+
+    revalidated = asyncio.run(
+        read_companies(make_request(headers={"If-None-Match": etag}), limit=100, cursor=None, sort="cif")
+    )
+    repeated = asyncio.run(read_companies(make_request(), limit=100, cursor=None, sort="cif"))
+
+    assert revalidated.status_code == 304
+    assert revalidated.body == b""
+    # The second full response is the body serialized for the first one
+    assert repeated.body == first.body
+    mock_get_companies.assert_awaited_once()
+
+
+@patch("api.main.crud.get_companies", new_callable=AsyncMock)
+def test_a_write_changes_the_etag(mock_get_companies):
+    mock_get_companies.return_value = [COMPANY]
+    etag = asyncio.run(read_companies(make_request(), limit=100, cursor=None, sort="cif")).headers["ETag"]
+
+    table_changed()
+    response = asyncio.run(
+        read_companies(make_request(headers={"If-None-Match": etag}), limit=100, cursor=None, sort="cif")
+    )
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert mock_get_companies.await_count == 2
+
+
+@patch("api.main.crud.get_companies", new_callable=AsyncMock)
+def test_each_query_has_its_own_etag(mock_get_companies):
+    mock_get_companies.return_value = [COMPANY]
+
+    first = asyncio.run(read_companies(make_request("sort=cif"), limit=100, cursor=None, sort="cif"))
+    second = asyncio.run(read_companies(make_request("sort=-cif"), limit=100, cursor=None, sort="-cif"))
+
+    assert first.headers["ETag"] != second.headers["ETag"]
+
+
+@patch("api.main.crud.get_companies", new_callable=AsyncMock)
+def test_database_errors_answer_503_and_are_not_cached(mock_get_companies):
+    mock_get_companies.side_effect = [RuntimeError("The companies could not be read"), [COMPANY]]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_companies(make_request(), limit=50))
+    response = asyncio.run(read_companies(make_request(), limit=50))
+
+    assert error.value.status_code == 503
+    assert json.loads(response.body)[0]["cif"] == "A46103834"
+    assert mock_get_companies.await_count == 2
+
+
+@patch("api.main.crud.search_companies", new_callable=AsyncMock)
+def test_search_errors_answer_503(mock_search_companies):
+    mock_search_companies.side_effect = RuntimeError("The companies could not be searched")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(search_companies(make_request("q=mercadona"), q="mercadona", limit=10))
+
+    assert error.value.status_code == 503
+
+
+@patch("api.main.crud.get_company_by_cif", new_callable=AsyncMock)
+def test_read_company_is_cached(mock_get_company_by_cif):
+    mock_get_company_by_cif.return_value = COMPANY
+
+    first = asyncio.run(read_company(make_request(), "A46103834"))
+    second = asyncio.run(read_company(make_request(headers={"If-None-Match": first.headers["ETag"]}), "A46103834"))
+
+    assert json.loads(first.body)["cif"] == "A46103834"
+    assert second.status_code == 304
+    mock_get_company_by_cif.assert_awaited_once()
+
+
+@patch("api.main.crud.get_company_by_cif", new_callable=AsyncMock)
+def test_read_company_not_found(mock_get_company_by_cif):
+    mock_get_company_by_cif.return_value = None
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(read_company(make_request(), "A00000000"))
+
+    assert error.value.status_code == 404
+
+
+@patch("api.main.crud.search_companies", new_callable=AsyncMock)
+def test_search_companies_sends_the_scores(mock_search_companies):
+    mock_search_companies.return_value = [COMPANY + (Decimal("1.833333"),)]
+
+    response = asyncio.run(search_companies(make_request("q=mercadona"), q="mercadona", limit=10))
+
+    mock_search_companies.assert_awaited_once_with("mercadona", 10)
+    assert json.loads(response.body) == [{
+        "company_name": "MERCADONA SA",
+        "ebitda_source": "http://example.com",
+        "cif_source": "http://example.com",
+        "cif": "A46103834",
+        "ebitda_2023": 1956941000.0,
+        "score": 1.8333,
+    }]
+    assert response.headers["ETag"]
+
+
+def test_same_table_version_same_etag():
+    # Every API process, and every restart, builds the same ETag from the database version
+    first, second = TableVersion(), TableVersion()
+    first.update("e1", 3)
+    second.update("e1", 4)
+    second.update("e1", 3)
+
+    assert first.etag("cif=A46103834") != second.etag("cif=A46103834")
+    first.update("e1", 4)
+    assert first.etag("cif=A46103834") == second.etag("cif=A46103834")
+    assert first.etag("cif=A46103834") != first.etag("cif=A28049161")
+
+
+@patch("api.main.crud.get_companies", new_callable=AsyncMock)
+def test_unknown_table_version_is_not_cached(mock_get_companies):
+    mock_get_companies.return_value = [COMPANY]
+
+    with patch.object(table_version, "epoch", None):
+        first = asyncio.run(read_companies(make_request(), limit=100, cursor=None, sort="cif"))
+        asyncio.run(read_companies(make_request(), limit=100, cursor=None, sort="cif"))
+
+    assert first.status_code == 200
+    assert "ETag" not in first.headers
+    assert mock_get_companies.await_count == 2
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_request_metrics_middleware():
+    async def endpoint(scope, receive, send):
+        scope["endpoint"] = read_company
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = RequestMetricsMiddleware(endpoint)
+    before = REQUEST_SECONDS.count(endpoint="read_company", method="GET", status=404)
+
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": "/companies/X"}, None, send))
+
+    assert REQUEST_SECONDS.count(endpoint="read_company", method="GET", status=404) == before + 1
+
+
+def test_read_metrics():
+    response = read_metrics()
+
+    assert response.media_type.startswith("text/plain; version=0.0.4")
+    assert b"# TYPE http_request_seconds histogram" in response.body
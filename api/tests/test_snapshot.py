@@ -0,0 +1,169 @@
+import json
+import random
+import asyncio
+import pytest
+from decimal import Decimal
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from api import crud
+from api.snapshot import ChangeListener, CompanySnapshot, SnapshotSync, snapshot
+
+MERCADONA = ("MERCADONA SA", "http://example.com/m", "http://example.com/m", "A46103834", Decimal("1956941000"))
+SEAT = ("SEAT SA", "http://example.com/s", "http://example.com/s", "A28049161", Decimal("1111000000"))
+ENGIE = ("ENGIE ESPAÑA SL", "http://example.com/e", "http://example.com/e", "B82508441", None)
+
+
+def mock_connection(rows, version=("e1", 7)):
+    conn = MagicMock()
+    cursor = MagicMock()
+    cursor.fetchall = AsyncMock(return_value=list(rows))
+    cursor.fetchone = AsyncMock(return_value=version)
+    conn.execute = AsyncMock(return_value=cursor)
+
+    @asynccontextmanager
+    async def connection():
+        yield conn
+
+    return connection, conn
+
+
+@pytest.fixture
+def loaded_snapshot():
+    snapshot.replace([MERCADONA, SEAT, ENGIE])
+    yield snapshot
+    snapshot.replace([])
+    snapshot.ready = False
+
+
+def test_snapshot_lookup_and_changes():
+    companies = CompanySnapshot()
+    companies.replace([MERCADONA, SEAT, ENGIE])
+
+    assert companies.get("A46103834") == ("MERCADONA SA", "http://example.com/m", "http://example.com/m", "A46103834", 1956941000.0)
+    # Both sources share one string
+    assert companies.get("A46103834")[2] is companies.get("A46103834")[1]
+
+    companies.upsert(SEAT[:4] + (Decimal("5"),))
+    companies.remove("A46103834")
+    companies.remove("X00000000")
+
+    assert companies.get("A46103834") is None
+    assert companies.by_ebitda == [(5.0, "A28049161")]
+    assert len(companies) == 2
+
+
+def test_page_by_ebitda_matches_the_sql_keyset_order():
+    rng = random.Random(0)
+    rows = [
+        (f"COMPANY {i}", "u", "u", f"A{i:08d}", rng.choice([None, rng.randint(0, 20) * 1000000]))
+        for i in range(300)
+    ]
+    companies = CompanySnapshot()
+    companies.replace(rows)
+
+    for descending in (False, True):
+        expected = sorted(
+            (row for row in companies.rows.values() if row[4] is not None and 5000000 <= row[4] <= 15000000),
+            key=lambda row: (row[4], row[3]),
+            reverse=descending,
+        )
+        pages = []
+        after = None
+        while True:
+            page = companies.page_by_ebitda(7, after, descending, ebitda_min=5000000, ebitda_max=15000000)
+            if not page:
+                break
+            pages += page
+            after = (Decimal(str(page[-1][4])), page[-1][3])
+
+        assert pages == expected
+
+
+def test_apply_notifications_reloads_only_the_changed_cifs():
+    companies = CompanySnapshot()
+    companies.replace([MERCADONA, SEAT])
+    on_change = MagicMock()
+    sync = SnapshotSync(companies, on_change=on_change)
+    renamed = ("SEAT SAU",) + SEAT[1:]
+    connection, conn = mock_connection([renamed, ENGIE])
+    payloads = [
+        json.dumps({"op": "UPDATE", "cif": "A28049161", "old_cif": "A28049161", "epoch": "e1", "version": 8}),
+        json.dumps({"op": "INSERT", "cif": "B82508441", "epoch": "e1", "version": 9}),
+        json.dumps({"op": "DELETE", "cif": "A46103834", "epoch": "e1", "version": 9}),
+    ]
+
+    with patch("api.snapshot.async_connection", connection):
+        asyncio.run(sync.apply(payloads))
+
+    assert set(conn.execute.await_args.args[1][0]) == {"A28049161", "B82508441", "A46103834"}
+    assert companies.get("A28049161")[0] == "SEAT SAU"
+    assert companies.get("B82508441") is not None
+    assert companies.get("A46103834") is None
+    on_change.assert_called_once_with("e1", 9)
+
+
+def test_truncate_reloads_the_whole_table():
+    companies = CompanySnapshot()
+    companies.replace([MERCADONA, SEAT])
+    on_change = MagicMock()
+    sync = SnapshotSync(companies, on_change=on_change)
+    connection, conn = mock_connection([ENGIE], version=("e1", 8))
+
+    with patch("api.snapshot.async_connection", connection):
+        asyncio.run(sync.apply([json.dumps({"op": "TRUNCATE", "epoch": "e1", "version": 8})]))
+
+    # The version and the rows are read in one REPEATABLE READ transaction
+    assert [call.args[0] for call in conn.execute.await_args_list] == [
+        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ",
+        "SELECT epoch, version FROM companies_version",
+        "SELECT company_name, ebitda_source, cif_source, cif, ebitda_2023 FROM companies",
+    ]
+    assert list(companies.rows) == ["B82508441"]
+    assert sync.stats["reloads"] == 1
+    on_change.assert_called_once_with("e1", 8)
+
+
+@patch("api.crud.async_connection")
+def test_crud_reads_from_the_snapshot(mock_async_connection, loaded_snapshot):
+    assert asyncio.run(crud.get_company_by_cif("A28049161"))[0] == "SEAT SA"
+    page = asyncio.run(crud.get_companies(limit=1, sort="-ebitda_2023"))
+
+    assert [row[3] for row in page] == ["A46103834"]
+    mock_async_connection.assert_not_called()
+
+
+def test_crud_writes_are_applied_to_the_snapshot(loaded_snapshot):
+    connection, _ = mock_connection([])
+
+    with patch("api.crud.async_connection", connection):
+        asyncio.run(crud.delete_company_by_cif("A28049161"))
+        asyncio.run(crud.create_company("REPSOL SA", None, None, "A78374725", 3000000.0))
+
+    assert loaded_snapshot.get("A28049161") is None
+    assert loaded_snapshot.get("A78374725")[4] == 3000000.0
+
+
+def test_change_listener_takes_the_version_once_per_batch():
+    on_change = MagicMock()
+    listener = ChangeListener(on_change)
+    payloads = [
+        json.dumps({"op": "INSERT", "cif": cif, "epoch": "e1", "version": version})
+        for cif, version in (("A46103834", 3), ("A28049161", 4))
+    ]
+
+    asyncio.run(listener.apply(payloads))
+
+    on_change.assert_called_once_with("e1", 4)
+    assert listener.stats["notifications"] == 2
+
+
+def test_change_listener_reads_the_version_from_the_database():
+    on_change = MagicMock()
+    listener = ChangeListener(on_change, mode="poll")
+    connection, conn = mock_connection([], version=("e1", 12))
+
+    with patch("api.snapshot.async_connection", connection):
+        asyncio.run(listener.reload())
+
+    conn.execute.assert_awaited_once_with("SELECT epoch, version FROM companies_version")
+    on_change.assert_called_once_with("e1", 12)
@@ -0,0 +1,66 @@
+import os
+import time
+from contextlib import asynccontextmanager
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+from dotenv import load_dotenv
+from db.connection import POOL_WAIT_SECONDS
+
+load_dotenv()
+
+_pool = None
+
+def conninfo():
+    """
+    Builds the connection string from the DB_* environment variables.
+    """
+    return make_conninfo(
+        user=os.getenv("DB_USER"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+        dbname=os.getenv("DB_NAME"),
+        password=os.getenv("DB_PASSWORD"),
+    )
+
+def get_async_pool():
+    """
+    Returns the process-wide async pool used by the API, created on first use from the
+    DB_POOL_* environment variables.
+
+    Connections are handed out with `async with pool.connection() as conn:`; the transaction
+    is committed when the block ends, or rolled back if it raises.
+    """
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            conninfo(),
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+            max_lifetime=float(os.getenv("DB_POOL_MAX_AGE", "1800")),
+            # Idle connections are checked before being handed out
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+    return _pool
+
+async def open_async_pool():
+    # The pool connects in the background: the API starts even if the database is not up yet
+    await get_async_pool().open(wait=False)
+    print("Async connection pool ready!")
+
+async def close_async_pool():
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.close()
+
+@asynccontextmanager
+async def async_connection():
+    """
+    Borrows a connection from the async pool: `async with async_connection() as conn: ...`
+    """
+    start = time.perf_counter()
+    async with get_async_pool().connection() as conn:
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - start, pool="async", outcome="acquired")
+        yield conn
@@ -1,24 +1,37 @@
 import os
 import psycopg2
 from dotenv import load_dotenv
+from metrics.registry import counter, histogram
 
 load_dotenv()
 
+CONNECTIONS = counter("db_connections_total", "Database connections opened, by outcome.", ("outcome",))
+POOL_WAIT_SECONDS = histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a free connection of a pool.", ("pool", "outcome")
+)
+
+def open_connection():
+    """
+    Opens a new connection with the DB_* environment variables; errors are raised.
+    """
+    return psycopg2.connect(
+        user=os.getenv("DB_USER"),
+        host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT"),
+        dbname=os.getenv("DB_NAME"),
+        password=os.getenv("DB_PASSWORD")
+    )
+
 def connect_to_database():
     try:
-        conn = psycopg2.connect(
-            user=os.getenv("DB_USER"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT"),
-            dbname=os.getenv("DB_NAME"),
-            password=os.getenv("DB_PASSWORD")
-        )
-        print("Connection successful!")
+        conn = open_connection()
+        CONNECTIONS.inc(outcome="ok")
         return conn
     except Exception as error:
+        CONNECTIONS.inc(outcome="error")
         print(f"Error connecting to the database: {error}")
         return None
 
 if __name__ == "__main__":
     if conn := connect_to_database():
-        conn.close()
\ No newline at end of file
+        conn.close()
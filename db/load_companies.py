@@ -1,13 +1,58 @@
+import io
 import os
+import time
+import argparse
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from dotenv import load_dotenv
 from db.connection import connect_to_database
+from metrics.registry import counter, histogram, registry
 
 load_dotenv()
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CSV_FILE = os.path.join(PROJECT_ROOT, "scrap_job", "companies.csv")
 
+FILE_COLUMNS = ["Nombre de la empresa", "Fuente de la información EBITDA",
+                "Fuente de la información CIF", "CIF", "EBITDA 2023"]
+TABLE_COLUMNS = "company_name, ebitda_source, cif_source, cif, ebitda_2023"
+COPY_CHUNK_ROWS = 100000
+
+LOAD_STAGE_SECONDS = histogram("loader_stage_seconds", "Time spent in each stage of a bulk load.", ("stage",))
+LOADED_ROWS = counter("loader_rows_total", "Rows handled by the bulk loader, by outcome.", ("outcome",))
+
+# How rows whose CIF is already in 'companies' are merged
+UPSERT_ACTIONS = {
+    "skip": "DO NOTHING",
+    "overwrite": """DO UPDATE SET
+                company_name = EXCLUDED.company_name,
+                ebitda_source = EXCLUDED.ebitda_source,
+                cif_source = EXCLUDED.cif_source,
+                ebitda_2023 = EXCLUDED.ebitda_2023,
+                last_scraped_at = EXCLUDED.last_scraped_at""",
+    "update-if-changed": """DO UPDATE SET
+                company_name = EXCLUDED.company_name,
+                ebitda_source = EXCLUDED.ebitda_source,
+                cif_source = EXCLUDED.cif_source,
+                ebitda_2023 = EXCLUDED.ebitda_2023,
+                last_scraped_at = EXCLUDED.last_scraped_at
+            WHERE (companies.company_name, companies.ebitda_source, companies.cif_source, companies.ebitda_2023)
+                IS DISTINCT FROM
+                (EXCLUDED.company_name, EXCLUDED.ebitda_source, EXCLUDED.cif_source, EXCLUDED.ebitda_2023)""",
+    # Like update-if-changed, but rows are compared by their stored content hash, and the
+    # unchanged ones only get their last_scraped_at refreshed afterwards (see bulk_load_data)
+    "sync": """DO UPDATE SET
+                company_name = EXCLUDED.company_name,
+                ebitda_source = EXCLUDED.ebitda_source,
+                cif_source = EXCLUDED.cif_source,
+                ebitda_2023 = EXCLUDED.ebitda_2023,
+                last_scraped_at = EXCLUDED.last_scraped_at
+            WHERE companies.content_hash IS DISTINCT FROM companies_content_hash(
+                EXCLUDED.company_name, EXCLUDED.ebitda_source, EXCLUDED.cif_source, EXCLUDED.ebitda_2023
+            )""",
+}
+
 def create_table():
     try:
         conn = connect_to_database()
@@ -27,17 +72,170 @@ def create_table():
         """)
         print("Table 'companies' created successfully.")
 
-        conn.commit()
+        # Delta syncs (scrap.py --delta, --mode sync) need to know when every row was last
+        # scraped and to compare rows by a hash of their content. ROW()::text tells NULL from ''
+        # and trim_scale() makes 5.0 and 5 the same EBITDA.
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION companies_content_hash(
+                company_name TEXT, ebitda_source TEXT, cif_source TEXT, ebitda_2023 NUMERIC
+            ) RETURNS TEXT AS $$
+                SELECT md5(ROW(company_name, ebitda_source, cif_source, trim_scale(ebitda_2023))::text)
+            $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+        """)
+        cur.execute("ALTER TABLE companies ADD COLUMN IF NOT EXISTS last_scraped_at TIMESTAMPTZ;")
+        cur.execute("""
+            ALTER TABLE companies ADD COLUMN IF NOT EXISTS content_hash TEXT
+            GENERATED ALWAYS AS (companies_content_hash(company_name, ebitda_source, cif_source, ebitda_2023)) STORED;
+        """)
+        # Companies of the ranking that the scraper read but did not keep (EBITDA not above the
+        # threshold, no EBITDA or no valid CIF), so that a delta sync does not scrape them again
+        # as new ones every night (see record_filtered())
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS scrap_tombstones (
+                url TEXT PRIMARY KEY,
+                company_name TEXT,
+                scraped_at TIMESTAMPTZ NOT NULL
+            );
+        """)
+
+        # Indexes used by the paginated, sorted and filtered GET /companies/ (the CIF is the
+        # tie-breaker of every sort order)
+        cur.execute("CREATE INDEX IF NOT EXISTS companies_ebitda_cif_idx ON companies (ebitda_2023, cif);")
+        cur.execute("CREATE INDEX IF NOT EXISTS companies_name_cif_idx ON companies (company_name, cif);")
+        cur.execute("CREATE INDEX IF NOT EXISTS companies_name_pattern_idx ON companies (company_name text_pattern_ops);")
+
+        # Version of the table for the ETags of the API, the same in every API process: it is
+        # incremented once in every transaction that changes the table, so it becomes visible
+        # together with the changes. The epoch is drawn once, a recreated table starts anew.
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS companies_version (
+                id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                epoch TEXT NOT NULL DEFAULT substr(md5(random()::text || clock_timestamp()::text), 1, 8),
+                version BIGINT NOT NULL DEFAULT 0,
+                changed_by BIGINT
+            );
+        """)
+        cur.execute("INSERT INTO companies_version (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;")
+
+        # Every change is announced on the 'companies_changed' channel with the new version, so
+        # that API processes keep their ETags and in-memory snapshot of the table up to date
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION companies_notify_change() RETURNS trigger AS $$
+            DECLARE
+                payload JSONB;
+                current_version RECORD;
+            BEGIN
+                -- A delta sync refreshes last_scraped_at of unchanged rows, nothing to announce
+                IF TG_OP = 'UPDATE' THEN
+                    IF OLD.cif = NEW.cif AND OLD.content_hash IS NOT DISTINCT FROM NEW.content_hash THEN
+                        RETURN NULL;
+                    END IF;
+                END IF;
 
+                UPDATE companies_version SET version = version + 1, changed_by = txid_current()
+                WHERE changed_by IS DISTINCT FROM txid_current();
+                SELECT epoch, version INTO current_version FROM companies_version;
+
+                IF TG_OP = 'TRUNCATE' THEN
+                    payload := jsonb_build_object('op', TG_OP);
+                ELSIF TG_OP = 'DELETE' THEN
+                    payload := jsonb_build_object('op', TG_OP, 'cif', OLD.cif);
+                ELSIF TG_OP = 'UPDATE' THEN
+                    payload := jsonb_build_object('op', TG_OP, 'cif', NEW.cif, 'old_cif', OLD.cif);
+                ELSE
+                    payload := jsonb_build_object('op', TG_OP, 'cif', NEW.cif);
+                END IF;
+                PERFORM pg_notify('companies_changed', (payload || jsonb_build_object(
+                    'epoch', current_version.epoch, 'version', current_version.version
+                ))::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        cur.execute("DROP TRIGGER IF EXISTS companies_notify_row ON companies;")
+        cur.execute("""
+            CREATE TRIGGER companies_notify_row AFTER INSERT OR UPDATE OR DELETE ON companies
+            FOR EACH ROW EXECUTE FUNCTION companies_notify_change();
+        """)
+        cur.execute("DROP TRIGGER IF EXISTS companies_notify_truncate ON companies;")
+        cur.execute("""
+            CREATE TRIGGER companies_notify_truncate AFTER TRUNCATE ON companies
+            FOR EACH STATEMENT EXECUTE FUNCTION companies_notify_change();
+        """)
+
+        conn.commit()
         cur.close()
+
+        create_search_index(conn)
         conn.close()
 
     except Exception as e:
         print(f"Error creating table: {e}")
 
-def insert_data():
+def create_search_index(conn):
+    """
+    Sets up the name search of GET /companies/search in its own transaction, so that a server
+    without the pg_trgm and unaccent extensions (or a role that cannot create them) still gets
+    the 'companies' table; only the search is then unavailable.
+
+    Input:
+        conn (connection): An open connection, in which the 'companies' table is committed.
+
+    Output:
+        bool: True if the search function and its indexes exist, False otherwise, in which
+              case GET /companies/search answers 503.
+    """
     try:
-        df = pd.read_csv(CSV_FILE)
+        cur = conn.cursor()
+        # Name search (GET /companies/search) compares the names normalized the same way as
+        # scrap_job.names.normalize_company_name(): without accents or punctuation and with the
+        # legal form reduced to 'sa' or 'sl'. unaccent() is only STABLE, the wrapper pins its
+        # dictionary so that the function can be indexed.
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        cur.execute("CREATE EXTENSION IF NOT EXISTS unaccent;")
+        cur.execute(r"""
+            CREATE OR REPLACE FUNCTION companies_search_key(name TEXT) RETURNS TEXT AS $$
+                SELECT regexp_replace(regexp_replace(
+                    trim(regexp_replace(regexp_replace(
+                        replace(lower(public.unaccent('public.unaccent'::regdictionary, name)), '&', ' '),
+                        '\m([a-z])\.(?=[a-z]\M)', '\1', 'g'),
+                        '[^a-z0-9]+', ' ', 'g')),
+                    '(^| )(sociedad anonima unipersonal|sociedad anonima|sau|sa)$', '\1sa'),
+                    '(^| )(sociedad limitada unipersonal|sociedad limitada|slu|sl)$', '\1sl')
+            $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+        """)
+        # Trigrams serve the fuzzy matches and the prefixes of 3+ characters, the B-tree the
+        # shorter prefixes
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS companies_search_key_trgm_idx
+            ON companies USING GIN (companies_search_key(company_name) gin_trgm_ops);
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS companies_search_key_pattern_idx
+            ON companies (companies_search_key(company_name) text_pattern_ops);
+        """)
+        conn.commit()
+        cur.close()
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Name search unavailable, pg_trgm/unaccent could not be set up: {e}")
+        print("The 'companies' table was created; GET /companies/search will not work until the extensions are installed.")
+        return False
+
+def read_companies(path):
+    """
+    Reads the scraper output. Parquet files (--sink parquet) are already typed and are read as
+    they are; CSV files are parsed.
+    """
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, dtype_backend="numpy_nullable")
+    return pd.read_csv(path)
+
+def insert_data(path=None):
+    try:
+        df = read_companies(path or CSV_FILE)
         print("Columns in CSV file:", df.columns.tolist())
 
         conn = connect_to_database()
@@ -46,13 +244,15 @@ def insert_data():
 
         cur = conn.cursor()
 
-        for _, row in df.iterrows():
-            cur.execute("""
-                INSERT INTO companies (company_name, ebitda_source, cif_source, cif, ebitda_2023)
+        # Same columns as bulk_load_data(); missing values (NaN / <NA>) are sent as NULL
+        rows = df[FILE_COLUMNS].astype(object).where(df[FILE_COLUMNS].notna(), None)
+
+        for row in rows.itertuples(index=False, name=None):
+            cur.execute(f"""
+                INSERT INTO companies ({TABLE_COLUMNS})
                 VALUES (%s, %s, %s, %s, %s)
                 ON CONFLICT (cif) DO NOTHING;  -- Skip if CIF already exists
-            """, (row["Nombre de la empresa"], row["Fuente de la información EBITDA"],
-                  row["Fuente de la información CIF"], row["CIF"], row["EBITDA 2023"]))
+            """, row)
 
         conn.commit()
         print("Data inserted successfully.")
@@ -63,6 +263,313 @@ def insert_data():
     except Exception as e:
         print(f"Error inserting data: {e}")
 
+def copy_to_staging(cur, df):
+    """
+    Streams a DataFrame into the 'companies_staging' temporary table with COPY FROM STDIN,
+    COPY_CHUNK_ROWS rows at a time so that only one chunk is serialized in memory. The CSV is
+    written by Arrow, which is about ten times faster than DataFrame.to_csv.
+    """
+    table = pa.Table.from_pandas(df[FILE_COLUMNS], preserve_index=False)
+    options = pa_csv.WriteOptions(include_header=False)
+    for batch in table.to_batches(max_chunksize=COPY_CHUNK_ROWS):
+        buffer = io.BytesIO()
+        # Missing values are written as unquoted empty fields, which COPY reads as NULL
+        pa_csv.write_csv(batch, buffer, options)
+        buffer.seek(0)
+        cur.copy_expert(
+            f"COPY companies_staging ({TABLE_COLUMNS}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+def merge_frame(cur, df, mode="skip"):
+    """
+    Copies a DataFrame into a temporary staging table and merges it into 'companies' with one
+    INSERT ... SELECT ... ON CONFLICT (cif), in the transaction of the cursor. Rows without a
+    CIF or a name are rejected, and if a CIF appears several times the last row wins and the
+    others are counted as duplicates.
+
+    Input:
+        cur (cursor): A cursor of an open connection, committed by the caller.
+        df (pd.DataFrame): Rows with the FILE_COLUMNS columns.
+        mode (str): A key of UPSERT_ACTIONS.
+
+    Output:
+        dict: Number of rows 'inserted', 'updated', 'skipped' (left unchanged by the mode),
+              'rejected' (no CIF or name) and 'duplicates' (earlier rows of a repeated CIF).
+    """
+    cur.execute("""
+        CREATE TEMP TABLE companies_staging (
+            position BIGSERIAL,
+            company_name TEXT,
+            ebitda_source TEXT,
+            cif_source TEXT,
+            cif TEXT,
+            ebitda_2023 NUMERIC
+        ) ON COMMIT DROP;
+    """)
+    with LOAD_STAGE_SECONDS.time(stage="copy"):
+        copy_to_staging(cur, df)
+
+    # xmax is 0 only for rows created by this statement, not for updated ones
+    upsert_start = time.perf_counter()
+    cur.execute(f"""
+        WITH source AS (
+            SELECT DISTINCT ON (cif) {TABLE_COLUMNS}
+            FROM companies_staging
+            WHERE cif IS NOT NULL AND company_name IS NOT NULL
+            ORDER BY cif, position DESC
+        ), merged AS (
+            INSERT INTO companies ({TABLE_COLUMNS}, last_scraped_at)
+            SELECT {TABLE_COLUMNS}, now() FROM source
+            ON CONFLICT (cif) {UPSERT_ACTIONS[mode]}
+            RETURNING xmax = 0 AS inserted
+        )
+        SELECT
+            count(*) FILTER (WHERE inserted),
+            count(*) FILTER (WHERE NOT inserted),
+            (SELECT count(*) FROM source),
+            (SELECT count(*) FROM companies_staging WHERE cif IS NULL OR company_name IS NULL),
+            (SELECT count(*) FROM companies_staging)
+        FROM merged;
+    """)
+    inserted, updated, merged, rejected, total = cur.fetchone()
+
+    if mode == "sync":
+        # now() is the time of the transaction, so the rows written above are left out
+        cur.execute("""
+            UPDATE companies SET last_scraped_at = now()
+            FROM companies_staging
+            WHERE companies.cif = companies_staging.cif
+              AND companies.last_scraped_at IS DISTINCT FROM now();
+        """)
+    LOAD_STAGE_SECONDS.observe(time.perf_counter() - upsert_start, stage="upsert")
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "skipped": merged - inserted - updated,
+        "rejected": rejected,
+        "duplicates": total - rejected - merged,
+    }
+
+def record_filtered(cur, dropped):
+    """
+    Records the companies that the scraper read and filtered out, in the transaction of the
+    cursor. Each one gets a tombstone with the time of the scrape, which the delta sync reads
+    like a last_scraped_at. A stored company whose EBITDA is now known to be at or below the
+    threshold is deleted, as the table only holds the companies above it; a stored company
+    dropped for a missing EBITDA or CIF keeps its values and gets a new last_scraped_at, so that
+    it is retried after --max-age like the others.
+
+    Input:
+        cur (cursor): A cursor of an open connection, committed by the caller.
+        dropped (pd.DataFrame): The 'Nombre de la empresa', 'Fuente de la información EBITDA'
+                                and 'below_threshold' columns of scrap_job.transform.split_results().
+
+    Output:
+        tuple[int, int]: Stored rows deleted and stored rows refreshed.
+    """
+    # A URL scraped twice keeps its last outcome
+    rows = {}
+    for company_name, url, below_threshold in dropped.itertuples(index=False, name=None):
+        if isinstance(url, str):
+            rows[url] = (None if pd.isna(company_name) else company_name, bool(below_threshold))
+    if not rows:
+        return 0, 0
+
+    names, below = zip(*rows.values())
+    cur.execute("""
+        WITH dropped AS (
+            SELECT * FROM unnest(%s::text[], %s::text[], %s::boolean[]) AS dropped (url, company_name, below_threshold)
+        ), tombstones AS (
+            INSERT INTO scrap_tombstones (url, company_name, scraped_at)
+            SELECT url, company_name, now() FROM dropped
+            ON CONFLICT (url) DO UPDATE SET company_name = EXCLUDED.company_name, scraped_at = EXCLUDED.scraped_at
+        ), deleted AS (
+            DELETE FROM companies USING dropped
+            WHERE companies.ebitda_source = dropped.url AND dropped.below_threshold
+            RETURNING 1
+        ), refreshed AS (
+            UPDATE companies SET last_scraped_at = now() FROM dropped
+            WHERE companies.ebitda_source = dropped.url AND NOT dropped.below_threshold
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM deleted), (SELECT count(*) FROM refreshed);
+    """, (list(rows), list(names), list(below)))
+    return cur.fetchone()
+
+def read_ranking_list(path):
+    """
+    Reads the company URLs written by scrap.py --delta, one per line.
+    """
+    with open(path, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+def prune_companies(cur, urls):
+    """
+    Deletes the scraped companies whose ranking URL is not in `urls`, i.e. that left the
+    ranking, and their tombstones. Rows that were not loaded from the scraper (no
+    last_scraped_at) are kept.
+
+    Output:
+        int: Number of rows deleted.
+    """
+    cur.execute("CREATE TEMP TABLE companies_ranking (url TEXT PRIMARY KEY) ON COMMIT DROP;")
+    cur.copy_expert(
+        "COPY companies_ranking (url) FROM STDIN", io.BytesIO("".join(f"{url}\n" for url in set(urls)).encode())
+    )
+    cur.execute("""
+        DELETE FROM scrap_tombstones
+        WHERE NOT EXISTS (SELECT 1 FROM companies_ranking WHERE url = scrap_tombstones.url);
+    """)
+    cur.execute("""
+        DELETE FROM companies
+        WHERE last_scraped_at IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM companies_ranking WHERE url = companies.ebitda_source);
+    """)
+    return cur.rowcount
+
+def bulk_load_data(path=None, mode="skip", prune=None, filtered=None):
+    """
+    Loads the scraper output into 'companies' with COPY and a single set-based upsert
+    (see merge_frame()).
+
+    Input:
+        path (str | None): CSV or Parquet file, defaults to scrap_job/companies.csv.
+        mode (str): What to do with CIFs already in the table: 'skip' keeps the stored row,
+                    'overwrite' replaces it, 'update-if-changed' only replaces rows that differ,
+                    'sync' only replaces rows whose content hash differs and marks the others
+                    as scraped now, for the output of scrap.py --delta.
+        prune (str | None): Ranking list written by scrap.py --delta; the scraped companies
+                            that are not in it any more are deleted.
+        filtered (str | None): Companies filtered out by scrap.py --delta with a file sink,
+                               recorded with record_filtered() in 'sync' mode.
+
+    Output:
+        dict | None: Number of rows 'inserted', 'updated', 'skipped', 'rejected' and
+                     'duplicates' (see merge_frame()), 'deleted' with prune and
+                     'deleted_below_threshold' with filtered, or None on error.
+    """
+    if mode not in UPSERT_ACTIONS:
+        raise ValueError(f"Unknown mode '{mode}'. Choose one of: {', '.join(UPSERT_ACTIONS)}")
+    if filtered and mode != "sync":
+        raise ValueError("Filtered companies are only recorded in 'sync' mode.")
+
+    ranking = None
+    if prune:
+        try:
+            ranking = read_ranking_list(prune)
+        except Exception as e:
+            print(f"Error reading the ranking list: {e}")
+            return None
+        if not ranking:
+            print(f"The ranking list '{prune}' is empty, nothing is pruned.")
+            return None
+
+    start = time.perf_counter()
+    try:
+        with LOAD_STAGE_SECONDS.time(stage="read"):
+            df = read_companies(path or CSV_FILE)
+            dropped = pd.read_csv(filtered) if filtered else None
+    except Exception as e:
+        print(f"Error reading data: {e}")
+        return None
+
+    conn = connect_to_database()
+    if conn is None:
+        return None
+
+    try:
+        with conn.cursor() as cur:
+            report = merge_frame(cur, df, mode)
+
+            below_threshold = None
+            if dropped is not None:
+                with LOAD_STAGE_SECONDS.time(stage="filtered"):
+                    below_threshold, _ = record_filtered(cur, dropped)
+
+            deleted = None
+            if ranking is not None:
+                with LOAD_STAGE_SECONDS.time(stage="prune"):
+                    deleted = prune_companies(cur, ranking)
+
+        with LOAD_STAGE_SECONDS.time(stage="commit"):
+            conn.commit()
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+    total = sum(report.values())
+    if below_threshold is not None:
+        report["deleted_below_threshold"] = below_threshold
+    if deleted is not None:
+        report["deleted"] = deleted
+    for outcome, rows in report.items():
+        LOADED_ROWS.inc(rows, outcome=outcome)
+    seconds = time.perf_counter() - start
+    LOAD_STAGE_SECONDS.observe(seconds, stage="total")
+    print(f"Rows inserted: {report['inserted']}, updated: {report['updated']}, skipped: {report['skipped']}.")
+    if report["rejected"] or report["duplicates"]:
+        print(f"Rows rejected without a CIF or a name: {report['rejected']}, "
+              f"replaced by a later row of the same CIF: {report['duplicates']}.")
+    if below_threshold is not None:
+        print(f"Filtered companies recorded: {len(dropped)}, rows deleted below the threshold: {below_threshold}.")
+    if deleted is not None:
+        print(f"Rows deleted because they left the ranking: {deleted}.")
+    print(f"Loaded {total} rows in {seconds:.2f}s ({total / seconds if seconds else 0:.0f} rows/s).")
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load the scraped companies into the 'companies' table.")
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default=None,
+        help="CSV or Parquet file written by the scraper, defaults to scrap_job/companies.csv.",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=list(UPSERT_ACTIONS),
+        default="skip",
+        help="What to do with companies whose CIF is already stored (default: skip); use 'sync' "
+             "after scrap.py --delta.",
+    )
+    parser.add_argument(
+        "--prune",
+        default=None,
+        metavar="RANKING_LIST",
+        help="Delete the scraped companies missing from this ranking list (written by scrap.py --delta "
+             "from a full crawl).",
+    )
+    parser.add_argument(
+        "--filtered",
+        default=None,
+        metavar="FILTERED_LIST",
+        help="With --mode sync, the companies filtered out by scrap.py --delta with a file sink, recorded so "
+             "that the next delta sync does not scrape them again.",
+    )
+    parser.add_argument(
+        "--metrics-report",
+        default=None,
+        help="Write the time of every stage and the row counts to this JSON file.",
+    )
+    parser.add_argument(
+        "--create-only",
+        action="store_true",
+        help="Only create the 'companies' table, its indexes and triggers, without loading a file.",
+    )
+    args = parser.parse_args(argv)
+
+    if args.filtered and args.mode != "sync":
+        parser.error("--filtered needs --mode sync.")
+
+    return args
+
 if __name__ == "__main__":
+    args = parse_args()
     create_table()
-    insert_data()
\ No newline at end of file
+    if not args.create_only:
+        bulk_load_data(args.path, args.mode, args.prune, args.filtered)
+    if args.metrics_report:
+        registry.write_report(args.metrics_report)
\ No newline at end of file
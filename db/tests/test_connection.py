@@ -32,4 +32,4 @@ def test_connect_to_database_failure(mock_connect):
         "DB_PASSWORD": "test_password",
     }):
         result = connect_to_database()
-        assert result is None
\ No newline at end of file
+        assert result is None
@@ -1,7 +1,8 @@
 import os
 import pandas as pd
+import pytest
 from unittest.mock import patch, MagicMock
-from db.load_companies import create_table, insert_data
+from db.load_companies import bulk_load_data, create_table, insert_data, parse_args, record_filtered
 
 @patch("db.load_companies.connect_to_database")
 def test_create_table_success(mock_connect):
@@ -100,4 +101,247 @@ def test_insert_data_error(mock_read_csv, mock_connect):
     with patch("db.load_companies.CSV_FILE", "dummy_path.csv"):
         insert_data()
         # Verify that the error was handled gracefully
-        mock_cursor.execute.assert_not_called()
\ No newline at end of file
+        mock_cursor.execute.assert_not_called()
+
+
+@patch("db.load_companies.connect_to_database")
+@patch("pandas.read_csv")
+def test_bulk_load_data_copies_and_upserts(mock_read_csv, mock_connect):
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    # 3 distinct CIFs merged out of the 4 rows, one row has no CIF
+    mock_cursor.fetchone.return_value = (2, 1, 3, 1, 4)
+    mock_connect.return_value = mock_conn
+    mock_read_csv.return_value = pd.DataFrame({
+        "Nombre de la empresa": ["Company A", "Company B", "Company C", "Company D"],
+        "Fuente de la información EBITDA": ["http://example.com"] * 4,
+        "Fuente de la información CIF": ["http://example.com"] * 4,
+        "CIF": ["A12345678", "B12345678", "C12345678", None],
+        "EBITDA 2023": [1000000, 2000000, 3000000, 4000000],
+    })
+
+    with patch("db.load_companies.CSV_FILE", "dummy_path.csv"):
+        report = bulk_load_data(mode="update-if-changed")
+
+    # The row without a CIF is rejected, not counted as an unchanged one
+    assert report == {"inserted": 2, "updated": 1, "skipped": 0, "rejected": 1, "duplicates": 0}
+
+    # All the rows are sent in one COPY, without a statement per row
+    copy_sql, buffer = mock_cursor.copy_expert.call_args[0]
+    assert copy_sql.startswith("COPY companies_staging (company_name, ebitda_source, cif_source, cif, ebitda_2023)")
+    lines = buffer.getvalue().decode().splitlines()
+    assert lines[0] == '"Company A","http://example.com","http://example.com","A12345678",1000000'
+    assert lines[3] == '"Company D","http://example.com","http://example.com",,4000000'
+
+    merge_sql = " ".join(mock_cursor.execute.call_args[0][0].split())
+    assert "ON CONFLICT (cif) DO UPDATE SET" in merge_sql
+    assert "IS DISTINCT FROM" in merge_sql
+    assert mock_cursor.execute.call_count == 2
+    mock_conn.commit.assert_called_once()
+    mock_conn.close.assert_called_once()
+
+@patch("db.load_companies.connect_to_database")
+@patch("pandas.read_csv")
+def test_bulk_load_data_skip_mode(mock_read_csv, mock_connect):
+    mock_cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchone.return_value = (0, 0, 0, 0, 0)
+    mock_read_csv.return_value = pd.DataFrame(columns=[
+        "Nombre de la empresa", "Fuente de la información EBITDA", "Fuente de la información CIF", "CIF", "EBITDA 2023",
+    ])
+
+    assert bulk_load_data(mode="skip") == {"inserted": 0, "updated": 0, "skipped": 0, "rejected": 0, "duplicates": 0}
+    assert "ON CONFLICT (cif) DO NOTHING" in mock_cursor.execute.call_args[0][0]
+
+@patch("db.load_companies.connect_to_database")
+@patch("pandas.read_csv")
+def test_bulk_load_data_rolls_back_on_error(mock_read_csv, mock_connect):
+    mock_conn = mock_connect.return_value
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.copy_expert.side_effect = Exception("COPY failed")
+    mock_read_csv.return_value = pd.DataFrame({
+        "Nombre de la empresa": ["Company A"],
+        "Fuente de la información EBITDA": ["http://example.com"],
+        "Fuente de la información CIF": ["http://example.com"],
+        "CIF": ["A12345678"],
+        "EBITDA 2023": [1000000],
+    })
+
+    assert bulk_load_data() is None
+    mock_conn.rollback.assert_called_once()
+    mock_conn.commit.assert_not_called()
+    mock_conn.close.assert_called_once()
+
+def test_bulk_load_data_rejects_unknown_modes():
+    with pytest.raises(ValueError):
+        bulk_load_data(mode="merge")
+
+@patch("db.load_companies.connect_to_database")
+def test_create_table_creates_pagination_indexes(mock_connect):
+    mock_cursor = mock_connect.return_value.cursor.return_value
+
+    create_table()
+
+    statements = [call.args[0] for call in mock_cursor.execute.call_args_list]
+    assert "CREATE INDEX IF NOT EXISTS companies_ebitda_cif_idx ON companies (ebitda_2023, cif);" in statements
+    assert "CREATE INDEX IF NOT EXISTS companies_name_cif_idx ON companies (company_name, cif);" in statements
+
+
+@patch("db.load_companies.connect_to_database")
+def test_create_table_creates_the_name_search_index(mock_connect):
+    mock_cursor = mock_connect.return_value.cursor.return_value
+
+    create_table()
+
+    statements = " ".join(call.args[0] for call in mock_cursor.execute.call_args_list)
+    assert "CREATE EXTENSION IF NOT EXISTS pg_trgm;" in statements
+    assert "CREATE OR REPLACE FUNCTION companies_search_key(name TEXT)" in statements
+    assert "USING GIN (companies_search_key(company_name) gin_trgm_ops)" in statements
+
+
+@patch("db.load_companies.connect_to_database")
+def test_create_table_without_the_search_extensions(mock_connect, capsys):
+    mock_conn = mock_connect.return_value
+    mock_cursor = mock_conn.cursor.return_value
+
+    def execute(sql, params=None):
+        if sql.startswith("CREATE EXTENSION"):
+            raise Exception('extension "pg_trgm" is not available')
+    mock_cursor.execute.side_effect = execute
+
+    create_table()
+
+    # The table, its columns and triggers are committed before the search is set up
+    statements = [call.args[0] for call in mock_cursor.execute.call_args_list]
+    assert statements.index("CREATE EXTENSION IF NOT EXISTS pg_trgm;") > max(
+        i for i, sql in enumerate(statements) if "CREATE TRIGGER companies_notify_truncate" in sql
+    )
+    mock_conn.commit.assert_called_once()
+    mock_conn.rollback.assert_called_once()
+    mock_conn.close.assert_called_once()
+    output = capsys.readouterr().out
+    assert "Name search unavailable" in output
+    assert "Error creating table" not in output
+
+
+@patch("db.load_companies.connect_to_database")
+def test_create_table_adds_the_delta_sync_columns(mock_connect):
+    mock_cursor = mock_connect.return_value.cursor.return_value
+
+    create_table()
+
+    statements = " ".join(call.args[0] for call in mock_cursor.execute.call_args_list)
+    assert "ALTER TABLE companies ADD COLUMN IF NOT EXISTS last_scraped_at TIMESTAMPTZ;" in statements
+    assert "ADD COLUMN IF NOT EXISTS content_hash TEXT" in statements
+    assert "CREATE OR REPLACE FUNCTION companies_content_hash(" in statements
+    assert "CREATE TABLE IF NOT EXISTS scrap_tombstones" in statements
+
+
+@patch("db.load_companies.connect_to_database")
+@patch("pandas.read_csv")
+def test_bulk_load_data_sync_mode_refreshes_unchanged_rows_and_prunes(mock_read_csv, mock_connect, tmp_path):
+    mock_cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchone.return_value = (1, 1, 3, 0, 3)
+    mock_cursor.rowcount = 2
+    mock_read_csv.return_value = pd.DataFrame({
+        "Nombre de la empresa": ["Company A", "Company B", "Company C"],
+        "Fuente de la información EBITDA": ["http://example.com/a", "http://example.com/b", "http://example.com/c"],
+        "Fuente de la información CIF": ["http://example.com"] * 3,
+        "CIF": ["A12345678", "B12345678", "C12345678"],
+        "EBITDA 2023": [1000000, 2000000, 3000000],
+    })
+    ranking_list = tmp_path / "companies.ranking.txt"
+    ranking_list.write_text("http://example.com/a\nhttp://example.com/b\nhttp://example.com/c\n")
+
+    report = bulk_load_data("dummy_path.csv", mode="sync", prune=str(ranking_list))
+
+    assert report == {"inserted": 1, "updated": 1, "skipped": 1, "rejected": 0, "duplicates": 0, "deleted": 2}
+    statements = [" ".join(call.args[0].split()) for call in mock_cursor.execute.call_args_list]
+    assert any("WHERE companies.content_hash IS DISTINCT FROM companies_content_hash(" in sql for sql in statements)
+    assert any(sql.startswith("UPDATE companies SET last_scraped_at = now()") for sql in statements)
+    assert statements[-1].startswith("DELETE FROM companies WHERE last_scraped_at IS NOT NULL")
+    assert statements[-2].startswith("DELETE FROM scrap_tombstones WHERE NOT EXISTS")
+
+    copy_sql, buffer = mock_cursor.copy_expert.call_args[0]
+    assert copy_sql == "COPY companies_ranking (url) FROM STDIN"
+    assert sorted(buffer.getvalue().decode().splitlines()) == [
+        "http://example.com/a", "http://example.com/b", "http://example.com/c",
+    ]
+
+
+@patch("db.load_companies.connect_to_database")
+def test_bulk_load_data_does_not_prune_with_an_empty_ranking_list(mock_connect, tmp_path):
+    ranking_list = tmp_path / "companies.ranking.txt"
+    ranking_list.write_text("")
+
+    assert bulk_load_data(str(tmp_path / "companies.csv"), mode="sync", prune=str(ranking_list)) is None
+    mock_connect.assert_not_called()
+
+
+def test_record_filtered_deletes_rows_below_the_threshold_and_refreshes_the_others():
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = (1, 1)
+    dropped = pd.DataFrame({
+        "Nombre de la empresa": ["SMALL SL", "NO CIF SA", "SMALL SL"],
+        "Fuente de la información EBITDA": [
+            "http://example.com/small", "http://example.com/no-cif", "http://example.com/small",
+        ],
+        "below_threshold": [False, False, True],
+    })
+
+    assert record_filtered(mock_cursor, dropped) == (1, 1)
+
+    sql, params = mock_cursor.execute.call_args.args
+    sql = " ".join(sql.split())
+    assert "INSERT INTO scrap_tombstones (url, company_name, scraped_at)" in sql
+    assert "WHERE companies.ebitda_source = dropped.url AND dropped.below_threshold" in sql
+    assert "UPDATE companies SET last_scraped_at = now()" in sql
+    # A URL scraped twice keeps its last outcome
+    assert params == (
+        ["http://example.com/small", "http://example.com/no-cif"], ["SMALL SL", "NO CIF SA"], [True, False]
+    )
+
+
+def test_record_filtered_without_companies():
+    mock_cursor = MagicMock()
+    dropped = pd.DataFrame(columns=["Nombre de la empresa", "Fuente de la información EBITDA", "below_threshold"])
+
+    assert record_filtered(mock_cursor, dropped) == (0, 0)
+    mock_cursor.execute.assert_not_called()
+
+
+def test_parse_args_create_only():
+    # entry_point.sh creates the table before the API starts, without loading a file
+    args = parse_args(["--create-only"])
+
+    assert args.create_only
+    assert parse_args([]).create_only is False
+
+
+@patch("db.load_companies.record_filtered")
+@patch("db.load_companies.connect_to_database")
+def test_bulk_load_data_records_the_filtered_companies(mock_connect, mock_record_filtered, tmp_path):
+    mock_cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchone.return_value = (0, 0, 0, 0, 0)
+    mock_record_filtered.return_value = (1, 0)
+    path = tmp_path / "companies.csv"
+    pd.DataFrame(columns=["Nombre de la empresa", "Fuente de la información EBITDA", "Fuente de la información CIF",
+                          "CIF", "EBITDA 2023"]).to_csv(path, index=False)
+    filtered = tmp_path / "companies.filtered.csv"
+    filtered.write_text(
+        "Nombre de la empresa,Fuente de la información EBITDA,below_threshold\n"
+        "SMALL SL,http://example.com/small,True\n"
+    )
+
+    report = bulk_load_data(str(path), mode="sync", filtered=str(filtered))
+
+    assert report["deleted_below_threshold"] == 1
+    dropped = mock_record_filtered.call_args.args[1]
+    assert dropped.values.tolist() == [["SMALL SL", "http://example.com/small", True]]
+    mock_connect.return_value.commit.assert_called_once()
+
+
+def test_filtered_companies_need_the_sync_mode():
+    with pytest.raises(ValueError):
+        bulk_load_data("companies.csv", mode="skip", filtered="companies.filtered.csv")
+    with pytest.raises(SystemExit):
+        parse_args(["--filtered", "companies.filtered.csv"])
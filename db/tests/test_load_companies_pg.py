@@ -0,0 +1,188 @@
+import os
+import json
+import select
+import pandas as pd
+import psycopg2
+import pytest
+from unittest.mock import patch
+from db.load_companies import FILE_COLUMNS, bulk_load_data, create_table, record_filtered
+from scrap_job.delta import load_scraped_companies
+
+# These tests run the loader's SQL (the upsert modes, the content hash, the triggers and the
+# tombstones) against a real PostgreSQL with the pg_trgm and unaccent extensions. They only
+# run when TEST_DATABASE_URL points to a throwaway database, e.g.
+#   TEST_DATABASE_URL=postgresql://postgres@localhost:5432/loader_test python -m pytest db/tests
+# Its 'companies', 'scrap_tombstones' and 'companies_version' tables are dropped before and
+# after every test.
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+MERCADONA = ("MERCADONA SA", "https://example.com/MERCADONA.html", "https://example.com/MERCADONA.html",
+             "A46103834", 1956941000)
+SEAT = ("SEAT SA", "https://example.com/SEAT.html", "https://example.com/SEAT.html", "A28049161", 1111000000.5)
+
+
+def connect():
+    return psycopg2.connect(DATABASE_URL)
+
+
+def drop_tables():
+    conn = connect()
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS companies, scrap_tombstones, companies_version;")
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def database():
+    drop_tables()
+    with patch("db.load_companies.connect_to_database", connect), patch("scrap_job.delta.connect_to_database", connect):
+        create_table()
+        yield
+    drop_tables()
+
+
+def query(sql, params=None):
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def write_companies(path, rows):
+    pd.DataFrame(rows, columns=FILE_COLUMNS).to_csv(path, index=False)
+    return str(path)
+
+
+def test_create_table_twice(database):
+    # Every run of the loader and of the scraper's database sink creates the table again
+    with patch("db.load_companies.connect_to_database", connect):
+        create_table()
+
+    columns = {name for name, in query(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = 'companies'"
+    )}
+    assert {"last_scraped_at", "content_hash"} <= columns
+
+
+def test_sync_mode_only_rewrites_changed_rows(database, tmp_path):
+    path = write_companies(tmp_path / "companies.csv", [MERCADONA, SEAT])
+    assert bulk_load_data(path, mode="sync") == {
+        "inserted": 2, "updated": 0, "skipped": 0, "rejected": 0, "duplicates": 0,
+    }
+    (first_scrape,), = query("SELECT last_scraped_at FROM companies WHERE cif = 'A46103834'")
+
+    # 1956941000.0 is the same EBITDA as 1956941000, SEAT's changed
+    path = write_companies(tmp_path / "companies.csv", [
+        MERCADONA[:4] + (1956941000.0,),
+        SEAT[:4] + (1200000000,),
+    ])
+    assert bulk_load_data(path, mode="sync") == {
+        "inserted": 0, "updated": 1, "skipped": 1, "rejected": 0, "duplicates": 0,
+    }
+
+    rows = dict(query("SELECT cif, ebitda_2023 FROM companies"))
+    assert rows == {"A46103834": 1956941000, "A28049161": 1200000000}
+    (second_scrape,), = query("SELECT last_scraped_at FROM companies WHERE cif = 'A46103834'")
+    assert second_scrape > first_scrape
+
+
+def test_rejected_and_duplicate_rows_are_not_skipped_ones(database, tmp_path):
+    path = write_companies(tmp_path / "companies.csv", [
+        MERCADONA[:4] + (1,),
+        MERCADONA,
+        SEAT[:3] + (None, SEAT[4]),
+        SEAT,
+    ])
+
+    assert bulk_load_data(path, mode="update-if-changed") == {
+        "inserted": 2, "updated": 0, "skipped": 0, "rejected": 1, "duplicates": 1,
+    }
+    # The last row of a CIF wins
+    assert dict(query("SELECT cif, ebitda_2023 FROM companies"))["A46103834"] == 1956941000
+
+
+def test_unchanged_rows_are_not_announced(database, tmp_path):
+    path = write_companies(tmp_path / "companies.csv", [MERCADONA, SEAT])
+    bulk_load_data(path, mode="sync")
+
+    listener = connect()
+    listener.autocommit = True
+    listener.cursor().execute("LISTEN companies_changed;")
+    path = write_companies(tmp_path / "companies.csv", [MERCADONA, SEAT[:4] + (1200000000,)])
+    bulk_load_data(path, mode="sync")
+
+    select.select([listener], [], [], 5)
+    listener.poll()
+    payloads = [notify.payload for notify in listener.notifies]
+    listener.close()
+    assert len(payloads) == 1
+    payload = json.loads(payloads[0])
+    assert payload["cif"] == "A28049161"
+    # One version per transaction, the one the API builds its ETags from
+    (epoch, version), = query("SELECT epoch, version FROM companies_version")
+    assert (payload["epoch"], payload["version"]) == (epoch, version) == (epoch, 2)
+
+
+def test_prune_keeps_rows_that_were_not_scraped(database, tmp_path):
+    conn = connect()
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO companies (company_name, ebitda_source, cif_source, cif, ebitda_2023)
+            VALUES ('MANUAL SL', NULL, NULL, 'B82508441', 5000000);
+        """)
+    conn.commit()
+    conn.close()
+    path = write_companies(tmp_path / "companies.csv", [MERCADONA, SEAT])
+    bulk_load_data(path, mode="sync")
+    ranking_list = tmp_path / "companies.ranking.txt"
+    ranking_list.write_text(MERCADONA[1] + "\n")
+
+    report = bulk_load_data(write_companies(tmp_path / "empty.csv", []), mode="sync", prune=str(ranking_list))
+
+    assert report["deleted"] == 1
+    assert {cif for cif, in query("SELECT cif FROM companies")} == {"A46103834", "B82508441"}
+
+
+def test_filtered_companies_are_known_to_the_delta_sync(database, tmp_path):
+    path = write_companies(tmp_path / "companies.csv", [MERCADONA, SEAT])
+    bulk_load_data(path, mode="sync")
+    dropped = pd.DataFrame({
+        "Nombre de la empresa": ["MERCADONA SA", "SEAT SA", "SMALL SL"],
+        "Fuente de la información EBITDA": [MERCADONA[1], SEAT[1], "https://example.com/SMALL.html"],
+        "below_threshold": [True, False, True],
+    })
+
+    conn = connect()
+    with conn.cursor() as cur:
+        # Mercadona fell below the threshold, SEAT's CIF could not be read, SMALL is new
+        assert record_filtered(cur, dropped) == (1, 1)
+    conn.commit()
+    conn.close()
+
+    assert {cif for cif, in query("SELECT cif FROM companies")} == {"A28049161"}
+    known = load_scraped_companies()
+    assert set(known) == {MERCADONA[1], SEAT[1], "https://example.com/SMALL.html"}
+    assert all(scraped_at is not None for _, scraped_at in known.values())
+
+
+def test_filtered_list_of_a_file_sink_is_recorded(database, tmp_path):
+    bulk_load_data(write_companies(tmp_path / "companies.csv", [MERCADONA, SEAT]), mode="sync")
+    # What scrap.py --delta --sink csv lists next to its output
+    filtered = tmp_path / "companies.filtered.csv"
+    pd.DataFrame({
+        "Nombre de la empresa": ["MERCADONA SA", "SMALL SL"],
+        "Fuente de la información EBITDA": [MERCADONA[1], "https://example.com/SMALL.html"],
+        "below_threshold": [True, True],
+    }).to_csv(filtered, index=False)
+
+    report = bulk_load_data(write_companies(tmp_path / "empty.csv", []), mode="sync", filtered=str(filtered))
+
+    assert report["deleted_below_threshold"] == 1
+    assert {cif for cif, in query("SELECT cif FROM companies")} == {"A28049161"}
+    assert "https://example.com/SMALL.html" in load_scraped_companies()
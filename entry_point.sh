@@ -33,21 +33,20 @@ cd /app
 echo "Running database creation script"
 poetry run python3 /app/db/creation.py
 
-# Run scraping script with proper display
-echo "Running scrape script"
-poetry run python3 /app/scrap_job/scrap.py
-
-# Moving file to expected location
-mkdir -p /app/scrap_job/
-cp companies.csv /app/scrap_job/companies.csv
-
-# Run database loading script 
-echo "Running database loading script"
-poetry run python3 /app/db/load_companies.py
+# Create the 'companies' table before the API serves it, whether or not the scraper gets to
+# write anything
+echo "Creating the companies table"
+poetry run python3 /app/db/load_companies.py --create-only
 
-# Start the FastAPI application
+# Start the FastAPI application first, it serves the companies as the scraper writes them
 echo "Starting FastAPI application"
-poetry run uvicorn api.main:app --host 0.0.0.0 --port 8000
+poetry run uvicorn api.main:app --host 0.0.0.0 --port 8000 &
+API_PID=$!
+
+# Run scraping script; only companies that are new, stale or renamed compared to the
+# database are scraped again, and they are written straight into the 'companies' table
+echo "Running scrape script"
+poetry run python3 /app/scrap_job/scrap.py --delta --sink postgres
 
 # Keep the container running
-tail -f /dev/null
\ No newline at end of file
+wait $API_PID
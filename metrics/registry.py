@@ -0,0 +1,240 @@
+import json
+import time
+import threading
+from bisect import bisect_left
+
+# Upper bounds, in seconds, of the latency histograms
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} expects the labels {', '.join(self.labels) or '(none)'}")
+        try:
+            return tuple(str(labels[label]) for label in self.labels)
+        except KeyError:
+            raise ValueError(f"{self.name} expects the labels {', '.join(self.labels)}")
+
+    def label_dict(self, key):
+        return dict(zip(self.labels, key))
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+
+
+class Counter(Metric):
+    """
+    Value that only goes up, e.g. requests served or rows loaded.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self.lock:
+            return self.values.get(self.key(labels), 0)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in sorted(self.values.items())]
+
+    def summary(self):
+        with self.lock:
+            return [{"labels": self.label_dict(key), "value": value} for key, value in sorted(self.values.items())]
+
+
+class Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values, e.g. latencies, counted in cumulative buckets like the
+    Prometheus histograms. Observing is a bisect and three additions under a lock.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # One count per bucket plus the +Inf bucket, then the sum
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def time(self, **labels):
+        """
+        Context manager that observes the seconds spent in its block.
+        """
+        return Timer(self, labels)
+
+    def count(self, **labels):
+        with self.lock:
+            entry = self.values.get(self.key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def quantile(self, q, counts):
+        """
+        Estimates a quantile from the bucket counts, interpolating inside the bucket like
+        Prometheus' histogram_quantile().
+        """
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                low = self.buckets[index - 1] if index else 0.0
+                return low + (self.buckets[index] - low) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (format_bound(bound),), cumulative))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+    def summary(self):
+        with self.lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self.values.items())
+        return [
+            {
+                "labels": self.label_dict(key),
+                "count": sum(counts),
+                "sum": round(total, 6),
+                "mean": round(total / sum(counts), 6),
+                "p50": self.quantile(0.5, counts),
+                "p95": self.quantile(0.95, counts),
+                "p99": self.quantile(0.99, counts),
+            }
+            for key, (counts, total) in items
+        ]
+
+
+def format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Registry:
+    """
+    The metrics of one process, by name. Metrics are created on first use and shared by every
+    module that asks for the same name.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def get(self, cls, name, help, labels=(), **options):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labels, **options)
+            elif not isinstance(metric, cls) or metric.labels != tuple(labels):
+                raise ValueError(f"Metric {name} is already registered with another type or labels")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self.get(Counter, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        """
+        Renders every metric in the Prometheus text exposition format.
+        """
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            labels = metric.labels + (("le",) if metric.kind == "histogram" else ())
+            for name, key, value in metric.samples():
+                names = labels if len(key) == len(labels) else metric.labels
+                label_text = ",".join(f'{label}="{escape(part)}"' for label, part in zip(names, key))
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """
+        Summarizes every metric: counters with their values, histograms with their count, sum,
+        mean and estimated p50 / p95 / p99.
+
+        Output:
+            dict: {"counters": {name: [...]}, "histograms": {name: [...]}}
+        """
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        report = {"counters": {}, "histograms": {}}
+        for metric in metrics:
+            summary = metric.summary()
+            if summary:
+                report[f"{metric.kind}s"][metric.name] = summary
+        return report
+
+    def write_report(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
+
+    def reset(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+registry = Registry()
+counter = registry.counter
+histogram = registry.histogram
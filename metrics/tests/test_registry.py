@@ -0,0 +1,59 @@
+import json
+import pytest
+from metrics.registry import Registry
+
+
+def test_counter():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.", ("outcome",))
+
+    requests.inc(outcome="ok")
+    requests.inc(2, outcome="ok")
+    requests.inc(outcome="error")
+
+    assert requests.value(outcome="ok") == 3
+    assert registry.counter("requests_total", "Requests.", ("outcome",)) is requests
+    assert 'requests_total{outcome="ok"} 3' in registry.render()
+
+
+def test_labels_are_checked():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.", ("outcome",))
+
+    with pytest.raises(ValueError):
+        requests.inc(status="ok")
+    with pytest.raises(ValueError):
+        registry.histogram("requests_total", "Requests.")
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", ("endpoint",), buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.5, 0.7, 3.0):
+        latency.observe(value, endpoint="read")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{endpoint="read",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{endpoint="read",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{endpoint="read",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{endpoint="read"} 4' in lines
+
+
+def test_report_estimates_percentiles(tmp_path):
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 0.2, 0.4))
+    for value in [0.05] * 50 + [0.15] * 45 + [0.3] * 5:
+        latency.observe(value)
+    registry.counter("unused_total", "Never incremented.")
+
+    registry.write_report(tmp_path / "metrics.json")
+    report = json.loads((tmp_path / "metrics.json").read_text())
+
+    summary = report["histograms"]["latency_seconds"][0]
+    assert summary["count"] == 100
+    assert summary["p50"] == pytest.approx(0.1)
+    assert summary["p95"] == pytest.approx(0.2)
+    assert 0.2 < summary["p99"] <= 0.4
+    assert report["counters"] == {}
@@ -0,0 +1,267 @@
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from contextlib import nullcontext, redirect_stdout
+from scrap_job import scrap
+from scrap_job.browsers import BrowserPool
+from scrap_job.cache import ResponseCache
+from scrap_job.fetchers import HttpFetcher, SeleniumFetcher
+from scrap_job.journal import RunJournal
+from scrap_job.parsers import parse_ranking
+from scrap_job.replay import ReplayServer, ReplaySite, replaying
+from scrap_job.sinks import CsvSink
+
+
+MODES = ("http", "cached", "selenium")
+
+# Page kinds of the fetcher -> stage of the report
+STAGES = {"ebitda": "company_pages", "cif": "cif_pages"}
+
+
+class TimedFetcher:
+    """
+    Wraps a fetcher and adds up the time spent in each kind of page. With several workers the
+    times are summed over all of them, like the rate-limit waits of the scraper.
+    """
+
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+        self.concurrent = fetcher.concurrent
+        self.seconds = {}
+        self.lock = threading.Lock()
+
+    def fetch(self, url, ready=None):
+        start = time.perf_counter()
+        try:
+            return self.fetcher.fetch(url, ready)
+        finally:
+            elapsed = time.perf_counter() - start
+            stage = STAGES.get(ready, ready or "pages")
+            with self.lock:
+                self.seconds[stage] = self.seconds.get(stage, 0.0) + elapsed
+
+    def close(self):
+        self.fetcher.close()
+
+
+class TimedSink:
+    """
+    Wraps a result sink and measures the time spent transforming and writing the output.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.seconds = 0.0
+
+    def write(self, result):
+        start = time.perf_counter()
+        self.sink.write(result)
+        self.seconds += time.perf_counter() - start
+
+    def close(self):
+        start = time.perf_counter()
+        self.sink.close()
+        self.seconds += time.perf_counter() - start
+
+
+def crawl_ranking(fetcher, pages):
+    """
+    Reads the ranking pages as static HTML; the real run uses the browser only for the cookie
+    banner, the table is the same.
+    """
+    companies = []
+    for page in range(1, pages + 1):
+        url = scrap.ranking_page_url(page)
+        company_data = parse_ranking(fetcher.fetch(url) or "", url)
+        if not company_data:
+            break
+        companies.extend(company_data)
+    return companies
+
+
+def make_fetcher(mode, workers, directory):
+    if mode == "selenium":
+        # One headless browser per worker
+        return SeleniumFetcher(BrowserPool(workers, hosts=scrap.browser_hosts()))
+
+    cache = None
+    if mode == "cached":
+        cache = ResponseCache(f"{directory}/cache")
+        # An untimed first pass fills the cache, the measured one is served from it
+        warm_up = HttpFetcher(pool_size=workers * 4, cache=cache)
+        run_scraper(warm_up, crawl_ranking(warm_up, sys.maxsize), workers, directory)
+        warm_up.close()
+    return HttpFetcher(pool_size=workers * 4, cache=cache)
+
+
+def run_scraper(fetcher, companies, workers, directory):
+    journal = RunJournal(f"{directory}/companies.journal.jsonl")
+    sink = TimedSink(CsvSink(f"{directory}/companies.csv"))
+    try:
+        count = scrap.scrape_pending(fetcher, companies, journal, workers=workers, sink=sink)
+    finally:
+        sink.close()
+    return count, sink
+
+
+def run_mode(server, mode, workers, pages, memory=True, verbose=False):
+    """
+    Runs the scraper once against the replay server.
+
+    Input:
+        server (ReplayServer): The running replay server.
+        mode (str): 'http' (every page downloaded), 'cached' (every page from a warm page cache)
+                    or 'selenium' (detail pages opened in a pool of headless Firefox sessions).
+        workers (int): Number of companies scraped concurrently, and of browsers for selenium.
+        pages (int): Number of ranking pages to crawl.
+        memory (bool): Trace Python allocations to report the peak memory; it slows the run down.
+        verbose (bool): Keep the output of the scraper.
+
+    Output:
+        dict: Companies, seconds, companies per second, time per stage, peak memory and the
+              requests served.
+    """
+    with tempfile.TemporaryDirectory() as directory, replaying(server):
+        with nullcontext() if verbose else redirect_stdout(io.StringIO()):
+            fetcher = make_fetcher(mode, workers, directory)
+            timed = TimedFetcher(fetcher)
+            requests_before = total_requests(server)
+            if memory:
+                tracemalloc.start()
+
+            start = time.perf_counter()
+            try:
+                ranking_start = time.perf_counter()
+                companies = crawl_ranking(fetcher, pages)
+                ranking_seconds = time.perf_counter() - ranking_start
+                count, sink = run_scraper(timed, companies, workers, directory)
+            finally:
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] if memory else None
+                if memory:
+                    tracemalloc.stop()
+                timed.close()
+                if mode == "selenium":
+                    fetcher.browsers.close()
+
+    stages = {"ranking": ranking_seconds, **timed.seconds, "output": sink.seconds}
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "companies": count,
+        "seconds": round(seconds, 3),
+        "companies_per_second": round(count / seconds, 2) if seconds else None,
+        "stages": {stage: round(value, 3) for stage, value in stages.items()},
+        "peak_memory_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+        "requests": total_requests(server) - requests_before,
+    }
+
+
+def total_requests(server):
+    with server.lock:
+        return sum(stats["requests"] for stats in server.stats.values())
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lists the runs whose throughput dropped more than `tolerance` (a fraction) below the same
+    mode and workers in a previous report.
+    """
+    previous = {(run["mode"], run["workers"]): run for run in baseline}
+    regressions = []
+    for run in results:
+        before = previous.get((run["mode"], run["workers"]))
+        if not before or not before.get("companies_per_second") or run["companies_per_second"] is None:
+            continue
+        if run["companies_per_second"] < before["companies_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{run['mode']} x{run['workers']}: {run['companies_per_second']} companies/s, "
+                f"was {before['companies_per_second']}"
+            )
+    return regressions
+
+
+def print_report(results):
+    print(f"{'mode':<10}{'workers':>8}{'companies':>11}{'seconds':>10}{'comp/s':>10}{'peak MB':>10}  stages (s)")
+    for run in results:
+        stages = ", ".join(f"{stage} {seconds:.2f}" for stage, seconds in run["stages"].items())
+        peak = f"{run['peak_memory_mb']:.1f}" if run["peak_memory_mb"] is not None else "-"
+        # A run that took no measurable time has no throughput
+        speed = f"{run['companies_per_second']:.1f}" if run["companies_per_second"] is not None else "-"
+        print(
+            f"{run['mode']:<10}{run['workers']:>8}{run['companies']:>11}{run['seconds']:>10.2f}"
+            f"{speed:>10}{peak:>10}  {stages}"
+        )
+
+
+def workers_list(value):
+    try:
+        workers = [int(item) for item in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid workers '{value}', use e.g. '1,4,8'")
+    if not workers or min(workers) < 1:
+        raise argparse.ArgumentTypeError(f"invalid workers '{value}', use e.g. '1,4,8'")
+    return workers
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against a local replay of the sites.")
+    parser.add_argument("--companies", type=int, default=200, help="Number of companies in the replayed ranking.")
+    parser.add_argument("--page-size", type=int, default=50, help="Companies per ranking page.")
+    parser.add_argument("--modes", default="http,cached", help=f"Comma-separated modes among: {', '.join(MODES)}.")
+    parser.add_argument("--workers", type=workers_list, default=[1, 4, 8], help="Worker counts to measure, e.g. 1,4,8.")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the server waits before every response.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency, up to this many seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 503.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the replayed site and of the injected errors.")
+    parser.add_argument("--no-memory", action="store_true", help="Do not trace allocations (faster, no peak memory).")
+    parser.add_argument("--json", default=None, help="Also write the report to this JSON file.")
+    parser.add_argument("--baseline", default=None, help="JSON report of a previous run to compare the throughput with.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput drop against the baseline.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the scraper.")
+    args = parser.parse_args(argv)
+
+    args.modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    site = ReplaySite(args.companies, args.page_size, seed=args.seed)
+    pages = -(-args.companies // args.page_size)
+
+    results = []
+    with ReplayServer(site, args.latency, args.jitter, args.error_rate, args.seed) as server:
+        for mode in args.modes:
+            for workers in args.workers:
+                try:
+                    results.append(run_mode(server, mode, workers, pages, not args.no_memory, args.verbose))
+                except Exception as e:
+                    print(f"Mode {mode} with {workers} workers failed: {e}")
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Throughput regression: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
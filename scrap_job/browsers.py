@@ -0,0 +1,265 @@
+import os
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote, urlsplit
+from selenium import webdriver
+from selenium.webdriver.firefox.options import Options
+from selenium.webdriver.firefox.service import Service
+from webdriver_manager.firefox import GeckoDriverManager
+from metrics.registry import counter, histogram
+
+
+# geckodriver binary to use, instead of looking it up
+DRIVER_PATH_ENV = "GECKODRIVER_PATH"
+# Where the path found by webdriver-manager is remembered between runs
+DRIVER_PATH_FILE = os.path.join(os.path.expanduser("~"), ".cache", "scrap_job", "geckodriver_path")
+
+# The cookie banner of the ranking is served by Didomi from this domain
+CONSENT_HOSTS = ("privacy-center.org",)
+
+# Lighter sessions: no disk cache, no back/forward cache, one content process
+LEAN_PREFS = {
+    "browser.cache.disk.enable": False,
+    "browser.sessionhistory.max_total_viewers": 0,
+    "browser.sessionhistory.max_entries": 2,
+    "dom.ipc.processCount": 1,
+    "fission.autostart": False,
+    "media.autoplay.default": 5,
+    "privacy.trackingprotection.enabled": True,
+}
+
+# What the scraper never reads: images, stylesheets and downloadable fonts
+BLOCKING_PREFS = {
+    "permissions.default.image": 2,
+    "permissions.default.stylesheet": 2,
+    "gfx.downloadable_fonts.enabled": False,
+    "browser.display.use_document_fonts": 0,
+}
+
+BROWSER_SESSIONS = counter(
+    "scrap_browser_sessions_total", "Browser sessions started and retired, by event.", ("event",)
+)
+BROWSER_START_SECONDS = histogram("scrap_browser_start_seconds", "Time to start a browser session.")
+
+
+def driver_path():
+    """
+    Finds the geckodriver binary without going to the network when possible: the
+    GECKODRIVER_PATH variable, then the geckodriver on the PATH, then the path remembered from a
+    previous run. Only when none of them exists is webdriver-manager asked, which checks the
+    latest release on GitHub, and its answer is remembered for the next runs.
+
+    Output:
+        str: The path of the geckodriver binary.
+    """
+    path = os.environ.get(DRIVER_PATH_ENV) or shutil.which("geckodriver")
+    if path:
+        return path
+
+    try:
+        with open(DRIVER_PATH_FILE, encoding="utf-8") as file:
+            path = file.read().strip()
+        if os.access(path, os.X_OK):
+            return path
+    except OSError:
+        pass
+
+    path = GeckoDriverManager().install()
+    try:
+        os.makedirs(os.path.dirname(DRIVER_PATH_FILE), exist_ok=True)
+        with open(DRIVER_PATH_FILE, "w", encoding="utf-8") as file:
+            file.write(path)
+    except OSError as e:
+        print(f"Could not remember the geckodriver path: {e}")
+    return path
+
+
+def allowed_hosts(*urls):
+    """
+    The hosts a browser may load for the given pages: their domains (subdomains included) and
+    the cookie banner's.
+    """
+    hosts = []
+    for url in urls:
+        host = urlsplit(url).hostname or ""
+        parts = host.split(".")
+        # www.datoscif.es -> datoscif.es; IP addresses and 'localhost' are kept as they are
+        domain = ".".join(parts[-2:]) if len(parts) > 2 and not host.replace(".", "").isdigit() else host
+        if domain and domain not in hosts:
+            hosts.append(domain)
+    return hosts + [host for host in CONSENT_HOSTS if host not in hosts]
+
+
+def blocking_pac(hosts):
+    """
+    Proxy auto-config script that lets the browser reach `hosts` and their subdomains, and sends
+    every other host (ads, trackers, analytics, CDNs of widgets) to a closed local port, so
+    those requests fail at once.
+    """
+    checks = " || ".join(f'host == "{host}" || dnsDomainIs(host, ".{host}")' for host in hosts) or "false"
+    return (
+        "function FindProxyForURL(url, host) { "
+        f"if ({checks}) return 'DIRECT'; "
+        "return 'PROXY 127.0.0.1:9'; }"
+    )
+
+
+def firefox_options(headless=True, block_assets=True, hosts=None):
+    """
+    Options of the scraping browser.
+
+    Input:
+        headless (bool): Run without a display.
+        block_assets (bool): Do not load images, stylesheets and fonts.
+        hosts (list[str] | None): If given, only these hosts (see allowed_hosts()) are reached.
+
+    Output:
+        Options: The Firefox options.
+    """
+    options = Options()
+    # driver.get() returns once the DOM is parsed; the readiness waits decide when a page is
+    # usable, so there is no point in waiting for every subresource
+    options.page_load_strategy = "eager"
+    if headless:
+        options.add_argument("-headless")
+
+    for name, value in LEAN_PREFS.items():
+        options.set_preference(name, value)
+    if block_assets:
+        for name, value in BLOCKING_PREFS.items():
+            options.set_preference(name, value)
+    if hosts:
+        options.set_preference("network.proxy.type", 2)
+        options.set_preference("network.proxy.autoconfig_url", "data:text/javascript," + quote(blocking_pac(hosts)))
+    return options
+
+
+def start_driver(headless=True, block_assets=True, hosts=None):
+    service = Service(driver_path())
+    return webdriver.Firefox(service=service, options=firefox_options(headless, block_assets, hosts))
+
+
+class BrowserSession:
+    """
+    One running browser of a BrowserPool, with the number of pages it has loaded.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        # The cookie banner is accepted once per browser profile
+        self.consented = False
+        self.failed = False
+
+    def alive(self):
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"Error closing the browser: {e}")
+
+
+class BrowserPool:
+    """
+    Long-lived Firefox sessions shared by the threads of a run.
+
+    Sessions are started on first use, up to `size` of them, and lent to one thread at a time
+    for one page load with session(); the most recently used one is lent first. A session is
+    quit and replaced after `max_pages` loads, so the memory a browser accumulates is given
+    back, and as soon as a load fails and the browser no longer answers.
+    """
+
+    def __init__(self, size=1, max_pages=200, headless=True, block_assets=True, hosts=None):
+        self.size = max(size, 1)
+        self.max_pages = max_pages
+        self.headless = headless
+        self.block_assets = block_assets
+        self.hosts = hosts
+        self.idle = []
+        self.started = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.stats = {"started": 0, "recycled": 0, "crashed": 0}
+
+    def checkout(self):
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise RuntimeError("The browser pool is closed.")
+                if self.idle:
+                    return self.idle.pop()
+                if self.started < self.size:
+                    self.started += 1
+                    break
+                self.condition.wait()
+
+        start = time.perf_counter()
+        try:
+            driver = start_driver(self.headless, self.block_assets, self.hosts)
+        except Exception:
+            with self.condition:
+                self.started -= 1
+                self.condition.notify()
+            raise
+        BROWSER_START_SECONDS.observe(time.perf_counter() - start)
+        self.record("started")
+        return BrowserSession(driver)
+
+    def checkin(self, session):
+        session.pages += 1
+        event = None
+        if session.failed and not session.alive():
+            event = "crashed"
+        elif self.max_pages and session.pages >= self.max_pages:
+            event = "recycled"
+        session.failed = False
+
+        with self.condition:
+            if event is None and not self.closed:
+                self.idle.append(session)
+                self.condition.notify()
+                return
+            self.started -= 1
+            self.condition.notify()
+
+        session.quit()
+        if event is not None:
+            self.record(event)
+
+    def record(self, event):
+        BROWSER_SESSIONS.inc(event=event)
+        with self.condition:
+            self.stats[event] += 1
+
+    @contextmanager
+    def session(self):
+        """
+        Lends a browser for one page load, starting one if none is free and fewer than `size`
+        are running, and otherwise waiting for one. Set `failed` on the session when the load
+        went wrong so that a crashed browser is replaced.
+        """
+        session = self.checkout()
+        try:
+            yield session
+        except Exception:
+            session.failed = True
+            raise
+        finally:
+            self.checkin(session)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.started -= len(idle)
+            self.condition.notify_all()
+        for session in idle:
+            session.quit()
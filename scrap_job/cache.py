@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+
+DAY = 24 * 60 * 60
+
+# CIFs practically never change and EBITDA is published once a year,
+# only the ranking itself moves often.
+DEFAULT_TTLS = {
+    "www.datoscif.es": 365 * DAY,
+    "ranking-empresas.eleconomista.es": 30 * DAY,
+}
+RANKING_TTL = DAY
+DEFAULT_TTL = DAY
+# A missing page (404) may be published any day, e.g. a company's datoscif.es page
+NEGATIVE_TTL = DAY
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CacheEntry:
+    def __init__(self, url, body, etag=None, last_modified=None, stored_at=0.0, fresh=False):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.fresh = fresh
+
+
+class ResponseCache:
+    """
+    On-disk cache of downloaded pages, keyed by the SHA-256 of the URL.
+
+    Every entry is a pair of files: '<key>.html' with the body and '<key>.json' with the URL,
+    validators (ETag / Last-Modified) and the time it was stored. An entry is fresh while it is
+    younger than the TTL of its host; stale entries keep their validators so the fetcher can
+    revalidate them with a conditional request. An empty body records a missing page and is
+    only fresh for negative_ttl, whatever its host. When the bodies exceed max_bytes, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, directory, ttls=None, default_ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, clock=time.time,
+                 negative_ttl=NEGATIVE_TTL):
+        self.directory = directory
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, size, _ in self.scan())
+
+    def paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        folder = os.path.join(self.directory, key[:2])
+        return os.path.join(folder, f"{key}.html"), os.path.join(folder, f"{key}.json")
+
+    def ttl_for(self, url):
+        return self.ttls.get(urlsplit(url).netloc, self.default_ttl)
+
+    def get(self, url, ttl=None):
+        """
+        Looks up a cached page.
+
+        Input:
+            url (str): The page URL.
+            ttl (float | None): Overrides the TTL of the URL's host (or the negative TTL), in seconds.
+
+        Output:
+            CacheEntry | None: The entry, with 'fresh' telling whether it can be used without
+                               revalidation, or None if the URL is not cached.
+        """
+        body_path, meta_path = self.paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as file:
+                meta = json.load(file)
+            with open(body_path, encoding="utf-8") as file:
+                body = file.read()
+        except (OSError, ValueError):
+            return None
+
+        # The body's modification time is the last access, used for LRU eviction
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+
+        if ttl is None:
+            ttl = self.negative_ttl if body == "" else self.ttl_for(url)
+        age = self.clock() - meta["stored_at"]
+        return CacheEntry(
+            url,
+            body,
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            stored_at=meta["stored_at"],
+            fresh=age < ttl,
+        )
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """
+        Stores a page, replacing any previous version, and evicts old entries if needed.
+
+        Input:
+            url (str): The page URL.
+            body (str): The page source.
+            etag (str | None): The ETag response header.
+            last_modified (str | None): The Last-Modified response header.
+
+        Output:
+            None
+        """
+        body_path, meta_path = self.paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        try:
+            previous_size = os.path.getsize(body_path)
+        except OSError:
+            previous_size = 0
+        meta = {"url": url, "etag": etag, "last_modified": last_modified, "stored_at": self.clock()}
+
+        # Write to temporary files and rename, so concurrent readers never see half a page
+        for path, content in ((body_path, body), (meta_path, json.dumps(meta))):
+            temporary_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                file.write(content)
+            os.replace(temporary_path, path)
+
+        with self.lock:
+            self.size += os.path.getsize(body_path) - previous_size
+            over_budget = self.size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def refresh(self, url):
+        """
+        Marks a cached page as fresh again after the server answered 304 Not Modified.
+        """
+        entry = self.get(url, ttl=0)
+        if entry is not None:
+            self.put(url, entry.body, entry.etag, entry.last_modified)
+
+    def scan(self):
+        """
+        Lists the cached bodies as (last access time, size, path) tuples.
+        """
+        entries = []
+        for folder, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".html"):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cached bodies use at most 90% of
+        max_bytes, so that eviction does not run again on the very next write.
+        """
+        with self.lock:
+            entries = self.scan()
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                for stale_path in (path, path[:-len(".html")] + ".json"):
+                    try:
+                        os.remove(stale_path)
+                    except OSError:
+                        pass
+                total -= size
+
+            self.size = total
+
+    def count(self, outcome):
+        with self.lock:
+            self.stats[outcome] += 1
+
+    def hit_ratio(self):
+        """
+        Output:
+            float: Share of lookups served from disk (fresh hits and 304 revalidations).
+        """
+        with self.lock:
+            served = self.stats["hits"] + self.stats["revalidated"]
+            total = served + self.stats["misses"]
+        return served / total if total else 0.0
@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import threading
+from db.connection import connect_to_database
+from scrap_job.names import normalize_company_name
+
+
+CIF_PATTERN = re.compile(r"^([ABCDEFGHJNPQRSUVW])(\d{7})([0-9A-J])$")
+CONTROL_LETTERS = "JABCDEFGHI"
+# Organisations whose control character is always a letter, or always a digit
+LETTER_CONTROL = set("NPQRSW")
+DIGIT_CONTROL = set("ABEH")
+
+
+def normalize_cif(cif):
+    """
+    Uppercases a CIF and removes spaces, dots and dashes, e.g. 'a-46.103.834' -> 'A46103834'.
+    """
+    return re.sub(r"[\s.\-]", "", str(cif)).upper()
+
+
+def is_valid_cif(cif):
+    """
+    Checks the format and the control character of a Spanish CIF.
+
+    Input:
+        cif (str): The CIF to check.
+
+    Output:
+        bool: True if the CIF is well formed and its checksum is correct.
+    """
+    match = CIF_PATTERN.match(normalize_cif(cif or ""))
+    if not match:
+        return False
+
+    letter, digits, control = match.groups()
+
+    total = 0
+    for position, digit in enumerate(digits):
+        value = int(digit)
+        if position % 2 == 0:
+            # Odd positions (1st, 3rd...) are doubled and their digits added
+            value = sum(divmod(value * 2, 10))
+        total += value
+    control_digit = (10 - total % 10) % 10
+    control_letter = CONTROL_LETTERS[control_digit]
+
+    if letter in LETTER_CONTROL:
+        return control == control_letter
+    if letter in DIGIT_CONTROL:
+        return control == str(control_digit)
+    return control in (str(control_digit), control_letter)
+
+
+class CifIndex:
+    """
+    Persistent local index from normalized company names to CIFs.
+
+    It is filled from previous runs and from the 'companies' table, so that only companies it
+    does not know need a datoscif.es request. Only CIFs with a valid checksum are stored.
+    Lookups are exact on the normalized name: a near match may be a sibling legal entity
+    ('... SA' and '... SL', '... II' and '... III') with its own CIF, so it is left to datoscif.es.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.stats = {"hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Reads an index saved with save(); a missing or unreadable file gives an empty index.
+        """
+        index = cls(path, **kwargs)
+        try:
+            with open(path, encoding="utf-8") as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return index
+
+        for key, entry in entries.items():
+            index.add(key, entry["cif"], entry.get("slug"))
+        return index
+
+    def save(self):
+        with self.lock:
+            content = json.dumps(self.entries, ensure_ascii=False, indent=0, sort_keys=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(temporary_path, self.path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, company_name, cif, slug=None):
+        """
+        Adds a company to the index.
+
+        Input:
+            company_name (str): The company name, normalized on insertion.
+            cif (str): The company's CIF.
+            slug (str | None): The datoscif.es slug the CIF was found under.
+
+        Output:
+            bool: False if the CIF is invalid and was not stored.
+        """
+        if not is_valid_cif(cif):
+            return False
+
+        key = normalize_company_name(company_name)
+        if not key:
+            return False
+
+        with self.lock:
+            self.entries[key] = {"cif": normalize_cif(cif), "slug": slug}
+        return True
+
+    def add_records(self, records):
+        """
+        Adds the companies of run journal records that have a CIF.
+
+        Input:
+            records (iterable[dict]): Records with 'company_name' and 'cif'.
+
+        Output:
+            int: Number of companies added.
+        """
+        return sum(self.add(record["company_name"], record["cif"]) for record in records)
+
+    def lookup(self, company_name):
+        """
+        Finds the CIF of a company without any network access.
+
+        Input:
+            company_name (str): The company name as shown in the ranking.
+
+        Output:
+            str | None: The CIF, or None if the company is not in the index.
+        """
+        key = normalize_company_name(company_name)
+        if not key:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+            self.stats["hits" if entry else "misses"] += 1
+
+        return entry["cif"] if entry else None
+
+
+def load_companies_table(index):
+    """
+    Adds the companies already stored in the 'companies' table to the index.
+
+    Input:
+        index (CifIndex): The index to fill.
+
+    Output:
+        int: Number of companies added.
+    """
+    conn = connect_to_database()
+    if conn is None:
+        return 0
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT company_name, cif FROM companies")
+            return sum(index.add(company_name, cif) for company_name, cif in cursor)
+    except Exception as error:
+        print(f"Error reading companies for the CIF index: {error}")
+        return 0
+    finally:
+        conn.close()
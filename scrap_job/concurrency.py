@@ -0,0 +1,180 @@
+import time
+import queue
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from metrics.registry import histogram
+
+
+RATE_LIMIT_WAIT_SECONDS = histogram(
+    "scrap_rate_limit_wait_seconds", "Time a request waited for its host's rate limit.", ("host",)
+)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate` acquisitions per second on average,
+    with bursts of up to `capacity` acquisitions.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes one token, blocking until one is available.
+
+        Input:
+            None
+
+        Output:
+            float: Seconds spent waiting for the token.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                missing = (1 - self.tokens) / self.rate
+            self.sleep(missing)
+            waited += missing
+
+
+class HostRateLimiter:
+    """
+    Keeps one token bucket per host, so every domain gets its own request budget.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.total_wait = 0.0
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def wait(self, url):
+        waited = self.bucket_for(url).acquire()
+        RATE_LIMIT_WAIT_SECONDS.observe(waited, host=urlsplit(url).netloc)
+        with self.lock:
+            self.total_wait += waited
+        return waited
+
+
+def map_ordered(func, items, workers=1):
+    """
+    Applies func to every item using a bounded pool of worker threads.
+
+    Input:
+        func (callable): Function called with each item.
+        items (iterable): The items to process.
+        workers (int): Maximum number of items processed at the same time.
+
+    Output:
+        list: The results, in the same order as the input items.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items))
+
+
+def run_pipeline(items, func, workers=1, queue_size=None, emit=None):
+    """
+    Streams items from a producer thread through a bounded queue to a pool of worker threads.
+
+    Unlike map_ordered, the items do not need to be known in advance: workers start on the first
+    item as soon as the producer yields it, and the bounded queue makes a fast producer wait
+    for the workers instead of piling items up in memory.
+
+    Input:
+        items (iterable): The items to process, typically a generator.
+        func (callable): Function called with each item.
+        workers (int): Number of worker threads.
+        queue_size (int | None): Maximum number of items waiting for a worker, defaults to 2 per worker.
+        emit (callable | None): Called with each result, in the order the items were produced, as
+                                soon as all the results before it are done. Results passed to emit
+                                are not kept in memory.
+
+    Output:
+        list | int: The results, in the order the items were produced, or with emit the number of
+                    results emitted.
+    """
+    workers = max(workers, 1)
+    pending = queue.Queue(maxsize=queue_size or 2 * workers)
+    results = {}
+    errors = []
+    failed = threading.Event()
+    emitted = [0]
+    emit_lock = threading.Lock()
+
+    def release():
+        # Only results that finished before an earlier one are held back
+        with emit_lock:
+            while emitted[0] in results:
+                emit(results.pop(emitted[0]))
+                emitted[0] += 1
+
+    def produce():
+        try:
+            for index, item in enumerate(items):
+                if failed.is_set():
+                    break
+                pending.put((index, item))
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+        finally:
+            for _ in range(workers):
+                pending.put(None)
+
+    def consume():
+        while True:
+            task = pending.get()
+            if task is None:
+                return
+            if failed.is_set():
+                # Keep draining so the producer is never blocked on a full queue
+                continue
+            index, item = task
+            try:
+                results[index] = func(item)
+                if emit is not None:
+                    release()
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+
+    threads = [threading.Thread(target=produce, daemon=True)]
+    threads += [threading.Thread(target=consume, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    if emit is not None:
+        return emitted[0]
+    return [results[index] for index in sorted(results)]
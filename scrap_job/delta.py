@@ -0,0 +1,106 @@
+import os
+from datetime import datetime, timedelta, timezone
+from db.connection import connect_to_database
+from metrics.registry import counter
+
+
+DELTA_COMPANIES = counter(
+    "scrap_delta_companies_total", "Companies of the ranking sorted by the delta sync, by reason.", ("reason",)
+)
+
+
+def load_scraped_companies():
+    """
+    Reads what the 'companies' table knows about the companies of the ranking, and the
+    tombstones of the ones the scraper filtered out (see db.load_companies.record_filtered()).
+    The most recent scrape of a URL wins.
+
+    Output:
+        dict[str, tuple[str, datetime | None]]: (company name, last scraped at) by company URL.
+                                                Empty if the tables cannot be read, so that
+                                                every company is scraped.
+    """
+    conn = connect_to_database()
+    if conn is None:
+        return {}
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT ON (url) url, company_name, scraped_at
+                FROM (
+                    SELECT ebitda_source, company_name, last_scraped_at FROM companies WHERE ebitda_source IS NOT NULL
+                    UNION ALL
+                    SELECT url, company_name, scraped_at FROM scrap_tombstones
+                ) AS scraped (url, company_name, scraped_at)
+                ORDER BY url, scraped_at DESC NULLS LAST
+            """)
+            return {url: (company_name, scraped_at) for url, company_name, scraped_at in cursor}
+    except Exception as error:
+        print(f"Error reading companies for the delta sync: {error}")
+        return {}
+    finally:
+        conn.close()
+
+
+class DeltaFilter:
+    """
+    Lets through only the companies of the ranking that have to be scraped again: the ones the
+    scraper never read (new), the ones scraped more than max_age ago or never by the scraper
+    (stale), and the ones whose name in the ranking differs from the stored one (changed). The
+    others (fresh) keep their row, or their tombstone, as it is.
+
+    Every company of the ranking is remembered, so that rows which left it can be deleted by
+    db/load_companies.py --prune.
+    """
+
+    def __init__(self, known, max_age=timedelta(days=7), now=None):
+        self.known = known
+        self.max_age = max_age
+        self.now = now or datetime.now(timezone.utc)
+        self.seen = []
+        self.stats = {"new": 0, "stale": 0, "changed": 0, "fresh": 0}
+
+    def reason(self, company_name, company_url):
+        """
+        Why a company has to be scraped: 'new', 'stale' or 'changed', or 'fresh' if it does not.
+        """
+        stored = self.known.get(company_url)
+        if stored is None:
+            return "new"
+        stored_name, scraped_at = stored
+        if scraped_at is None or self.now - scraped_at > self.max_age:
+            return "stale"
+        if stored_name != company_name:
+            return "changed"
+        return "fresh"
+
+    def filter(self, companies):
+        """
+        Yields the (company name, company URL) pairs that have to be scraped, in ranking order.
+        """
+        for company_name, company_url in companies:
+            reason = self.reason(company_name, company_url)
+            DELTA_COMPANIES.inc(reason=reason)
+            self.seen.append(company_url)
+            self.stats[reason] += 1
+            if reason != "fresh":
+                yield company_name, company_url
+
+    def write_ranking_list(self, path):
+        """
+        Writes the URL of every company of the crawled ranking, one per line.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            file.writelines(f"{url}\n" for url in self.seen)
+
+
+def remove_ranking_list(path):
+    """
+    Removes the ranking list of a previous run, which lacks the companies that entered the
+    ranking since then, so that it is not used to prune after a partial crawl.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,220 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from metrics.registry import histogram
+from scrap_job.waits import AdaptiveWait
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "es-ES,es;q=0.9,en;q=0.5",
+}
+
+
+FETCH_SECONDS = histogram(
+    "scrap_fetch_seconds",
+    "Time to retrieve a page (rate-limit waits included), by fetcher, page kind and outcome.",
+    ("fetcher", "kind", "outcome"),
+)
+
+
+class HttpFetcher:
+    """
+    Retrieves static pages with a plain HTTP session, without starting a browser.
+
+    The session keeps connections alive, so consecutive requests to the same host
+    reuse the TCP/TLS connection. pool_size should be at least the number of worker
+    threads sharing the fetcher, otherwise connections are dropped and reopened.
+
+    With a ResponseCache, fresh pages are served from disk, stale ones are revalidated with
+    If-None-Match / If-Modified-Since, and in offline mode only the cache is used. With a
+    HostRateLimiter, every request that really goes to the network waits for its host's budget.
+    """
+
+    # Several threads may fetch through the same instance at once
+    concurrent = True
+
+    def __init__(self, timeout=15, session=None, headers=None, pool_size=10, cache=None, offline=False,
+                 limiter=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.limiter = limiter
+        self.session = session or requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, url, ready=None):
+        """
+        Downloads a page.
+
+        Input:
+            url (str): The page to download.
+            ready (str | None): The page kind; unused, static pages are complete once downloaded.
+
+        Output:
+            str | None: The HTML source, or None if the page could not be retrieved.
+        """
+        start = time.perf_counter()
+        page, outcome = self.download(url)
+        FETCH_SECONDS.observe(time.perf_counter() - start, fetcher="http", kind=ready or "page", outcome=outcome)
+        return page
+
+    def download(self, url):
+        """
+        Retrieves a page from the cache or the network.
+
+        Output:
+            tuple[str | None, str]: The HTML source or None, and how it was retrieved: 'cached',
+                                    'revalidated', 'downloaded', 'not_found', 'offline_miss', 'http_error'
+                                    or 'error'.
+        """
+        entry = self.cache.get(url) if self.cache else None
+
+        if entry is not None and (entry.fresh or self.offline):
+            self.cache.count("hits")
+            return entry.body or None, "cached"
+
+        if self.offline:
+            if self.cache:
+                self.cache.count("misses")
+            print(f"Not cached, skipped in offline mode: {url}")
+            return None, "offline_miss"
+
+        conditional_headers = {}
+        if entry is not None and entry.etag:
+            conditional_headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            conditional_headers["If-Modified-Since"] = entry.last_modified
+
+        if self.limiter:
+            self.limiter.wait(url)
+
+        try:
+            response = self.session.get(url, timeout=self.timeout, headers=conditional_headers)
+        except requests.RequestException as e:
+            print(f"Error fetching {url}: {e}")
+            return None, "error"
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(url)
+            self.cache.count("revalidated")
+            return entry.body or None, "revalidated"
+
+        if self.cache:
+            self.cache.count("misses")
+
+        if response.status_code == 404:
+            # Most slug candidates do not exist, they are counted instead of printed. Missing
+            # pages are cached too, as empty bodies, so they are not requested again until
+            # the negative TTL of the cache (a day) has passed
+            if self.cache:
+                self.cache.put(url, "")
+            return None, "not_found"
+
+        if response.status_code != 200:
+            print(f"Error fetching {url}: HTTP {response.status_code}")
+            return None, "http_error"
+
+        # Without a charset header requests falls back to ISO-8859-1, which mangles '€' and 'ñ'
+        if "charset" not in response.headers.get("Content-Type", "").lower():
+            response.encoding = "utf-8"
+
+        if self.cache:
+            self.cache.put(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+        return response.text, "downloaded"
+
+    def close(self):
+        self.session.close()
+
+
+class SeleniumFetcher:
+    """
+    Retrieves pages through the browsers of a BrowserPool, for pages that need JavaScript.
+    """
+
+    # A browser can only show one page at a time; the slug candidates of a company are opened
+    # one after the other, while several companies may each use a browser of the pool
+    concurrent = False
+
+    def __init__(self, browsers, waits=None, limiter=None):
+        self.browsers = browsers
+        self.waits = waits or AdaptiveWait()
+        self.limiter = limiter
+
+    def fetch(self, url, ready=None):
+        """
+        Navigates a browser of the pool to a page and returns its rendered source.
+
+        Input:
+            url (str): The page to open.
+            ready (str | None): The page kind whose readiness condition is awaited before
+                                reading the source, a key of READY_CONDITIONS.
+
+        Output:
+            str | None: The rendered HTML source, or None if navigation failed.
+        """
+        start = time.perf_counter()
+        if self.limiter:
+            self.limiter.wait(url)
+
+        try:
+            with self.browsers.session() as session:
+                try:
+                    session.driver.get(url)
+                    if ready:
+                        self.waits.until(session.driver, ready)
+                    page, outcome = session.driver.page_source, "downloaded"
+                except Exception as e:
+                    # A crashed browser is replaced when it is given back
+                    session.failed = True
+                    print(f"Error fetching {url}: {e}")
+                    page, outcome = None, "error"
+        except Exception as e:
+            print(f"Error fetching {url}: no browser available: {e}")
+            page, outcome = None, "error"
+
+        FETCH_SECONDS.observe(time.perf_counter() - start, fetcher="selenium", kind=ready or "page", outcome=outcome)
+        return page
+
+    def close(self):
+        pass
+
+
+FETCHERS = {
+    "http": HttpFetcher,
+    "selenium": SeleniumFetcher,
+}
+
+
+def create_fetcher(name, browsers=None, pool_size=10, waits=None, cache=None, offline=False, limiter=None):
+    """
+    Builds the fetcher used for company detail pages.
+
+    Input:
+        name (str): 'http' for the browserless fetcher, 'selenium' to load pages in the browsers.
+        browsers (BrowserPool | None): The browsers of the run, required by the 'selenium' fetcher.
+        pool_size (int): Number of keep-alive connections per host for the 'http' fetcher.
+        waits (AdaptiveWait | None): Readiness waits shared with the rest of the run, for the 'selenium' fetcher.
+        cache (ResponseCache | None): On-disk page cache for the 'http' fetcher.
+        offline (bool): Serve the 'http' fetcher only from the cache.
+        limiter (HostRateLimiter | None): Per-host rate limit applied to network requests.
+
+    Output:
+        HttpFetcher | SeleniumFetcher: The fetcher instance.
+    """
+    if name not in FETCHERS:
+        raise ValueError(f"Unknown fetcher '{name}'. Choose one of: {', '.join(FETCHERS)}")
+
+    if name == "selenium":
+        if browsers is None:
+            raise ValueError("The 'selenium' fetcher needs a browser pool.")
+        return SeleniumFetcher(browsers, waits, limiter)
+
+    return HttpFetcher(pool_size=pool_size, cache=cache, offline=offline, limiter=limiter)
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import threading
+
+
+class RunJournal:
+    """
+    Append-only JSONL journal of a scrape run.
+
+    Every company is written as one line as soon as its EBITDA and CIF are known, and the file
+    is flushed to disk right away, so a crash late in a long run only loses the company that was
+    being scraped. The journal is keyed by the company URL of the ranking.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        Reads the companies completed by previous runs.
+
+        Input:
+            None
+
+        Output:
+            dict[str, dict]: Journal records by company URL. A line cut short by a crash is ignored.
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["company_url"]] = record
+
+        return records
+
+    def reset(self):
+        """
+        Empties the journal before a run that does not resume the previous one.
+        """
+        with self.lock:
+            open(self.path, "w", encoding="utf-8").close()
+
+    def append(self, company_name, company_url, ebitda_value, cif):
+        """
+        Records a completed company.
+
+        Input:
+            company_name (str): The company name as shown in the ranking.
+            company_url (str): The company page on the ranking website.
+            ebitda_value (str | None): The raw EBITDA text, or None if it was not found.
+            cif (str | None): The CIF, or None if it was not found.
+
+        Output:
+            dict: The record written to the journal.
+        """
+        record = {
+            "company_name": company_name,
+            "company_url": company_url,
+            "ebitda": ebitda_value,
+            "cif": cif,
+            "scraped_at": time.time(),
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+
+        return record
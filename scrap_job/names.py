@@ -0,0 +1,99 @@
+import re
+import unicodedata
+
+
+LEGAL_FORMS = {
+    "sa": ("sa", "sau", "sociedad anonima", "sociedad anonima unipersonal"),
+    "sl": ("sl", "slu", "sociedad limitada", "sociedad limitada unipersonal"),
+}
+
+
+def clean_company_name(company_name):
+    """
+    Cleans and standardizes the company name by removing special characters, replacing spaces with hyphens,
+    and handling specific abbreviations like 'SAU', 'SLU', etc.
+
+    Input:
+        company_name (str): The raw company name to be cleaned.
+
+    Output:
+        str: The cleaned and standardized company name.
+    """
+
+    company_name = company_name.replace(".", "").replace(",", "").replace(" & ", "-").lower().replace(" ", "-")
+    company_name = company_name.replace("ñ", "n")  # Replace 'ñ' with 'n'
+
+    company_name = re.sub(r'[()]', '', company_name)
+
+    company_name = re.sub(r'\-sau$', '-sa', company_name)
+
+    company_name = re.sub(r'\-slu$', '-sl', company_name)
+
+    company_name = re.sub(r'\-sociedad\-anonima.*$', '-sa', company_name, flags=re.IGNORECASE)
+
+    company_name = re.sub(r'\-sociedad\-limitada.*$', '-sl', company_name, flags=re.IGNORECASE)
+
+    return company_name
+
+
+def strip_accents(text):
+    """
+    Removes accents and diacritics, e.g. 'ESPAÑA' -> 'ESPANA'.
+    """
+    return "".join(
+        character for character in unicodedata.normalize("NFKD", text) if not unicodedata.combining(character)
+    )
+
+
+def normalize_company_name(company_name):
+    """
+    Builds the key used to compare company names: lowercase, without accents or punctuation, and
+    with the legal form reduced to 'sa' or 'sl', so that 'ENGIE ESPAÑA SL.', 'Engie España S.L.U.'
+    and 'ENGIE ESPANA SOCIEDAD LIMITADA' all give 'engie espana sl'.
+
+    Input:
+        company_name (str): The raw company name.
+
+    Output:
+        str: The normalized name.
+    """
+    name = strip_accents(company_name).lower().replace("&", " ")
+    name = re.sub(r"\b([a-z])\.(?=[a-z]\b)", r"\1", name)  # s.a.u. -> sau
+    name = re.sub(r"[^a-z0-9]+", " ", name).strip()
+
+    for short_form, long_forms in LEGAL_FORMS.items():
+        for long_form in sorted(long_forms, key=len, reverse=True):
+            if name == long_form or name.endswith(" " + long_form):
+                return name[: len(name) - len(long_form)] + short_form
+
+    return name
+
+
+def slug_candidates(company_name):
+    """
+    Lists the datoscif.es slugs a company may be published under, most likely first. The first
+    one is always clean_company_name(); the others cover the SAU/SLU variants, the name without
+    its legal form and names with accents other than 'ñ'.
+
+    Input:
+        company_name (str): The company name as shown in the ranking.
+
+    Output:
+        list[str]: Distinct slug candidates.
+    """
+    candidates = [clean_company_name(company_name)]
+
+    unaccented = clean_company_name(strip_accents(company_name))
+    candidates.append(unaccented)
+
+    # The name exactly as written, keeping 'sau' / 'slu'
+    raw_slug = re.sub(r"[^a-z0-9]+", "-", strip_accents(company_name).lower().replace(".", "")).strip("-")
+    candidates.append(raw_slug)
+
+    # The name without any legal form
+    normalized = normalize_company_name(company_name)
+    for short_form in LEGAL_FORMS:
+        if normalized.endswith(" " + short_form):
+            candidates.append(normalized[: -len(short_form) - 1].replace(" ", "-"))
+
+    return list(dict.fromkeys(candidate for candidate in candidates if candidate))
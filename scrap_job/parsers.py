@@ -0,0 +1,132 @@
+from urllib.parse import urljoin
+from lxml import html as lxml_html
+
+
+EBITDA_XPATH = "//td[contains(text(), 'Ebitda 2023')]/following-sibling::td[1]"
+CIF_XPATH = "//span[@itemprop='taxID']"
+RANKING_ROWS_XPATH = "//*[@id='tabla-ranking']//tr"
+
+
+def parse_document(page_html):
+    """
+    Parses raw HTML into an lxml document tree.
+
+    Input:
+        page_html (str): The HTML source of the page.
+
+    Output:
+        lxml.html.HtmlElement | None: The parsed document, or None if the page is empty.
+    """
+    if not page_html or not page_html.strip():
+        return None
+    return lxml_html.fromstring(page_html)
+
+
+def clean_ebitda_value(ebitda_value):
+    """
+    Converts one EBITDA text shown on the ranking site into a number. Amounts are written the
+    Spanish way: '.' separates thousands and ',' decimals. Whole columns are converted with
+    scrap_job.transform.parse_spanish_currency instead.
+
+    Input:
+        ebitda_value (str): The raw EBITDA text, e.g. "1.956.941.000 €".
+
+    Output:
+        float: The EBITDA as a number.
+    """
+    ebitda_value_clean = ebitda_value.replace("€", "").replace(".", "").strip()
+    return float(ebitda_value_clean.replace(",", "."))
+
+
+def extract_ebitda_text(page_html):
+    """
+    Extracts the raw 'Ebitda 2023' text from a company page of ranking-empresas.eleconomista.es.
+
+    Input:
+        page_html (str): The HTML source of the company page.
+
+    Output:
+        str | None: The EBITDA text, e.g. "1.956.941.000 €", or None if the page has no EBITDA.
+    """
+    document = parse_document(page_html)
+    if document is None:
+        return None
+
+    cells = document.xpath(EBITDA_XPATH)
+    if not cells:
+        return None
+
+    return cells[0].text_content().strip() or None
+
+
+def parse_ebitda(page_html):
+    """
+    Extracts the 'Ebitda 2023' value from a company page of ranking-empresas.eleconomista.es.
+
+    Input:
+        page_html (str): The HTML source of the company page.
+
+    Output:
+        float | None: The EBITDA value, or None if it is missing or cannot be parsed.
+    """
+    ebitda_text = extract_ebitda_text(page_html)
+    if ebitda_text is None:
+        return None
+
+    try:
+        return clean_ebitda_value(ebitda_text)
+    except ValueError:
+        return None
+
+
+def parse_cif(page_html):
+    """
+    Extracts the CIF from a company page of datoscif.es.
+
+    Input:
+        page_html (str): The HTML source of the datoscif page.
+
+    Output:
+        str | None: The CIF, or None if the page has no taxID field.
+    """
+    document = parse_document(page_html)
+    if document is None:
+        return None
+
+    spans = document.xpath(CIF_XPATH)
+    if not spans:
+        return None
+
+    cif = spans[0].text_content().strip()
+    return cif or None
+
+
+def parse_ranking(page_html, base_url):
+    """
+    Extracts the company names and detail URLs from the source of a ranking page, the same
+    fields the browser reads from '#tabla-ranking'.
+
+    Input:
+        page_html (str): The HTML source of the ranking page.
+        base_url (str): The URL of the ranking page, used to resolve relative links.
+
+    Output:
+        list[tuple[str, str]]: (company name, company URL) pairs in ranking order.
+    """
+    document = parse_document(page_html)
+    if document is None:
+        return []
+
+    company_data = []
+    for row in document.xpath(RANKING_ROWS_XPATH):
+        cells = row.xpath("./td")
+        if len(cells) < 3:
+            continue
+        links = cells[2].xpath(".//a[@href]")
+        if not links:
+            continue
+        company_name = links[0].text_content().strip()
+        company_url = urljoin(base_url, links[0].get("href"))
+        company_data.append((company_name, company_url))
+
+    return company_data
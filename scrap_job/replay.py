@@ -0,0 +1,222 @@
+import os
+import time
+import random
+import threading
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scrap_job import scrap
+from scrap_job.cif_index import is_valid_cif
+from scrap_job.names import clean_company_name
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "fixtures")
+RANKING_PATH = "/ranking_empresas_nacional.html"
+DATOSCIF_PATH = "/empresa/"
+
+
+def read_fixture(name, fixtures_dir=FIXTURES_DIR):
+    with open(os.path.join(fixtures_dir, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def spanish_amount(value):
+    return f"{value:,}".replace(",", ".") + " €"
+
+
+def make_cif(letter, number):
+    """
+    Builds a CIF with a valid control character from a letter and a 7-digit number.
+    """
+    digits = f"{number % 10_000_000:07d}"
+    return next(cif for control in "0123456789JABCDEFGHI" if is_valid_cif(cif := f"{letter}{digits}{control}"))
+
+
+class ReplaySite:
+    """
+    Offline copy of the ranking and datoscif.es sites, built from the pages captured in the test
+    fixtures: the ranking, company and datoscif pages of the fixtures are repeated for
+    `companies` made-up companies, so that a run against it parses exactly the markup of the real
+    sites.
+
+    The site is deterministic for a given seed. Some companies have no EBITDA (missing_ebitda),
+    some are not on datoscif.es (missing_cif), and some are published there under their 'SAU'
+    slug (sau), which is not the first slug candidate the scraper tries.
+    """
+
+    def __init__(self, companies=200, page_size=50, missing_ebitda=0.05, missing_cif=0.05, sau=0.1, seed=0,
+                 fixtures_dir=FIXTURES_DIR):
+        self.page_size = page_size
+        self.ranking_template = read_fixture("ranking_page.html", fixtures_dir)
+        self.company_template = read_fixture("company_mercadona.html", fixtures_dir)
+        self.no_ebitda_template = read_fixture("company_no_ebitda.html", fixtures_dir)
+        self.datoscif_template = read_fixture("datoscif_mercadona.html", fixtures_dir)
+        self.not_found_page = read_fixture("datoscif_not_found.html", fixtures_dir)
+
+        rng = random.Random(seed)
+        self.companies = []
+        self.company_pages = {}
+        self.datoscif_pages = {}
+        for number in range(1, companies + 1):
+            legal_form = rng.choice(("SA", "SL"))
+            if legal_form == "SA" and rng.random() < sau:
+                legal_form = "SAU"
+            name = f"EMPRESA {number:05d} {legal_form}"
+            path = f"/EMPRESA-{number:05d}.html"
+            ebitda = None if rng.random() < missing_ebitda else rng.randint(1_000_000, 3_000_000_000)
+            cif = None if rng.random() < missing_cif else make_cif("A" if legal_form != "SL" else "B", number)
+
+            self.companies.append((name, path, ebitda, cif))
+            self.company_pages[path] = self.company_page(name, ebitda)
+            if cif is not None:
+                # 'EMPRESA 00001 SAU' is published as 'empresa-00001-sau', the scraper first tries '-sa'
+                slug = clean_company_name(name) if legal_form != "SAU" else f"empresa-{number:05d}-sau"
+                self.datoscif_pages[slug] = self.datoscif_template.replace("MERCADONA SA", name).replace(
+                    "A46103834", cif
+                )
+
+    def company_page(self, name, ebitda):
+        if ebitda is None:
+            return self.no_ebitda_template.replace("EMPRESA SIN DATOS SL", name)
+        return self.company_template.replace("MERCADONA SA", name).replace("1.956.941.000 €", spanish_amount(ebitda))
+
+    def ranking_page(self, page):
+        start = (page - 1) * self.page_size
+        rows = [
+            f"""
+            <tr>
+                <td>{position}</td>
+                <td>=</td>
+                <td><a href="{path}">{name}</a></td>
+                <td>{spanish_amount(ebitda or 0)}</td>
+            </tr>"""
+            for position, (name, path, ebitda, _) in enumerate(
+                self.companies[start:start + self.page_size], start=start + 1
+            )
+        ]
+        head, _, rest = self.ranking_template.partition("<tbody>")
+        _, _, tail = rest.partition("</tbody>")
+        return f"{head}<tbody>{''.join(rows)}\n        </tbody>{tail}"
+
+    def respond(self, path, query):
+        """
+        Answers one request.
+
+        Input:
+            path (str): The request path.
+            query (dict): The parsed query string.
+
+        Output:
+            tuple[int, str, str]: (status code, body, kind of page), the kind being 'ranking',
+                                  'company', 'datoscif' or 'unknown'.
+        """
+        if path == RANKING_PATH:
+            page = int(query.get("qPagina", ["1"])[0])
+            return 200, self.ranking_page(page), "ranking"
+        if path.startswith(DATOSCIF_PATH):
+            page = self.datoscif_pages.get(path[len(DATOSCIF_PATH):])
+            return (200, page, "datoscif") if page is not None else (404, self.not_found_page, "datoscif")
+        if path in self.company_pages:
+            return 200, self.company_pages[path], "company"
+        return 404, "", "unknown"
+
+
+class ReplayServer:
+    """
+    Serves a ReplaySite on a local port, in a background thread, with one thread per connection
+    and HTTP keep-alive like the real sites.
+
+    Every response waits `latency` seconds plus up to `jitter` more, and a share `error_rate`
+    of the requests fail with a 503, so that the scraper can be measured against slow and
+    flaky sites. The stats count the requests and injected errors by kind of page.
+    """
+
+    def __init__(self, site, latency=0.0, jitter=0.0, error_rate=0.0, seed=0, host="127.0.0.1", port=0):
+        self.site = site
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are sent separately; with Nagle every keep-alive response would
+            # wait for the client's delayed ACK (~40 ms)
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, request):
+        parts = urlsplit(request.path)
+        status, body, kind = self.site.respond(parts.path, parse_qs(parts.query))
+
+        with self.lock:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate > 0 and self.random.random() < self.error_rate
+            stats = self.stats.setdefault(kind, {"requests": 0, "errors": 0})
+            stats["requests"] += 1
+            stats["errors"] += failed
+
+        if delay:
+            time.sleep(delay)
+        if failed:
+            status, body = 503, "Service Unavailable"
+
+        payload = body.encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "text/html; charset=utf-8")
+        request.send_header("Content-Length", str(len(payload)))
+        request.end_headers()
+        request.wfile.write(payload)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+@contextmanager
+def replaying(server):
+    """
+    Points the scraper at a ReplayServer instead of the real ranking and datoscif.es sites.
+    """
+    saved = scrap.RANKING_URL, scrap.RANKING_PAGE_URL, scrap.DATOSCIF_URL
+    scrap.RANKING_URL = server.url + RANKING_PATH
+    scrap.RANKING_PAGE_URL = scrap.RANKING_URL + "?qPagina={page}"
+    scrap.DATOSCIF_URL = server.url + DATOSCIF_PATH + "{slug}"
+    try:
+        yield server
+    finally:
+        scrap.RANKING_URL, scrap.RANKING_PAGE_URL, scrap.DATOSCIF_URL = saved
@@ -1,164 +1,727 @@
-import re
 import time
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from webdriver_manager.firefox import GeckoDriverManager
-from selenium.webdriver.support import expected_conditions as EC
+import argparse
+from datetime import timedelta
+from db.load_companies import UPSERT_ACTIONS
+from metrics.registry import counter, histogram, registry
+from scrap_job.browsers import BrowserPool, allowed_hosts
+from scrap_job.fetchers import FETCHERS, create_fetcher
+from scrap_job.concurrency import HostRateLimiter, map_ordered, run_pipeline
+from scrap_job.cache import RANKING_TTL, ResponseCache
+from scrap_job.delta import DeltaFilter, load_scraped_companies, remove_ranking_list
+from scrap_job.journal import RunJournal
+from scrap_job.names import clean_company_name, slug_candidates
+from scrap_job.cif_index import CifIndex, is_valid_cif, load_companies_table
+from scrap_job.parsers import extract_ebitda_text, parse_cif, parse_ranking
+from scrap_job.sinks import SINKS, create_sink
+from scrap_job.waits import AdaptiveWait
+
+
+RANKING_URL = "https://ranking-empresas.eleconomista.es/ranking_empresas_nacional.html"
+RANKING_PAGE_URL = RANKING_URL + "?qPagina={page}"
+DATOSCIF_URL = "https://www.datoscif.es/empresa/{slug}"
+
+RANKING_PAGE_SECONDS = histogram(
+    "scrap_ranking_page_seconds", "Time to load and read one ranking page.", ("source",)
+)
+PARSE_SECONDS = histogram("scrap_parse_seconds", "Time to extract a field from a page.", ("field",))
+CIF_LOOKUP_SECONDS = histogram(
+    "scrap_cif_lookup_seconds", "Time to resolve the CIF of a company, by where it was found.", ("source",)
+)
+COMPANIES = counter("scrap_companies_total", "Companies processed, by outcome.", ("outcome",))
+
+
+def accept_cookies(driver, waits):
+    """
+    Clicks the cookie-consent button of the ranking page if it is shown, and waits until the
+    banner is gone.
 
+    Input:
+        driver (WebDriver): The running browser.
+        waits (AdaptiveWait): The readiness waits of the run.
 
-def clean_company_name(company_name):
+    Output:
+        None
     """
-    Cleans and standardizes the company name by removing special characters, replacing spaces with hyphens,
-    and handling specific abbreviations like 'SAU', 'SLU', etc.
+    submit_button = waits.until(driver, "consent")
+    if submit_button is None:
+        print("Agree button not found or already clicked.")
+        return
+
+    try:
+        submit_button.click()
+        print("Agree and close clicked.")
+    except Exception as e:
+        print(f"Error: {e} - Agree button could not be clicked.")
+        return
+
+    waits.until(driver, "consent_closed")
+
+
+# Reads the whole ranking table in the browser and returns it in one WebDriver round-trip,
+# instead of one round-trip per row, cell, link, text and attribute
+RANKING_SCRIPT = """
+const table = document.getElementById("tabla-ranking");
+if (!table) return null;
+const rows = [];
+for (const row of table.querySelectorAll("tr")) {
+    const cells = row.querySelectorAll(":scope > td");
+    if (cells.length < 3) continue;
+    const link = cells[2].querySelector("a[href]");
+    if (link) rows.push([link.textContent.trim(), link.href]);
+}
+return rows;
+"""
+
+
+def extract_ranking(driver):
+    """
+    Reads the company names and detail URLs from the ranking table currently loaded in the browser.
 
     Input:
-        company_name (str): The raw company name to be cleaned.
+        driver (WebDriver): The browser with the ranking page loaded.
 
     Output:
-        str: The cleaned and standardized company name.
+        list[tuple[str, str]]: (company name, company URL) pairs in ranking order.
     """
+    try:
+        rows = driver.execute_script(RANKING_SCRIPT)
+    except Exception as e:
+        print(f"Error while extracting table on page: {e}")
+        return []
 
-    company_name = company_name.replace(".", "").replace(",", "").replace(" & ", "-").lower().replace(" ", "-")
-    company_name = company_name.replace("ñ", "n")  # Replace 'ñ' with 'n'
+    if rows is None:
+        print("Error while extracting table on page: no ranking table.")
+        return []
+    return [(company_name, company_url) for company_name, company_url in rows]
 
-    company_name = re.sub(r'[()]', '', company_name)
 
-    company_name = re.sub(r'\-sau$', '-sa', company_name)
+def ranking_page_url(page):
+    return RANKING_URL if page == 1 else RANKING_PAGE_URL.format(page=page)
 
-    company_name = re.sub(r'\-slu$', '-sl', company_name)
 
-    company_name = re.sub(r'\-sociedad\-anonima.*$', '-sa', company_name, flags=re.IGNORECASE)
+def read_cached_ranking(cache, offline=False, url=RANKING_URL):
+    """
+    Reads a ranking page from the page cache, so that re-runs do not need to start the browser.
 
-    company_name = re.sub(r'\-sociedad\-limitada.*$', '-sl', company_name, flags=re.IGNORECASE)
+    Input:
+        cache (ResponseCache | None): The page cache, or None if caching is disabled.
+        offline (bool): Accept a cached ranking page of any age.
+        url (str): The ranking page.
 
-    return company_name
+    Output:
+        list[tuple[str, str]] | None: (company name, company URL) pairs, or None if the ranking
+                                      page is not cached or is too old.
+    """
+    if cache is None:
+        return None
+
+    entry = cache.get(url, ttl=RANKING_TTL)
+    if entry is None or not (entry.fresh or offline):
+        cache.count("misses")
+        return None
+
+    company_data = parse_ranking(entry.body, url)
+    if not company_data:
+        return None
 
+    cache.count("hits")
+    print(f"Ranking page read from cache ({len(company_data)} companies): {url}")
+    return company_data
 
-def main():
+
+def load_ranking(driver, waits, cache=None, url=RANKING_URL, consent=True):
     """
-    Main function to scrape company data from the ranking website, extract EBITDA and CIF information,
-    and save the results to a CSV file.
+    Opens a ranking page in the browser, accepts the cookies and reads the ranking table, with a
+    single WebDriver round-trip once the table is there, however many rows it has: the table is
+    read with one script or, with a page cache, parsed from the page source stored in it.
 
     Input:
-        None
+        driver (WebDriver): The running browser.
+        waits (AdaptiveWait): The readiness waits of the run.
+        cache (ResponseCache | None): If given, the rendered ranking page is stored in it.
+        url (str): The ranking page.
+        consent (bool): Whether the cookie banner still has to be accepted.
 
     Output:
-        None (saves the results to 'companies.csv')
+        list[tuple[str, str]]: (company name, company URL) pairs in ranking order.
     """
-    try:
-        service = Service(GeckoDriverManager().install())
-        driver = webdriver.Firefox(service=service)
+    driver.get(url)
 
-        driver.get("https://ranking-empresas.eleconomista.es/ranking_empresas_nacional.html")
+    if consent:
+        accept_cookies(driver, waits)
 
-        time.sleep(5)
+    waits.until(driver, "ranking")
 
-        try:
-            submit_button = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "didomi-notice-agree-button"))
-            )
-            submit_button.click()
-            print("Agree and close clicked.")
-        except Exception as e:
-            print(f"Error: {e} - Agree button not found or already clicked.")
+    if cache is None:
+        return extract_ranking(driver)
 
-        time.sleep(5)
+    # The source is needed for the cache anyway, so the table is parsed from it
+    page_source = driver.page_source
+    company_data = parse_ranking(page_source, url)
+    if company_data:
+        cache.put(url, page_source)
 
-        company_data = []
+    return company_data
 
-        try:
-            table = driver.find_element(By.ID, "tabla-ranking")
-            rows = table.find_elements(By.TAG_NAME, "tr")
 
-            for row in rows:
-                cells = row.find_elements(By.TAG_NAME, "td")
-                if len(cells) < 3:
-                    continue
-                company_cell = cells[2]
-                try:
-                    company_link = company_cell.find_element(By.TAG_NAME, "a")
-                    company_name = company_link.text.strip()
-                    company_url = company_link.get_attribute("href")
-                    company_data.append((company_name, company_url))
-                except Exception as e:
-                    print(f"Error extracting company data: {e}")
-                    continue
+class RankingCrawler:
+    """
+    Follows the pages of the ranking and yields the companies as each page is read.
 
-        except Exception as e:
-            print(f"Error while extracting table on page: {e}")
+    Pages come from the page cache when possible; a browser is only borrowed from the pool for
+    the pages that have to be loaded, and the cookie banner is only accepted once per browser.
+    Unless keep_browsers is set, the browsers are closed as soon as the crawl is over.
+    """
+
+    def __init__(self, waits, cache=None, offline=False, browsers=None, keep_browsers=False):
+        self.waits = waits
+        self.cache = cache
+        self.offline = offline
+        self.browsers = browsers or BrowserPool(hosts=browser_hosts())
+        self.keep_browsers = keep_browsers
+        # Whether the last crawl read the whole ranking, see crawl()
+        self.complete = False
+
+    def load_page(self, page):
+        url = ranking_page_url(page)
+        start = time.perf_counter()
+
+        company_data = read_cached_ranking(self.cache, self.offline, url)
+        if company_data is not None:
+            RANKING_PAGE_SECONDS.observe(time.perf_counter() - start, source="cache")
+            return company_data
+
+        if self.offline:
+            print(f"Ranking page {page} is not cached, skipped in offline mode.")
+            return []
+
+        with self.browsers.session() as session:
+            print(f"Visiting ranking page {page}: {url}")
+            company_data = load_ranking(session.driver, self.waits, self.cache, url, consent=not session.consented)
+            session.consented = True
+        RANKING_PAGE_SECONDS.observe(time.perf_counter() - start, source="browser")
+        return company_data
+
+    def crawl(self, first_page=1, last_page=1, top=None):
+        """
+        Yields the companies of the ranking pages in order.
+
+        Input:
+            first_page (int): The first ranking page to read.
+            last_page (int): The last ranking page to read.
+            top (int | None): Stop after this many companies.
+
+        Output:
+            Generator of (company name, company URL) pairs. Crawling stops early at the first
+            empty page.
+
+        Once the generator is exhausted, `complete` tells whether every company of pages 1 to
+        last_page was yielded. An empty page may be a page that could not be read as well as
+        the end of the ranking, so a crawl that stopped at one is not complete, and neither is
+        one cut by `top` or started after the first page.
+        """
+        self.complete = False
+        count = 0
+        try:
+            for page in range(first_page, last_page + 1):
+                company_data = self.load_page(page)
+                if not company_data:
+                    print(f"Ranking page {page} has no companies, stopping the crawl.")
+                    return
+                for company in company_data:
+                    if top is not None and count >= top:
+                        return
+                    count += 1
+                    yield company
+            self.complete = first_page == 1
+        finally:
+            if not self.keep_browsers:
+                self.close()
+
+    def close(self):
+        self.browsers.close()
+
+
+def browser_hosts():
+    """
+    The hosts the scraping browsers may reach; read when the pool is built, so that a replay of
+    the sites is allowed too.
+    """
+    return allowed_hosts(RANKING_URL, DATOSCIF_URL)
 
-        df = pd.DataFrame(company_data, columns=["Nombre de la empresa", "Fuente de la información"])
 
-        ebitda_data = []
-        cif_data = []
-        cif_urls = []
+def resolve_cif(fetcher, company_name, cif_index=None):
+    """
+    Finds the CIF of a company, first in the local index and otherwise on datoscif.es.
 
-        for index, row in df.iterrows():
-            company_name = row["Nombre de la empresa"]
-            company_url = row["Fuente de la información"]
+    All the slug candidates of the name are requested in a single concurrent batch (one after
+    the other, stopping at the first hit, when the fetcher is a browser), and the first one in
+    order of likelihood with a CIF whose checksum is valid wins. Found CIFs are added to the index.
 
-            cleaned_name = clean_company_name(company_name)
+    Input:
+        fetcher (HttpFetcher | SeleniumFetcher): The fetcher used for the detail pages.
+        company_name (str): The company name as shown in the ranking.
+        cif_index (CifIndex | None): The local CIF index.
 
-            driver.get(company_url)
-            print(f"Visiting: {company_url}")
+    Output:
+        str | None: The CIF, or None if it could not be found.
+    """
+    start = time.perf_counter()
+    if cif_index is not None:
+        cif = cif_index.lookup(company_name)
+        if cif:
+            CIF_LOOKUP_SECONDS.observe(time.perf_counter() - start, source="index")
+            return cif
+
+    candidates = slug_candidates(company_name)
+    cif_urls = [DATOSCIF_URL.format(slug=slug) for slug in candidates]
+
+    if fetcher.concurrent:
+        pages = map_ordered(lambda url: fetcher.fetch(url, ready="cif"), cif_urls, workers=len(cif_urls))
+    else:
+        pages = (fetcher.fetch(url, ready="cif") for url in cif_urls)
+
+    for slug, page in zip(candidates, pages):
+        with PARSE_SECONDS.time(field="cif"):
+            cif = parse_cif(page or "")
+        if cif is None:
+            continue
+        if not is_valid_cif(cif):
+            print(f"Rejected invalid CIF '{cif}' for {company_name}")
+            continue
+        if cif_index is not None:
+            cif_index.add(company_name, cif, slug)
+        CIF_LOOKUP_SECONDS.observe(time.perf_counter() - start, source="datoscif")
+        return cif
+
+    CIF_LOOKUP_SECONDS.observe(time.perf_counter() - start, source="not_found")
+    return None
+
+
+def scrape_company(fetcher, company_name, company_url, cif_index=None):
+    """
+    Fetches the EBITDA page of one company and resolves its CIF, from the local index or from
+    datoscif.es.
 
-            time.sleep(5)
+    Input:
+        fetcher (HttpFetcher | SeleniumFetcher): The fetcher used for the detail pages.
+        company_name (str): The company name as shown in the ranking.
+        company_url (str): The company page on the ranking website.
+        cif_index (CifIndex | None): The local CIF index.
 
-            try:
-                ebitda_label = driver.find_element(
-                    By.XPATH, "//td[contains(text(), 'Ebitda 2023')]"
-                )
-                ebitda_value = ebitda_label.find_element(
-                    By.XPATH, "following-sibling::td"
-                ).text.strip()
+    Output:
+        tuple: (raw EBITDA text or None, CIF or None). The EBITDA is parsed for all the companies
+               at once by transform_results().
+    """
+    page = fetcher.fetch(company_url, ready="ebitda")
+    with PARSE_SECONDS.time(field="ebitda"):
+        ebitda_value = extract_ebitda_text(page or "")
+    if ebitda_value is None:
+        print(f"Error extracting EBITDA for {company_name}")
 
-                ebitda_value_clean = ebitda_value.replace("€", "").replace(".", "").strip()
+    cif = resolve_cif(fetcher, company_name, cif_index)
+    if cif is None:
+        print(f"Error extracting CIF for {company_name}")
 
-                ebitda_value_clean = float(ebitda_value_clean.replace(",", ""))
+    return ebitda_value, cif
 
-                ebitda_data.append(ebitda_value_clean)
-                cif_urls.append(company_url)
 
-            except Exception as e:
-                print(f"Error extracting EBITDA for {company_name}: {e}")
-                ebitda_data.append("N/A")
-                cif_urls.append(company_url)
+def scrape_pending(fetcher, companies, journal, resume=False, workers=1, cif_index=None, sink=None):
+    """
+    Scrapes the companies that the journal does not hold yet and records each one as soon as it
+    is done. Companies are consumed as they are produced, so scraping starts with the first one.
 
-            driver.get(f"https://www.datoscif.es/empresa/{cleaned_name}")
-            print(f"Visiting: https://www.datoscif.es/empresa/{cleaned_name}")
-            time.sleep(5)
+    Input:
+        fetcher (HttpFetcher | SeleniumFetcher): The fetcher used for the detail pages.
+        companies (iterable[tuple[str, str]]): (company name, company URL) pairs in ranking order.
+        journal (RunJournal): The run journal.
+        resume (bool): Keep the companies completed by a previous run instead of starting over.
+        workers (int): Number of companies scraped concurrently.
+        cif_index (CifIndex | None): The local CIF index.
+        sink (ResultSink | None): Output sink that receives every company in ranking order as
+                                  soon as it is scraped, instead of keeping them all in memory.
 
-            try:
-                tax_id_element = driver.find_element(By.CSS_SELECTOR, "span[itemprop='taxID']")
-                cif_data.append(tax_id_element.text)
-            except Exception as e:
-                print(f"Error extracting CIF for {company_name}: {e}")
-                cif_data.append("N/A")
+    Output:
+        list[tuple] | int: (company name, company URL, raw EBITDA text or None, CIF or None) for
+                           every company, in ranking order, or with a sink the number of
+                           companies written to it.
+    """
+    if resume:
+        completed = journal.load()
+        print(f"Resuming: {len(completed)} companies already in the journal.")
+    else:
+        journal.reset()
+        completed = {}
+
+    def scrape_and_record(company):
+        company_name, company_url = company
+        record = completed.get(company_url)
+        if record is None:
+            ebitda_value, cif = scrape_company(fetcher, company_name, company_url, cif_index)
+            record = journal.append(company_name, company_url, ebitda_value, cif)
+            COMPANIES.inc(outcome="complete" if ebitda_value is not None and cif is not None else "incomplete")
+        else:
+            COMPANIES.inc(outcome="resumed")
+        return company_name, company_url, record["ebitda"], record["cif"]
+
+    emit = sink.write if sink is not None else None
+    return run_pipeline(companies, scrape_and_record, workers=workers, emit=emit)
+
+
+def print_wait_report(waits, limiter):
+    """
+    Prints how much wall time the run spent waiting for pages and for rate limits.
 
-        driver.quit()
+    Input:
+        waits (AdaptiveWait): The readiness waits of the run.
+        limiter (HostRateLimiter): The per-host rate limiter of the run.
 
-        df["EBITDA 2023"] = ebitda_data
-        df["CIF"] = cif_data
+    Output:
+        None
+    """
+    report = waits.report()
+    print(f"Time spent waiting for pages: {report.pop('total_wait_seconds'):.2f}s")
+    for kind, stats in report.items():
+        print(
+            f"  {kind}: {stats['waits']} waits, {stats['timeouts']} timeouts, "
+            f"{stats['total_seconds']:.2f}s total, p50 {stats['p50_seconds']:.2f}s"
+        )
+    print(f"Time spent waiting for rate limits (summed over workers): {limiter.total_wait:.2f}s")
+
+
+def print_cache_report(cache):
+    stats = cache.stats
+    print(
+        f"Page cache: {stats['hits']} hits, {stats['revalidated']} revalidated, {stats['misses']} misses "
+        f"(hit ratio {cache.hit_ratio():.1%})"
+    )
+
+
+def page_range(value):
+    first, _, last = value.partition("-")
+    try:
+        first, last = int(first), int(last or first)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid page range '{value}', use 'N' or 'FIRST-LAST'")
+    if first < 1 or last < first:
+        raise argparse.ArgumentTypeError(f"invalid page range '{value}', use 'N' or 'FIRST-LAST'")
+    return first, last
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape EBITDA and CIF data of the top Spanish companies.")
+    parser.add_argument(
+        "--fetcher",
+        choices=sorted(FETCHERS),
+        default="http",
+        help="How company detail pages are retrieved: plain HTTP (default) or the Selenium browser.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of companies scraped concurrently (at most --browsers with the selenium fetcher).",
+    )
+    parser.add_argument(
+        "--browsers",
+        type=int,
+        default=1,
+        help="Number of headless Firefox sessions kept running for the pages that need a browser.",
+    )
+    parser.add_argument(
+        "--browser-max-pages",
+        type=int,
+        default=200,
+        help="Pages a browser session loads before it is restarted to give its memory back.",
+    )
+    parser.add_argument(
+        "--browser-assets",
+        action="store_true",
+        help="Let the browsers load images, stylesheets, fonts and third-party hosts.",
+    )
+    parser.add_argument(
+        "--headed",
+        action="store_true",
+        help="Show the browser windows instead of running them headless.",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2.0,
+        help="Maximum requests per second sent to each host.",
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=2,
+        help="Number of requests a host may receive back to back before --rate applies.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".scrap_cache",
+        help="Directory of the on-disk page cache.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=512,
+        help="Maximum size of the page cache; least recently used pages are evicted beyond it.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always download every page.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Replay the run from the page cache only, without any network access.",
+    )
+    parser.add_argument(
+        "--journal",
+        default="companies.journal.jsonl",
+        help="Run journal where every company is recorded as soon as it is scraped.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the companies already in the journal and rebuild the output from it.",
+    )
+    parser.add_argument(
+        "--sink",
+        choices=list(SINKS),
+        default="csv",
+        help="Output: CSV (default), typed and compressed Parquet, or straight into the 'companies' table "
+             "(postgres). Companies are written as they are scraped.",
+    )
+    parser.add_argument(
+        "--db-mode",
+        choices=list(UPSERT_ACTIONS),
+        default="sync",
+        help="With --sink postgres, how companies already in the table are merged (see db/load_companies.py).",
+    )
+    parser.add_argument(
+        "--db-flush-seconds",
+        type=float,
+        default=2.0,
+        help="With --sink postgres, longest time a scraped company waits before it is written.",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Output file, defaults to companies.csv or companies.parquet.",
+    )
+    parser.add_argument(
+        "--cif-index",
+        default="cif_index.json",
+        help="Local index of known company CIFs, used before asking datoscif.es.",
+    )
+    parser.add_argument(
+        "--cif-index-from-db",
+        action="store_true",
+        help="Also fill the CIF index from the 'companies' table.",
+    )
+    parser.add_argument(
+        "--no-cif-index",
+        action="store_true",
+        help="Always look CIFs up on datoscif.es.",
+    )
+    parser.add_argument(
+        "--pages",
+        type=page_range,
+        default=(1, 1),
+        help="Ranking pages to crawl, as 'N' or 'FIRST-LAST' (default: 1).",
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Only scrape the companies that are new, stale or renamed compared to the 'companies' table.",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=7,
+        help="With --delta, days after which a stored company is scraped again.",
+    )
+    parser.add_argument(
+        "--ranking-list",
+        default="companies.ranking.txt",
+        help=(
+            "With --delta, file listing the URL of every company of the ranking, for db/load_companies.py --prune. "
+            "Only written when pages 1 to LAST of --pages were all read, without --top."
+        ),
+    )
+    parser.add_argument(
+        "--filtered-list",
+        default="companies.filtered.csv",
+        help=(
+            "With --delta and --sink csv or parquet, file listing the companies that were scraped but filtered "
+            "out, for db/load_companies.py --filtered. --sink postgres records them in the database itself."
+        ),
+    )
+    parser.add_argument(
+        "--metrics-report",
+        default=None,
+        help="Write the counters and timings of the run (fetches, parsing, CIF lookups, waits) to this JSON file.",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=None,
+        help="Stop after this many companies of the ranking.",
+    )
+    args = parser.parse_args(argv)
+
+    if args.offline and args.no_cache:
+        parser.error("--offline needs the page cache, it cannot be combined with --no-cache.")
+    if args.offline and args.fetcher == "selenium":
+        parser.error("--offline only works with the http fetcher.")
+
+    return args
+
+
+def main(argv=None):
+    """
+    Main function to scrape company data from the ranking website, extract EBITDA and CIF information,
+    and save the results to a CSV file.
 
-        df["Fuente de la información CIF"] = cif_urls
+    The ranking pages (--pages, --top) need a real browser (cookie consent and JavaScript) and
+    are crawled while the companies found so far are already being scraped. Browsers are
+    headless Firefox sessions from a pool (--browsers), which skip images, stylesheets, fonts
+    and third-party hosts unless --browser-assets is given. The company
+    detail pages are static and are retrieved with the fetcher chosen with --fetcher, by
+    --workers threads and at most --rate requests per second per host. Pages are kept in an
+    on-disk cache, so re-runs only download what is stale, and --offline replays a run from it.
+    Every company is written to the run journal as soon as it is scraped; after a crash,
+    --resume continues from the journal instead of starting over. Companies are written to the
+    output (--sink, --output) in ranking order while the run goes on. With --metrics-report the
+    counters and timings of every stage are written to a JSON file at the end of the run.
+    With --delta only the companies that are new, stale (--max-age) or renamed compared to the
+    'companies' table are scraped, for db/load_companies.py --mode sync.
 
-        df.rename(columns={"Fuente de la información": "Fuente de la información EBITDA"}, inplace=True)
+    Input:
+        argv (list[str] | None): Command line arguments, defaults to sys.argv.
 
-        df = df[["Nombre de la empresa", "Fuente de la información EBITDA", "Fuente de la información CIF", "CIF", "EBITDA 2023"]]
+    Output:
+        None (saves the results to 'companies.csv' or 'companies.parquet')
+    """
+    args = parse_args(argv)
 
-        df = df[df["EBITDA 2023"].apply(lambda x: isinstance(x, (int, float)) and x > 3000000)]
-        df = df[df["CIF"] != "N/A"]
+    journal = RunJournal(args.journal)
 
-        df.to_csv("companies.csv", index=False, encoding="utf-8-sig")
+    try:
+        cache = None
+        if not args.no_cache:
+            cache = ResponseCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+        cif_index = None
+        if not args.no_cif_index:
+            cif_index = CifIndex.load(args.cif_index)
+            cif_index.add_records(journal.load().values())
+            if args.cif_index_from_db:
+                load_companies_table(cif_index)
+            print(f"CIF index: {len(cif_index)} companies known.")
+
+        waits = AdaptiveWait()
+        first_page, last_page = args.pages
+        browsers = BrowserPool(
+            args.browsers,
+            args.browser_max_pages,
+            headless=not args.headed,
+            block_assets=not args.browser_assets,
+            hosts=None if args.browser_assets else browser_hosts(),
+        )
+        crawler = RankingCrawler(waits, cache, args.offline, browsers, keep_browsers=args.fetcher == "selenium")
+        companies = crawler.crawl(first_page, last_page, args.top)
+
+        delta = None
+        if args.delta:
+            delta = DeltaFilter(load_scraped_companies(), timedelta(days=args.max_age))
+            companies = delta.filter(companies)
+
+        workers = args.workers
+        if args.fetcher == "selenium" and workers > browsers.size:
+            print(f"The selenium fetcher has {browsers.size} browsers, scraping with {browsers.size} workers.")
+            workers = browsers.size
+
+        limiter = HostRateLimiter(args.rate, args.burst)
+        fetcher = create_fetcher(
+            args.fetcher,
+            browsers,
+            # Every worker may request all the slug candidates of a company at once
+            pool_size=max(workers, 1) * 4,
+            waits=waits,
+            cache=cache,
+            offline=args.offline,
+            limiter=limiter,
+        )
+
+        if args.sink == "postgres":
+            options = {"mode": args.db_mode, "flush_interval": args.db_flush_seconds}
+        else:
+            # Output files only hold the companies that are kept, the filtered ones are listed
+            # apart so that the next delta sync does not take them for new ones
+            options = {"filtered_path": args.filtered_list} if args.delta else {}
+        sink = create_sink(args.sink, args.output, **options)
+        try:
+            scraped = scrape_pending(
+                fetcher, companies, journal, resume=args.resume, workers=workers, cif_index=cif_index, sink=sink
+            )
+        finally:
+            fetcher.close()
+            crawler.close()
+            sink.close()
+            if cif_index is not None:
+                cif_index.save()
+
+        if delta is not None:
+            # db/load_companies.py --prune deletes what is not in the list, so a partial list
+            # would delete the companies of the pages that were not read
+            if crawler.complete:
+                delta.write_ranking_list(args.ranking_list)
+                listed = f"Ranking list written to '{args.ranking_list}'."
+            else:
+                remove_ranking_list(args.ranking_list)
+                listed = "The ranking was not crawled to the end, no ranking list was written for --prune."
+            if args.sink != "postgres":
+                listed += f" Filtered companies written to '{args.filtered_list}' for --filtered."
+            print(
+                f"Delta sync: {delta.stats['new']} new, {delta.stats['stale']} stale, "
+                f"{delta.stats['changed']} changed, {delta.stats['fresh']} fresh companies skipped. {listed}"
+            )
 
-        print("EBITDA extraction complete. The results have been added to 'companies.csv'.")
+        if not scraped:
+            print("No companies to scrape." if delta is not None else "No companies found in the ranking.")
+            return
+
+        report = sink.report
+        print(
+            f"{report['kept']} of {report['rows']} companies kept: "
+            f"{report['missing_ebitda']} without EBITDA, {report['corrupted_ebitda']} with a corrupted EBITDA, "
+            f"{report['below_threshold']} below the threshold, {report['invalid_cif']} without a valid CIF."
+        )
+        print(f"EBITDA extraction complete. The results have been added to '{sink.path}'.")
+
+        print_wait_report(waits, limiter)
+        if cache is not None:
+            print_cache_report(cache)
+        if browsers.stats["started"]:
+            print(
+                f"Browsers: {browsers.stats['started']} sessions started, {browsers.stats['recycled']} recycled, "
+                f"{browsers.stats['crashed']} crashed."
+            )
+        if cif_index is not None:
+            print(f"CIF index: {cif_index.stats['hits']} hits, {cif_index.stats['misses']} misses.")
 
     except Exception as e:
         print(f"An error occurred: {e}")
+        print(f"Completed companies are saved in '{journal.path}', run again with --resume to continue.")
+
+    finally:
+        if args.metrics_report:
+            registry.write_report(args.metrics_report)
+            print(f"Metrics report written to '{args.metrics_report}'.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,358 @@
+import os
+import time
+import queue
+import threading
+from abc import ABC, abstractmethod
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from db.connection import connect_to_database
+from db.load_companies import UPSERT_ACTIONS, create_table, merge_frame, record_filtered
+from metrics.registry import histogram
+from scrap_job.transform import COLUMNS, EBITDA_THRESHOLD, split_results
+
+
+RESULT_COLUMNS = ["Nombre de la empresa", "Fuente de la información EBITDA", "EBITDA 2023", "CIF"]
+# The companies filtered out by split_results(), as db.load_companies.record_filtered() reads them
+FILTERED_COLUMNS = ["Nombre de la empresa", "Fuente de la información EBITDA", "below_threshold"]
+
+PARQUET_SCHEMA = pa.schema([
+    ("Nombre de la empresa", pa.string()),
+    ("Fuente de la información EBITDA", pa.string()),
+    ("Fuente de la información CIF", pa.string()),
+    ("CIF", pa.string()),
+    ("EBITDA 2023", pa.float64()),
+])
+
+DB_BATCH_SECONDS = histogram(
+    "scrap_db_sink_batch_seconds", "Time to write one batch to the database, by outcome.", ("outcome",)
+)
+DB_BACKPRESSURE_SECONDS = histogram(
+    "scrap_db_sink_backpressure_seconds", "Time the scraper waited for the database writer to take a batch."
+)
+
+
+class ResultSink(ABC):
+    """
+    Writes scraped companies to an output while the run goes on.
+
+    Results are buffered in small batches; every batch goes through split_results() and is
+    handed to write_results(), so only one batch is ever held in memory. Subclasses implement
+    write_results() and close_file() for their output.
+    """
+
+    extension = None
+    batch_size = 1000
+
+    def __init__(self, path=None, batch_size=None, threshold=EBITDA_THRESHOLD):
+        self.path = path or f"companies.{self.extension}"
+        self.batch_size = batch_size or self.batch_size
+        self.threshold = threshold
+        self.buffer = []
+        self.report = {
+            "rows": 0,
+            "corrupted_ebitda": 0,
+            "missing_ebitda": 0,
+            "invalid_cif": 0,
+            "below_threshold": 0,
+            "kept": 0,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, result):
+        """
+        Adds one scraped company.
+
+        Input:
+            result (tuple): (company name, company URL, raw EBITDA text or None, CIF or None).
+
+        Output:
+            None
+        """
+        self.buffer.append(result)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Transforms the buffered companies and writes them out.
+        """
+        if not self.buffer:
+            return
+
+        df = pd.DataFrame(self.buffer, columns=RESULT_COLUMNS)
+        self.buffer = []
+        df["Fuente de la información CIF"] = df["Fuente de la información EBITDA"]
+
+        df, dropped, report = split_results(df[COLUMNS], self.threshold)
+        for key, count in report.items():
+            self.report[key] += count
+
+        self.write_results(df, dropped)
+
+    def close(self):
+        self.flush()
+        self.close_file()
+
+    @abstractmethod
+    def write_results(self, df, dropped):
+        """
+        Writes one transformed batch.
+
+        Input:
+            df (pd.DataFrame): The companies that are kept, in the COLUMNS order.
+            dropped (pd.DataFrame): The companies that were filtered out, see split_results().
+
+        Output:
+            None
+        """
+
+    @abstractmethod
+    def close_file(self):
+        """
+        Releases the output once every batch is written.
+        """
+
+
+class FileSink(ResultSink):
+    """
+    Appends the companies that are kept to an output file. Subclasses implement write_frame()
+    and close_file() for their file format.
+
+    With filtered_path, the companies that were scraped but filtered out are listed in that
+    CSV file, which db/load_companies.py --filtered records like PostgresSink does in 'sync'
+    mode, so that a delta sync does not scrape them again as new ones.
+    """
+
+    def __init__(self, path=None, batch_size=None, threshold=EBITDA_THRESHOLD, filtered_path=None):
+        super().__init__(path, batch_size, threshold)
+        self.filtered_file = None
+        if filtered_path:
+            self.filtered_file = open(filtered_path, "w", encoding="utf-8", newline="")
+            pd.DataFrame(columns=FILTERED_COLUMNS).to_csv(self.filtered_file, index=False)
+
+    def write_results(self, df, dropped):
+        # Output files only hold the companies that are kept
+        if len(df):
+            self.write_frame(df)
+        if self.filtered_file is not None and len(dropped):
+            dropped[FILTERED_COLUMNS].to_csv(self.filtered_file, index=False, header=False)
+            self.filtered_file.flush()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self.filtered_file is not None:
+                self.filtered_file.close()
+
+    @abstractmethod
+    def write_frame(self, df):
+        """
+        Appends a batch of kept companies to the file.
+        """
+
+
+class CsvSink(FileSink):
+    """
+    Appends the companies to a CSV file (UTF-8 with BOM, so that Excel shows the accents).
+    """
+
+    extension = "csv"
+
+    def __init__(self, path=None, batch_size=None, threshold=EBITDA_THRESHOLD, filtered_path=None):
+        super().__init__(path, batch_size, threshold, filtered_path)
+        self.file = open(self.path, "w", encoding="utf-8-sig", newline="")
+        pd.DataFrame(columns=COLUMNS).to_csv(self.file, index=False)
+
+    def write_frame(self, df):
+        df.to_csv(self.file, index=False, header=False)
+        self.file.flush()
+
+    def close_file(self):
+        self.file.close()
+
+
+class ParquetSink(FileSink):
+    """
+    Writes the companies to a typed, zstd-compressed Parquet file, one row group per batch.
+    """
+
+    extension = "parquet"
+    batch_size = 10000
+
+    def __init__(self, path=None, batch_size=None, threshold=EBITDA_THRESHOLD, filtered_path=None):
+        super().__init__(path, batch_size, threshold, filtered_path)
+        # Written next to the final path and renamed on close, a Parquet file is only
+        # readable once its footer is written
+        self.temporary_path = f"{self.path}.tmp"
+        self.writer = pq.ParquetWriter(self.temporary_path, PARQUET_SCHEMA, compression="zstd")
+
+    def write_frame(self, df):
+        table = pa.Table.from_pandas(df, schema=PARQUET_SCHEMA, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close_file(self):
+        self.writer.close()
+        os.replace(self.temporary_path, self.path)
+
+
+class PostgresSink(ResultSink):
+    """
+    Writes the companies straight into the 'companies' table while the run goes on, so that
+    the API serves them seconds after they are scraped, without an output file to load.
+
+    A batch is handed over when it is full or flush_interval seconds after its first company,
+    to a writer thread that merges it with db.load_companies.merge_frame() in its own
+    transaction. At most max_pending batches wait for the writer: when the database is slower
+    than the scraper, write() blocks instead of piling batches up. A failed batch is retried
+    with exponential backoff on a new connection, and counted in report['failed'] once every
+    attempt failed.
+
+    In 'sync' mode, the mode of delta syncs, the companies that were scraped but filtered out
+    are recorded in the same transaction with db.load_companies.record_filtered(): stored ones
+    whose EBITDA fell to or below the threshold are deleted, and none of them is taken for a
+    new or stale company by the next delta sync.
+    """
+
+    batch_size = 100
+
+    def __init__(self, path=None, batch_size=None, threshold=EBITDA_THRESHOLD, mode="sync", flush_interval=2.0,
+                 max_pending=4, retries=3, backoff=1.0):
+        if mode not in UPSERT_ACTIONS:
+            raise ValueError(f"Unknown mode '{mode}'. Choose one of: {', '.join(UPSERT_ACTIONS)}")
+        super().__init__(path or "companies", batch_size, threshold)
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.report.update(inserted=0, updated=0, deleted=0, failed=0)
+        self.lock = threading.RLock()
+        self.first_buffered = None
+        self.batches = queue.Queue(maxsize=max_pending)
+        self.closing = threading.Event()
+        self.conn = None
+
+        create_table()
+        self.writer = threading.Thread(target=self.write_batches, daemon=True)
+        self.writer.start()
+        self.timer = threading.Thread(target=self.flush_on_time, daemon=True)
+        self.timer.start()
+
+    def write(self, result):
+        with self.lock:
+            if not self.buffer:
+                self.first_buffered = time.monotonic()
+            super().write(result)
+
+    def flush(self):
+        with self.lock:
+            super().flush()
+
+    def flush_on_time(self):
+        while not self.closing.wait(self.flush_interval / 4):
+            with self.lock:
+                if self.buffer and time.monotonic() - self.first_buffered >= self.flush_interval:
+                    self.flush()
+
+    def write_results(self, df, dropped):
+        if self.mode != "sync":
+            dropped = dropped.iloc[:0]
+        if not len(df) and not len(dropped):
+            return
+        start = time.perf_counter()
+        self.batches.put((df, dropped))
+        DB_BACKPRESSURE_SECONDS.observe(time.perf_counter() - start)
+
+    def write_batches(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                break
+            self.write_batch(*batch)
+        if self.conn is not None:
+            self.conn.close()
+
+    def write_batch(self, df, dropped):
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                if self.conn is None:
+                    self.conn = connect_to_database()
+                    if self.conn is None:
+                        raise RuntimeError("no database connection")
+                inserted = updated = deleted = 0
+                with self.conn.cursor() as cur:
+                    if len(df):
+                        counts = merge_frame(cur, df, self.mode)
+                        inserted, updated = counts["inserted"], counts["updated"]
+                    if len(dropped):
+                        deleted, _ = record_filtered(cur, dropped)
+                self.conn.commit()
+            except Exception as e:
+                DB_BATCH_SECONDS.observe(time.perf_counter() - start, outcome="error")
+                print(f"Error writing {len(df) + len(dropped)} companies to the database (attempt {attempt + 1}): {e}")
+                self.discard_connection()
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            DB_BATCH_SECONDS.observe(time.perf_counter() - start, outcome="written")
+            self.report["inserted"] += inserted
+            self.report["updated"] += updated
+            self.report["deleted"] += deleted
+            return
+
+        self.report["failed"] += len(df) + len(dropped)
+
+    def discard_connection(self):
+        if self.conn is None:
+            return
+        try:
+            self.conn.rollback()
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = None
+
+    def close_file(self):
+        self.closing.set()
+        self.timer.join()
+        self.batches.put(None)
+        self.writer.join()
+        print(
+            f"Database: {self.report['inserted']} companies inserted, {self.report['updated']} updated, "
+            f"{self.report['deleted']} deleted below the threshold, {self.report['failed']} failed."
+        )
+
+
+SINKS = {
+    "csv": CsvSink,
+    "parquet": ParquetSink,
+    "postgres": PostgresSink,
+}
+
+
+def create_sink(name, path=None, batch_size=None, **options):
+    """
+    Builds the output sink chosen on the command line.
+
+    Input:
+        name (str): 'csv', 'parquet' or 'postgres'.
+        path (str | None): The output file, defaults to companies.csv / companies.parquet.
+        batch_size (int | None): Number of companies transformed and written at once.
+        options: Further arguments of the sink class, e.g. the mode of PostgresSink or the
+                 filtered_path of the file sinks.
+
+    Output:
+        ResultSink: The sink.
+    """
+    if name not in SINKS:
+        raise ValueError(f"Unknown sink '{name}'. Choose one of: {', '.join(SINKS)}")
+
+    return SINKS[name](path, batch_size, **options)
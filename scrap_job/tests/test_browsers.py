@@ -0,0 +1,102 @@
+import time
+import threading
+from unittest.mock import MagicMock, patch
+from scrap_job import browsers
+from scrap_job.browsers import BrowserPool, allowed_hosts, blocking_pac, driver_path, firefox_options
+
+
+def test_firefox_options_are_eager_headless_and_blocking():
+    options = firefox_options(hosts=["eleconomista.es"])
+
+    assert options.page_load_strategy == "eager"
+    assert "-headless" in options.arguments
+    assert options.preferences["permissions.default.image"] == 2
+    assert options.preferences["gfx.downloadable_fonts.enabled"] is False
+    assert options.preferences["network.proxy.type"] == 2
+    assert options.preferences["network.proxy.autoconfig_url"].startswith("data:text/javascript,")
+
+
+def test_firefox_options_without_blocking():
+    options = firefox_options(headless=False, block_assets=False)
+
+    assert "-headless" not in options.arguments
+    assert "permissions.default.image" not in options.preferences
+    assert "network.proxy.type" not in options.preferences
+
+
+def test_allowed_hosts():
+    assert allowed_hosts(
+        "https://ranking-empresas.eleconomista.es/ranking_empresas_nacional.html",
+        "https://www.datoscif.es/empresa/{slug}",
+        "http://127.0.0.1:8000/empresa/{slug}",
+    ) == ["eleconomista.es", "datoscif.es", "127.0.0.1", "privacy-center.org"]
+
+    pac = blocking_pac(["datoscif.es"])
+    assert 'dnsDomainIs(host, ".datoscif.es")' in pac
+    assert "PROXY 127.0.0.1:9" in pac
+
+
+@patch("scrap_job.browsers.GeckoDriverManager")
+@patch("scrap_job.browsers.shutil.which", return_value=None)
+def test_driver_path_is_remembered(mock_which, mock_manager, tmp_path, monkeypatch):
+    driver = tmp_path / "geckodriver"
+    driver.write_text("")
+    driver.chmod(0o755)
+    mock_manager.return_value.install.return_value = str(driver)
+    monkeypatch.delenv(browsers.DRIVER_PATH_ENV, raising=False)
+    monkeypatch.setattr(browsers, "DRIVER_PATH_FILE", str(tmp_path / "cache" / "geckodriver_path"))
+
+    assert driver_path() == str(driver)
+    assert driver_path() == str(driver)
+    # Only the first lookup goes to webdriver-manager
+    mock_manager.return_value.install.assert_called_once()
+
+    monkeypatch.setenv(browsers.DRIVER_PATH_ENV, "/opt/geckodriver")
+    assert driver_path() == "/opt/geckodriver"
+
+
+@patch("scrap_job.browsers.start_driver")
+def test_pool_reuses_and_recycles_sessions(mock_start_driver):
+    first, second = MagicMock(), MagicMock()
+    mock_start_driver.side_effect = [first, second]
+    pool = BrowserPool(size=1, max_pages=2)
+
+    drivers = []
+    for _ in range(3):
+        with pool.session() as session:
+            drivers.append(session.driver)
+
+    assert drivers == [first, first, second]
+    first.quit.assert_called_once()
+    assert pool.stats == {"started": 2, "recycled": 1, "crashed": 0}
+
+    pool.close()
+    second.quit.assert_called_once()
+
+
+@patch("scrap_job.browsers.start_driver")
+def test_pool_never_starts_more_than_size_browsers(mock_start_driver):
+    mock_start_driver.side_effect = lambda *args: MagicMock()
+    pool = BrowserPool(size=2)
+    in_use = []
+    most_in_use = []
+    lock = threading.Lock()
+
+    def load_page():
+        with pool.session() as session:
+            with lock:
+                in_use.append(session)
+                most_in_use.append(len(in_use))
+            time.sleep(0.01)
+            with lock:
+                in_use.remove(session)
+
+    threads = [threading.Thread(target=load_page) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(most_in_use) <= 2
+    assert mock_start_driver.call_count == 2
+    pool.close()
@@ -0,0 +1,184 @@
+import os
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scrap_job.cache import ResponseCache
+from scrap_job.fetchers import HttpFetcher
+from scrap_job.parsers import parse_ranking
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+    # Serves one page with a fixed ETag and answers 304 to matching conditional requests
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/missing.html":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = "<html><body><span itemprop='taxID'>A46103834</span></body></html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def etag_server():
+    ETagHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ETagHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_entries_are_fresh_until_their_host_ttl(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path), ttls={"www.datoscif.es": 100}, default_ttl=10, clock=clock)
+
+    cache.put("https://www.datoscif.es/empresa/mercadona-sa", "<html>cif</html>", etag='"abc"')
+    cache.put("https://example.com/page", "<html>other</html>")
+    clock.now += 50
+
+    entry = cache.get("https://www.datoscif.es/empresa/mercadona-sa")
+    assert entry.body == "<html>cif</html>"
+    assert entry.etag == '"abc"'
+    assert entry.fresh
+    assert not cache.get("https://example.com/page").fresh
+    assert cache.get("https://example.com/unknown") is None
+
+
+def test_refresh_makes_a_stale_entry_fresh(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path), default_ttl=10, clock=clock)
+
+    cache.put("https://example.com/page", "<html></html>", last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+    clock.now += 20
+    assert not cache.get("https://example.com/page").fresh
+
+    cache.refresh("https://example.com/page")
+
+    entry = cache.get("https://example.com/page")
+    assert entry.fresh
+    assert entry.last_modified == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=250)
+
+    cache.put("https://example.com/a", "a" * 100)
+    cache.put("https://example.com/b", "b" * 100)
+    os.utime(cache.paths("https://example.com/a")[0], (1, 1))
+    os.utime(cache.paths("https://example.com/b")[0], (2, 2))
+    cache.get("https://example.com/a")
+    cache.put("https://example.com/c", "c" * 100)
+
+    assert cache.get("https://example.com/a") is not None
+    assert cache.get("https://example.com/b") is None
+    assert cache.get("https://example.com/c") is not None
+    assert cache.size <= 250
+
+
+def test_fetcher_serves_fresh_pages_from_cache(tmp_path, etag_server):
+    cache = ResponseCache(str(tmp_path), default_ttl=3600)
+    fetcher = HttpFetcher(timeout=5, cache=cache)
+    try:
+        first = fetcher.fetch(f"{etag_server}/page.html")
+        second = fetcher.fetch(f"{etag_server}/page.html")
+    finally:
+        fetcher.close()
+
+    assert first == second
+    assert len(ETagHandler.requests_seen) == 1
+    assert cache.stats == {"hits": 1, "revalidated": 0, "misses": 1}
+    assert cache.hit_ratio() == 0.5
+
+
+def test_fetcher_revalidates_stale_pages_with_etag(tmp_path, etag_server):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path), default_ttl=10, clock=clock)
+    fetcher = HttpFetcher(timeout=5, cache=cache)
+    try:
+        first = fetcher.fetch(f"{etag_server}/page.html")
+        clock.now += 20
+        second = fetcher.fetch(f"{etag_server}/page.html")
+    finally:
+        fetcher.close()
+
+    assert first == second
+    assert ETagHandler.requests_seen == [("/page.html", None), ("/page.html", '"v1"')]
+    assert cache.stats["revalidated"] == 1
+    assert cache.get(f"{etag_server}/page.html").fresh
+
+
+def test_fetcher_remembers_missing_pages(tmp_path, etag_server):
+    cache = ResponseCache(str(tmp_path), default_ttl=3600)
+    fetcher = HttpFetcher(timeout=5, cache=cache)
+    try:
+        assert fetcher.fetch(f"{etag_server}/missing.html") is None
+        assert fetcher.fetch(f"{etag_server}/missing.html") is None
+    finally:
+        fetcher.close()
+
+    assert len(ETagHandler.requests_seen) == 1
+
+
+def test_missing_pages_expire_with_the_negative_ttl(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path), ttls={"www.datoscif.es": 365 * 86400}, negative_ttl=86400, clock=clock)
+
+    cache.put("https://www.datoscif.es/empresa/new-company-sl", "")
+    cache.put("https://www.datoscif.es/empresa/mercadona-sa", "<html>cif</html>")
+    clock.now += 2 * 86400
+
+    # The company may have been published since, its page is asked for again
+    assert not cache.get("https://www.datoscif.es/empresa/new-company-sl").fresh
+    assert cache.get("https://www.datoscif.es/empresa/mercadona-sa").fresh
+
+
+def test_offline_fetcher_replays_the_cache_without_network(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path), default_ttl=10, clock=clock)
+    cache.put("http://127.0.0.1:9/page.html", "<html>cached</html>")
+    clock.now += 1000
+
+    fetcher = HttpFetcher(timeout=5, cache=cache, offline=True)
+
+    assert fetcher.fetch("http://127.0.0.1:9/page.html") == "<html>cached</html>"
+    assert fetcher.fetch("http://127.0.0.1:9/other.html") is None
+    assert cache.stats == {"hits": 1, "revalidated": 0, "misses": 1}
+
+
+def test_parse_ranking_from_fixture():
+    with open(os.path.join(FIXTURES_DIR, "ranking_page.html"), encoding="utf-8") as file:
+        page = file.read()
+
+    company_data = parse_ranking(page, "https://ranking-empresas.eleconomista.es/ranking_empresas_nacional.html")
+
+    assert company_data == [
+        ("REPSOL PETROLEO SA", "https://ranking-empresas.eleconomista.es/REPSOL-PETROLEO.html"),
+        ("MERCADONA SA", "https://ranking-empresas.eleconomista.es/MERCADONA.html"),
+        ("ENGIE ESPAÑA SL.", "https://ranking-empresas.eleconomista.es/ENGIE-ESPANA.html"),
+    ]
@@ -0,0 +1,141 @@
+from unittest.mock import MagicMock, patch
+from scrap_job.cif_index import CifIndex, is_valid_cif, load_companies_table, normalize_cif
+from scrap_job.names import clean_company_name, normalize_company_name, slug_candidates
+from scrap_job.scrap import resolve_cif
+
+
+def cif_page(cif):
+    return f"<html><body><span itemprop='taxID'>{cif}</span></body></html>"
+
+
+def test_is_valid_cif():
+    assert is_valid_cif("A46103834")
+    assert is_valid_cif("B82508441")
+    assert is_valid_cif("a-46.103.834")
+    assert not is_valid_cif("A46103835")
+    assert not is_valid_cif("N/A")
+    assert not is_valid_cif("")
+    assert not is_valid_cif(None)
+
+
+def test_normalize_cif():
+    assert normalize_cif(" a46 103.834 ") == "A46103834"
+
+
+def test_normalize_company_name():
+    expected = "engie espana sl"
+    assert normalize_company_name("ENGIE ESPAÑA SL.") == expected
+    assert normalize_company_name("Engie España S.L.U.") == expected
+    assert normalize_company_name("ENGIE ESPANA SOCIEDAD LIMITADA") == expected
+    assert normalize_company_name("BP ENERGIA ESPAÑA S.A.U.") == "bp energia espana sa"
+
+
+def test_slug_candidates_start_with_the_clean_name():
+    candidates = slug_candidates("SEAT SAU")
+
+    assert candidates[0] == clean_company_name("SEAT SAU") == "seat-sa"
+    assert "seat-sau" in candidates
+    assert "seat" in candidates
+    assert len(candidates) == len(set(candidates))
+
+
+def test_index_lookup_by_normalized_name():
+    index = CifIndex()
+    index.add("MERCADONA SA", "A46103834")
+    index.add("ENGIE ESPAÑA SL.", "B82508441")
+
+    assert index.lookup("Mercadona S.A.U.") == "A46103834"
+    assert index.lookup("ENGIE ESPANA SOCIEDAD LIMITADA") == "B82508441"
+    assert index.lookup("ENGIE ESPANNA SL") is None
+    assert index.lookup("REPSOL TRADING SA") is None
+    assert index.stats == {"hits": 2, "misses": 2}
+
+
+def test_index_never_matches_sibling_legal_entities():
+    index = CifIndex()
+    index.add("MERCADONA LOGISTICA SA", "A46103834")
+    index.add("ENDESA GENERACION II SA", "B82508441")
+
+    # Another legal form or another number is another company, with its own CIF
+    assert index.lookup("MERCADONA LOGISTICA SL") is None
+    assert index.lookup("ENDESA GENERACION III SA") is None
+    assert index.lookup("ENDESA GENERACION I SA") is None
+    assert index.lookup("MERCADONA LOGISTICA S.A.") == "A46103834"
+
+
+def test_index_rejects_invalid_cifs():
+    index = CifIndex()
+
+    assert not index.add("MERCADONA SA", "A46103835")
+    assert not index.add("MERCADONA SA", "N/A")
+    assert len(index) == 0
+
+
+def test_index_save_and_load(tmp_path):
+    path = str(tmp_path / "cif_index.json")
+    index = CifIndex(path)
+    index.add("MERCADONA SA", "A46103834", "mercadona-sa")
+    index.save()
+
+    loaded = CifIndex.load(path)
+
+    assert loaded.lookup("MERCADONA SA") == "A46103834"
+    assert loaded.entries["mercadona sa"]["slug"] == "mercadona-sa"
+
+
+def test_index_add_records():
+    index = CifIndex()
+    records = [
+        {"company_name": "MERCADONA SA", "cif": "A46103834"},
+        {"company_name": "SEAT SAU", "cif": "N/A"},
+    ]
+
+    assert index.add_records(records) == 1
+
+
+def test_resolve_cif_uses_the_index_without_network():
+    index = CifIndex()
+    index.add("MERCADONA SA", "A46103834")
+    mock_fetcher = MagicMock()
+
+    assert resolve_cif(mock_fetcher, "MERCADONA SA", index) == "A46103834"
+    mock_fetcher.fetch.assert_not_called()
+
+
+def test_resolve_cif_tries_all_candidates_in_one_batch():
+    pages = {"https://www.datoscif.es/empresa/seat-sau": cif_page("A28049161")}
+    mock_fetcher = MagicMock(concurrent=True)
+    mock_fetcher.fetch.side_effect = lambda url, ready=None: pages.get(url)
+    index = CifIndex()
+
+    assert resolve_cif(mock_fetcher, "SEAT SAU", index) == "A28049161"
+    assert mock_fetcher.fetch.call_count == len(slug_candidates("SEAT SAU"))
+    assert index.entries["seat sa"] == {"cif": "A28049161", "slug": "seat-sau"}
+
+
+def test_resolve_cif_with_a_browser_stops_at_the_first_hit():
+    mock_fetcher = MagicMock(concurrent=False)
+    mock_fetcher.fetch.return_value = cif_page("A28049161")
+
+    assert resolve_cif(mock_fetcher, "SEAT SAU") == "A28049161"
+    mock_fetcher.fetch.assert_called_once()
+
+
+def test_resolve_cif_rejects_invalid_values():
+    mock_fetcher = MagicMock(concurrent=False)
+    mock_fetcher.fetch.return_value = cif_page("A00000000X")
+
+    assert resolve_cif(mock_fetcher, "SEAT SAU") is None
+
+
+@patch("scrap_job.cif_index.connect_to_database")
+def test_load_companies_table(mock_connect):
+    mock_conn = MagicMock()
+    mock_cursor = mock_conn.cursor.return_value.__enter__.return_value
+    mock_cursor.__iter__.return_value = iter([("MERCADONA SA", "A46103834"), ("BROKEN SA", "123")])
+    mock_connect.return_value = mock_conn
+    index = CifIndex()
+
+    assert load_companies_table(index) == 1
+    mock_cursor.execute.assert_called_once_with("SELECT company_name, cif FROM companies")
+    mock_conn.close.assert_called_once()
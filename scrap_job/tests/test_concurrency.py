@@ -0,0 +1,175 @@
+import time
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scrap_job.fetchers import HttpFetcher
+from scrap_job.concurrency import HostRateLimiter, TokenBucket, map_ordered, run_pipeline
+
+LATENCY = 0.2
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    # Stand-in for the real websites: answers every page after a fixed latency
+    def do_GET(self):
+        time.sleep(LATENCY)
+        body = f"<html><body>{self.path}</body></html>".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(0.5)
+
+
+def test_token_bucket_rejects_invalid_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_host_rate_limiter_uses_one_bucket_per_host():
+    limiter = HostRateLimiter(rate=1)
+
+    assert limiter.bucket_for("https://a.com/x") is limiter.bucket_for("https://a.com/y")
+    assert limiter.bucket_for("https://a.com/x") is not limiter.bucket_for("https://b.com/x")
+
+
+def test_map_ordered_keeps_input_order():
+    def slow_identity(value):
+        time.sleep(0.01 * (5 - value))
+        return value
+
+    assert map_ordered(slow_identity, range(5), workers=5) == [0, 1, 2, 3, 4]
+
+
+def test_concurrent_fetching_scales_with_workers(slow_server):
+    urls = [f"{slow_server}/company-{i}.html" for i in range(8)]
+    fetcher = HttpFetcher(timeout=5, pool_size=8)
+    try:
+        start = time.perf_counter()
+        sequential = map_ordered(fetcher.fetch, urls, workers=1)
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        concurrent = map_ordered(fetcher.fetch, urls, workers=8)
+        concurrent_time = time.perf_counter() - start
+    finally:
+        fetcher.close()
+
+    assert concurrent == sequential
+    assert sequential_time >= 8 * LATENCY
+    assert concurrent_time < sequential_time / 3
+
+
+def test_rate_limit_caps_throughput_per_host(slow_server):
+    urls = [f"{slow_server}/company-{i}.html" for i in range(6)]
+    fetcher = HttpFetcher(timeout=5, pool_size=6, limiter=HostRateLimiter(rate=10, burst=1))
+    try:
+        start = time.perf_counter()
+        map_ordered(fetcher.fetch, urls, workers=6)
+        elapsed = time.perf_counter() - start
+    finally:
+        fetcher.close()
+
+    # 6 requests at 10 per second cannot all start before 0.5 s
+    assert elapsed >= 0.5
+
+
+def test_run_pipeline_keeps_production_order():
+    def slow_identity(value):
+        time.sleep(0.01 * (5 - value))
+        return value
+
+    assert run_pipeline(iter(range(5)), slow_identity, workers=3) == [0, 1, 2, 3, 4]
+
+
+def test_run_pipeline_emits_results_in_production_order():
+    def slow_identity(value):
+        time.sleep(0.01 * (5 - value))
+        return value
+
+    emitted = []
+
+    assert run_pipeline(iter(range(5)), slow_identity, workers=3, emit=emitted.append) == 5
+    assert emitted == [0, 1, 2, 3, 4]
+
+
+def test_run_pipeline_starts_before_the_producer_is_done():
+    first_processed = threading.Event()
+
+    def producer():
+        yield 0
+        # The second item is only produced once the first one has been processed
+        assert first_processed.wait(timeout=5)
+        yield 1
+
+    def process(value):
+        first_processed.set()
+        return value * 10
+
+    assert run_pipeline(producer(), process, workers=2) == [0, 10]
+
+
+def test_run_pipeline_bounds_the_queue():
+    produced = []
+    release = threading.Event()
+
+    def producer():
+        for value in range(20):
+            produced.append(value)
+            yield value
+
+    def process(value):
+        release.wait(timeout=5)
+        return value
+
+    thread = threading.Thread(target=lambda: run_pipeline(producer(), process, workers=1, queue_size=2))
+    thread.start()
+    time.sleep(0.2)
+    # One item in the worker, two in the queue and one blocked on put
+    assert len(produced) <= 4
+    release.set()
+    thread.join(timeout=5)
+    assert len(produced) == 20
+
+
+def test_run_pipeline_raises_worker_errors():
+    def process(value):
+        if value == 3:
+            raise RuntimeError("driver crashed")
+        return value
+
+    with pytest.raises(RuntimeError, match="driver crashed"):
+        run_pipeline(iter(range(50)), process, workers=2)
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from scrap_job.delta import DeltaFilter, load_scraped_companies
+
+NOW = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+def test_delta_filter_skips_fresh_companies():
+    known = {
+        "https://example.com/FRESH.html": ("FRESH SA", NOW - timedelta(days=1)),
+        "https://example.com/STALE.html": ("STALE SA", NOW - timedelta(days=30)),
+        "https://example.com/NEVER.html": ("NEVER SA", None),
+        "https://example.com/RENAMED.html": ("OLD NAME SA", NOW - timedelta(days=1)),
+    }
+    ranking = [
+        ("FRESH SA", "https://example.com/FRESH.html"),
+        ("STALE SA", "https://example.com/STALE.html"),
+        ("NEVER SA", "https://example.com/NEVER.html"),
+        ("NEW NAME SA", "https://example.com/RENAMED.html"),
+        ("NEW SL", "https://example.com/NEW.html"),
+    ]
+    delta = DeltaFilter(known, timedelta(days=7), now=NOW)
+
+    assert list(delta.filter(ranking)) == ranking[1:]
+    assert delta.stats == {"new": 1, "stale": 2, "changed": 1, "fresh": 1}
+    assert delta.seen == [url for _, url in ranking]
+
+
+def test_delta_filter_writes_the_ranking_list(tmp_path):
+    delta = DeltaFilter({}, now=NOW)
+    list(delta.filter([("A SA", "https://example.com/A.html"), ("B SA", "https://example.com/B.html")]))
+
+    delta.write_ranking_list(tmp_path / "companies.ranking.txt")
+
+    assert (tmp_path / "companies.ranking.txt").read_text().splitlines() == [
+        "https://example.com/A.html", "https://example.com/B.html",
+    ]
+
+
+@patch("scrap_job.delta.connect_to_database")
+def test_load_scraped_companies(mock_connect):
+    mock_cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.__iter__.return_value = iter([("https://example.com/A.html", "A SA", NOW)])
+
+    assert load_scraped_companies() == {"https://example.com/A.html": ("A SA", NOW)}
+    # Companies filtered out by the scraper are known through their tombstones
+    assert "FROM scrap_tombstones" in mock_cursor.execute.call_args.args[0]
+    mock_connect.return_value.close.assert_called_once()
+
+
+@patch("scrap_job.delta.connect_to_database")
+def test_load_scraped_companies_scrapes_everything_on_error(mock_connect):
+    mock_cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.execute.side_effect = Exception('column "last_scraped_at" does not exist')
+
+    assert load_scraped_companies() == {}
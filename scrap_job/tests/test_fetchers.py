@@ -0,0 +1,113 @@
+import os
+import threading
+import functools
+import pytest
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, PropertyMock, patch
+from scrap_job.browsers import BrowserPool
+from scrap_job.fetchers import HttpFetcher, SeleniumFetcher, create_fetcher
+from scrap_job.parsers import clean_ebitda_value, parse_cif, parse_ebitda
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fixture_server():
+    # Serve the saved HTML pages from a local HTTP server
+    handler = functools.partial(QuietHandler, directory=FIXTURES_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def test_clean_ebitda_value():
+    assert clean_ebitda_value("1.956.941.000 €") == 1956941000.0
+
+
+def test_parse_ebitda_from_fixture():
+    assert parse_ebitda(read_fixture("company_mercadona.html")) == 1956941000.0
+
+
+def test_parse_ebitda_missing_row():
+    assert parse_ebitda(read_fixture("company_no_ebitda.html")) is None
+    assert parse_ebitda("") is None
+
+
+def test_parse_cif_from_fixture():
+    assert parse_cif(read_fixture("datoscif_mercadona.html")) == "A46103834"
+
+
+def test_parse_cif_not_found():
+    assert parse_cif(read_fixture("datoscif_not_found.html")) is None
+
+
+def test_http_fetcher_against_local_server(fixture_server):
+    fetcher = HttpFetcher(timeout=5)
+    try:
+        page = fetcher.fetch(f"{fixture_server}/company_mercadona.html")
+        assert parse_ebitda(page) == 1956941000.0
+
+        page = fetcher.fetch(f"{fixture_server}/datoscif_mercadona.html")
+        assert parse_cif(page) == "A46103834"
+    finally:
+        fetcher.close()
+
+
+def test_http_fetcher_missing_page(fixture_server):
+    fetcher = HttpFetcher(timeout=5)
+    try:
+        assert fetcher.fetch(f"{fixture_server}/does-not-exist.html") is None
+    finally:
+        fetcher.close()
+
+
+def test_selenium_fetcher_returns_page_source():
+    mock_driver = MagicMock(page_source="<html></html>")
+    mock_waits = MagicMock()
+    browsers = BrowserPool()
+
+    with patch("scrap_job.browsers.start_driver", return_value=mock_driver):
+        fetcher = SeleniumFetcher(browsers, mock_waits)
+        assert fetcher.fetch("http://example.com", ready="ebitda") == "<html></html>"
+
+    mock_driver.get.assert_called_once_with("http://example.com")
+    mock_waits.until.assert_called_once_with(mock_driver, "ebitda")
+
+
+def test_selenium_fetcher_replaces_a_crashed_browser():
+    crashed = MagicMock()
+    crashed.get.side_effect = Exception("Browsing context has been discarded")
+    type(crashed).current_url = PropertyMock(side_effect=Exception("Session is gone"))
+    healthy = MagicMock(page_source="<html></html>")
+    browsers = BrowserPool()
+
+    with patch("scrap_job.browsers.start_driver", side_effect=[crashed, healthy]):
+        fetcher = SeleniumFetcher(browsers, MagicMock())
+        assert fetcher.fetch("http://example.com") is None
+        assert fetcher.fetch("http://example.com") == "<html></html>"
+
+    crashed.quit.assert_called_once()
+    assert browsers.stats == {"started": 2, "recycled": 0, "crashed": 1}
+
+
+def test_create_fetcher():
+    assert isinstance(create_fetcher("http"), HttpFetcher)
+    assert isinstance(create_fetcher("selenium", BrowserPool()), SeleniumFetcher)
+
+    with pytest.raises(ValueError):
+        create_fetcher("selenium")
+    with pytest.raises(ValueError):
+        create_fetcher("chrome")
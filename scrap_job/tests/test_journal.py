@@ -0,0 +1,66 @@
+from unittest.mock import patch
+from scrap_job.journal import RunJournal
+from scrap_job.scrap import scrape_pending
+
+COMPANIES = [
+    ("MERCADONA SA", "https://ranking-empresas.eleconomista.es/MERCADONA.html"),
+    ("SEAT SAU", "https://ranking-empresas.eleconomista.es/SEAT-SAU.html"),
+    ("REPSOL TRADING SA.", "https://ranking-empresas.eleconomista.es/REPSOL-TRADING.html"),
+]
+
+
+def test_append_and_load(tmp_path):
+    journal = RunJournal(str(tmp_path / "run.jsonl"))
+
+    journal.append("MERCADONA SA", COMPANIES[0][1], 1956941000.0, "A46103834")
+    journal.append("SEAT SAU", COMPANIES[1][1], "N/A", "N/A")
+
+    records = journal.load()
+    assert records[COMPANIES[0][1]]["cif"] == "A46103834"
+    assert records[COMPANIES[0][1]]["ebitda"] == 1956941000.0
+    assert records[COMPANIES[1][1]]["ebitda"] == "N/A"
+
+
+def test_load_ignores_a_line_cut_short_by_a_crash(tmp_path):
+    path = tmp_path / "run.jsonl"
+    journal = RunJournal(str(path))
+    journal.append("MERCADONA SA", COMPANIES[0][1], 1956941000.0, "A46103834")
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"company_name": "SEAT')
+
+    assert list(journal.load()) == [COMPANIES[0][1]]
+
+
+def test_load_missing_journal(tmp_path):
+    assert RunJournal(str(tmp_path / "missing.jsonl")).load() == {}
+
+
+@patch("scrap_job.scrap.scrape_company")
+def test_scrape_pending_resumes_from_the_journal(mock_scrape_company, tmp_path):
+    journal = RunJournal(str(tmp_path / "run.jsonl"))
+    journal.append("MERCADONA SA", COMPANIES[0][1], 1956941000.0, "A46103834")
+    mock_scrape_company.return_value = (1111000000.0, "A28049161")
+
+    results = scrape_pending(None, COMPANIES, journal, resume=True)
+
+    # Only the companies missing from the journal are scraped again
+    assert [call.args[1] for call in mock_scrape_company.call_args_list] == ["SEAT SAU", "REPSOL TRADING SA."]
+    assert results == [
+        ("MERCADONA SA", COMPANIES[0][1], 1956941000.0, "A46103834"),
+        ("SEAT SAU", COMPANIES[1][1], 1111000000.0, "A28049161"),
+        ("REPSOL TRADING SA.", COMPANIES[2][1], 1111000000.0, "A28049161"),
+    ]
+    assert len(journal.load()) == 3
+
+
+@patch("scrap_job.scrap.scrape_company")
+def test_scrape_pending_without_resume_starts_over(mock_scrape_company, tmp_path):
+    journal = RunJournal(str(tmp_path / "run.jsonl"))
+    journal.append("MERCADONA SA", COMPANIES[0][1], 1.0, "OLD")
+    mock_scrape_company.return_value = (1956941000.0, "A46103834")
+
+    results = scrape_pending(None, COMPANIES[:1], journal)
+
+    mock_scrape_company.assert_called_once()
+    assert results == [("MERCADONA SA", COMPANIES[0][1], 1956941000.0, "A46103834")]
+    assert journal.load()[COMPANIES[0][1]]["cif"] == "A46103834"
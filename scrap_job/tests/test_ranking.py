@@ -0,0 +1,111 @@
+import os
+import argparse
+import pytest
+from unittest.mock import MagicMock, patch
+from scrap_job.cache import ResponseCache
+from scrap_job.scrap import (
+    RANKING_SCRIPT, RANKING_URL, RankingCrawler, extract_ranking, load_ranking, page_range, ranking_page_url,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def test_ranking_page_url():
+    assert ranking_page_url(1) == RANKING_URL
+    assert ranking_page_url(3) == RANKING_URL + "?qPagina=3"
+
+
+def test_page_range():
+    assert page_range("1") == (1, 1)
+    assert page_range("2-5") == (2, 5)
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        page_range("5-2")
+    with pytest.raises(argparse.ArgumentTypeError):
+        page_range("abc")
+
+
+def test_crawl_follows_cached_pages_and_stops_at_top(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(ranking_page_url(1), read_fixture("ranking_page.html"))
+    cache.put(ranking_page_url(2), read_fixture("ranking_page.html"))
+
+    crawler = RankingCrawler(MagicMock(), cache, offline=True)
+    companies = list(crawler.crawl(1, 2, top=5))
+
+    assert len(companies) == 5
+    assert companies[0] == ("REPSOL PETROLEO SA", "https://ranking-empresas.eleconomista.es/REPSOL-PETROLEO.html")
+    assert companies[3] == companies[0]
+    assert crawler.browsers.stats["started"] == 0
+    # Cut by --top: the companies after the fifth were never read
+    assert not crawler.complete
+
+
+def test_crawl_stops_at_the_first_empty_page(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(ranking_page_url(1), read_fixture("ranking_page.html"))
+
+    crawler = RankingCrawler(MagicMock(), cache, offline=True)
+
+    assert len(list(crawler.crawl(1, 10))) == 3
+    # The empty page may have failed to load, the rest of the ranking is unknown
+    assert not crawler.complete
+
+
+@patch("scrap_job.browsers.start_driver")
+@patch("scrap_job.scrap.load_ranking")
+def test_crawl_starts_the_browser_once_and_closes_it(mock_load_ranking, mock_start_driver):
+    mock_driver = MagicMock()
+    mock_start_driver.return_value = mock_driver
+    mock_load_ranking.return_value = [("MERCADONA SA", "https://ranking-empresas.eleconomista.es/MERCADONA.html")]
+
+    crawler = RankingCrawler(MagicMock())
+    companies = list(crawler.crawl(1, 3))
+
+    assert len(companies) == 3
+    assert crawler.complete
+    mock_start_driver.assert_called_once()
+    # The cookie banner is only accepted on the first page
+    assert [call.kwargs["consent"] for call in mock_load_ranking.call_args_list] == [True, False, False]
+    mock_driver.quit.assert_called_once()
+
+    # Without the first page the list of the ranking is partial
+    later_pages = RankingCrawler(MagicMock())
+    assert len(list(later_pages.crawl(2, 3))) == 2
+    assert not later_pages.complete
+
+
+def test_extract_ranking_reads_the_table_in_one_script():
+    mock_driver = MagicMock()
+    mock_driver.execute_script.return_value = [
+        ["REPSOL PETROLEO SA", "https://ranking-empresas.eleconomista.es/REPSOL-PETROLEO.html"],
+        ["MERCADONA SA", "https://ranking-empresas.eleconomista.es/MERCADONA.html"],
+    ]
+
+    companies = extract_ranking(mock_driver)
+
+    assert companies[1] == ("MERCADONA SA", "https://ranking-empresas.eleconomista.es/MERCADONA.html")
+    mock_driver.execute_script.assert_called_once_with(RANKING_SCRIPT)
+    mock_driver.find_element.assert_not_called()
+
+
+def test_extract_ranking_without_table():
+    mock_driver = MagicMock()
+    mock_driver.execute_script.return_value = None
+    assert extract_ranking(mock_driver) == []
+
+
+def test_load_ranking_parses_the_cached_page_source(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    mock_driver = MagicMock(page_source=read_fixture("ranking_page.html"))
+
+    companies = load_ranking(mock_driver, MagicMock(), cache, consent=False)
+
+    assert companies[0] == ("REPSOL PETROLEO SA", "https://ranking-empresas.eleconomista.es/REPSOL-PETROLEO.html")
+    mock_driver.execute_script.assert_not_called()
+    assert cache.get(RANKING_URL).body == read_fixture("ranking_page.html")
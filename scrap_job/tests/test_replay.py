@@ -0,0 +1,85 @@
+import requests
+from scrap_job import scrap
+from scrap_job.benchmark import compare, print_report, run_mode
+from scrap_job.cif_index import is_valid_cif
+from scrap_job.fetchers import HttpFetcher
+from scrap_job.names import clean_company_name
+from scrap_job.parsers import extract_ebitda_text, parse_cif, parse_ranking
+from scrap_job.replay import ReplayServer, ReplaySite, make_cif, replaying
+
+
+def test_make_cif():
+    assert is_valid_cif(make_cif("A", 4610383))
+    assert is_valid_cif(make_cif("B", 1))
+
+
+def test_site_is_parsed_like_the_real_one():
+    site = ReplaySite(companies=5, page_size=3, missing_ebitda=0, missing_cif=0, sau=0)
+
+    status, page, kind = site.respond("/ranking_empresas_nacional.html", {"qPagina": ["2"]})
+    ranking = parse_ranking(page, "http://replay/ranking_empresas_nacional.html")
+    assert (status, kind) == (200, "ranking")
+    assert ranking == [
+        (site.companies[3][0], "http://replay/EMPRESA-00004.html"),
+        (site.companies[4][0], "http://replay/EMPRESA-00005.html"),
+    ]
+
+    name, path, ebitda, cif = site.companies[0]
+    assert extract_ebitda_text(site.respond(path, {})[1]) == f"{ebitda:,} €".replace(",", ".")
+    slug = clean_company_name(name)
+    assert parse_cif(site.respond("/empresa/" + slug, {})[1]) == cif
+    assert site.respond("/empresa/unknown-sa", {})[0] == 404
+
+
+def test_server_injects_latency_and_errors():
+    site = ReplaySite(companies=2)
+
+    with ReplayServer(site, error_rate=1.0) as server:
+        response = requests.get(server.url + "/ranking_empresas_nacional.html", timeout=5)
+
+    assert response.status_code == 503
+    assert server.stats == {"ranking": {"requests": 1, "errors": 1}}
+
+
+def test_replaying_points_the_scraper_at_the_server():
+    site = ReplaySite(companies=3, missing_ebitda=0, missing_cif=0)
+
+    with ReplayServer(site) as server, replaying(server):
+        fetcher = HttpFetcher()
+        assert scrap.ranking_page_url(2) == server.url + "/ranking_empresas_nacional.html?qPagina=2"
+        name = site.companies[0][0]
+        assert scrap.resolve_cif(fetcher, name) == site.companies[0][3]
+        fetcher.close()
+
+    assert scrap.RANKING_URL == "https://ranking-empresas.eleconomista.es/ranking_empresas_nacional.html"
+
+
+def test_run_mode_reports_throughput():
+    site = ReplaySite(companies=12, page_size=5)
+
+    with ReplayServer(site) as server:
+        result = run_mode(server, "http", workers=2, pages=3, memory=False)
+
+    assert result["companies"] == 12
+    assert result["companies_per_second"] > 0
+    assert set(result["stages"]) == {"ranking", "company_pages", "cif_pages", "output"}
+    assert result["peak_memory_mb"] is None
+
+
+def test_compare_flags_throughput_drops():
+    baseline = [{"mode": "http", "workers": 4, "companies_per_second": 100.0}]
+
+    assert compare([{"mode": "http", "workers": 4, "companies_per_second": 90.0}], baseline, 0.2) == []
+    assert compare([{"mode": "http", "workers": 4, "companies_per_second": 70.0}], baseline, 0.2) == [
+        "http x4: 70.0 companies/s, was 100.0"
+    ]
+
+
+def test_print_report_without_throughput(capsys):
+    run = {"mode": "cached", "workers": 1, "companies": 0, "seconds": 0.0, "companies_per_second": None,
+           "stages": {"ranking": 0.0}, "peak_memory_mb": None}
+
+    print_report([run])
+
+    row = capsys.readouterr().out.splitlines()[1]
+    assert row.split()[:6] == ["cached", "1", "0", "0.00", "-", "-"]
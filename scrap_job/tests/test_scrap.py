@@ -0,0 +1,136 @@
+import json
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+from unittest.mock import patch
+from scrap_job import scrap
+from metrics.registry import registry
+from scrap_job.cache import ResponseCache
+from scrap_job.replay import ReplayServer, ReplaySite, replaying
+
+
+def run_main(tmp_path, server, *extra_args):
+    argv = [
+        "--cache-dir", str(tmp_path / "cache"),
+        "--journal", str(tmp_path / "companies.journal.jsonl"),
+        "--output", str(tmp_path / "companies.csv"),
+        "--no-cif-index",
+        "--workers", "4",
+        "--rate", "1000",
+        "--burst", "100",
+        *extra_args,
+    ]
+    with replaying(server):
+        scrap.main(argv)
+
+
+def cache_ranking(tmp_path, server):
+    # The browser is only needed for ranking pages that are not cached
+    with replaying(server):
+        page = server.site.ranking_page(1)
+        ResponseCache(str(tmp_path / "cache")).put(scrap.RANKING_URL, page)
+
+
+@patch("scrap_job.browsers.webdriver.Firefox")
+def test_main_scrapes_the_replayed_sites(mock_firefox, tmp_path):
+    site = ReplaySite(companies=20, page_size=20, missing_ebitda=0.1, missing_cif=0.1, seed=1)
+    expected = {cif for _, _, ebitda, cif in site.companies if ebitda and cif and ebitda > 10_000_000}
+
+    with ReplayServer(site) as server:
+        cache_ranking(tmp_path, server)
+        run_main(tmp_path, server)
+
+    mock_firefox.assert_not_called()
+    df = pd.read_csv(tmp_path / "companies.csv", encoding="utf-8-sig")
+    assert set(df["CIF"]) == expected
+
+
+@patch("scrap_job.browsers.webdriver.Firefox")
+def test_main_survives_a_failing_site(mock_firefox, tmp_path):
+    site = ReplaySite(companies=10, page_size=10)
+
+    with ReplayServer(site, error_rate=1.0) as server:
+        cache_ranking(tmp_path, server)
+        run_main(tmp_path, server)
+
+    mock_firefox.assert_not_called()
+    # Every company is journaled, without EBITDA or CIF
+    assert len((tmp_path / "companies.journal.jsonl").read_text().splitlines()) == 10
+
+
+@patch("scrap_job.browsers.webdriver.Firefox")
+def test_main_offline_replays_the_cache(mock_firefox, tmp_path):
+    site = ReplaySite(companies=10, page_size=10, missing_ebitda=0, missing_cif=0)
+
+    with ReplayServer(site) as server:
+        cache_ranking(tmp_path, server)
+        run_main(tmp_path, server)
+    online = pd.read_csv(tmp_path / "companies.csv", encoding="utf-8-sig")
+
+    # The server is gone, every page comes from the cache
+    run_main(tmp_path, server, "--offline")
+    offline = pd.read_csv(tmp_path / "companies.csv", encoding="utf-8-sig")
+
+    mock_firefox.assert_not_called()
+    pd.testing.assert_frame_equal(online, offline)
+
+
+@patch("scrap_job.browsers.webdriver.Firefox")
+def test_main_writes_the_metrics_report(mock_firefox, tmp_path):
+    site = ReplaySite(companies=10, page_size=10, missing_ebitda=0, missing_cif=0)
+    registry.reset()
+
+    with ReplayServer(site) as server:
+        cache_ranking(tmp_path, server)
+        run_main(tmp_path, server, "--metrics-report", str(tmp_path / "metrics.json"))
+
+    report = json.loads((tmp_path / "metrics.json").read_text())
+    fetches = report["histograms"]["scrap_fetch_seconds"]
+    assert sum(entry["count"] for entry in fetches if entry["labels"]["outcome"] == "downloaded") >= 10
+    companies = {entry["labels"]["outcome"]: entry["value"] for entry in report["counters"]["scrap_companies_total"]}
+    assert companies.get("complete", 0) + companies.get("incomplete", 0) == 10
+
+
+@patch("scrap_job.browsers.webdriver.Firefox")
+def test_main_delta_only_scrapes_new_companies(mock_firefox, tmp_path):
+    site = ReplaySite(companies=10, page_size=10, missing_ebitda=0, missing_cif=0)
+    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+
+    with ReplayServer(site) as server:
+        # The first five companies were scraped yesterday
+        known = {server.url + path: (name, yesterday) for name, path, _, _ in site.companies[:5]}
+        cache_ranking(tmp_path, server)
+        with patch("scrap_job.scrap.load_scraped_companies", return_value=known):
+            run_main(
+                tmp_path, server, "--delta", "--ranking-list", str(tmp_path / "companies.ranking.txt"),
+                "--filtered-list", str(tmp_path / "companies.filtered.csv"),
+            )
+        company_requests = server.stats["company"]["requests"]
+
+    mock_firefox.assert_not_called()
+    assert company_requests == 5
+    df = pd.read_csv(tmp_path / "companies.csv", encoding="utf-8-sig")
+    assert set(df["CIF"]) == {cif for _, _, ebitda, cif in site.companies[5:] if ebitda > 10_000_000}
+    assert len((tmp_path / "companies.ranking.txt").read_text().splitlines()) == 10
+    # Listed for db/load_companies.py --filtered, every company of this site is kept
+    filtered = pd.read_csv(tmp_path / "companies.filtered.csv")
+    assert list(filtered.columns) == ["Nombre de la empresa", "Fuente de la información EBITDA", "below_threshold"]
+    assert filtered.empty
+
+
+@patch("scrap_job.browsers.webdriver.Firefox")
+def test_main_delta_writes_no_ranking_list_after_a_partial_crawl(mock_firefox, tmp_path):
+    site = ReplaySite(companies=10, page_size=10, missing_ebitda=0, missing_cif=0)
+    ranking_list = tmp_path / "companies.ranking.txt"
+    # Left by a previous run, it lacks the companies that entered the ranking since
+    ranking_list.write_text("https://ranking-empresas.eleconomista.es/OLD.html\n")
+
+    with ReplayServer(site) as server:
+        cache_ranking(tmp_path, server)
+        with patch("scrap_job.scrap.load_scraped_companies", return_value={}):
+            run_main(
+                tmp_path, server, "--delta", "--top", "3", "--ranking-list", str(ranking_list),
+                "--filtered-list", str(tmp_path / "companies.filtered.csv"),
+            )
+
+    assert len(pd.read_csv(tmp_path / "companies.csv", encoding="utf-8-sig")) <= 3
+    assert not ranking_list.exists()
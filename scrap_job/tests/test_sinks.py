@@ -0,0 +1,208 @@
+import time
+import inspect
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock, patch
+from db.load_companies import insert_data
+from scrap_job.journal import RunJournal
+from scrap_job.scrap import scrape_pending
+from scrap_job.sinks import SINKS, CsvSink, ParquetSink, PostgresSink, ResultSink, create_sink
+
+RESULTS = [
+    ("MERCADONA SA", "https://ranking-empresas.eleconomista.es/MERCADONA.html", "1.956.941.000 €", "A46103834"),
+    ("SMALL SL", "https://ranking-empresas.eleconomista.es/SMALL.html", "2.000.000 €", "B82508441"),
+    ("SEAT SAU", "https://ranking-empresas.eleconomista.es/SEAT-SAU.html", "1.111.000.000,50 €", "A28049161"),
+    ("NO CIF SA", "https://ranking-empresas.eleconomista.es/NO-CIF.html", "9.000.000 €", None),
+]
+
+
+def test_csv_sink_appends_batches_as_they_fill(tmp_path):
+    path = str(tmp_path / "companies.csv")
+    sink = CsvSink(path, batch_size=2)
+
+    sink.write(RESULTS[0])
+    sink.write(RESULTS[1])
+    # The first batch is already on disk before the run ends
+    assert pd.read_csv(path, encoding="utf-8-sig")["CIF"].tolist() == ["A46103834"]
+
+    sink.write(RESULTS[2])
+    sink.write(RESULTS[3])
+    sink.close()
+
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    assert df["Nombre de la empresa"].tolist() == ["MERCADONA SA", "SEAT SAU"]
+    assert df["EBITDA 2023"].tolist() == [1956941000.0, 1111000000.5]
+    assert df["Fuente de la información CIF"].tolist() == df["Fuente de la información EBITDA"].tolist()
+    assert sink.report["rows"] == 4
+    assert sink.report["kept"] == 2
+
+
+def test_parquet_sink_writes_a_typed_file(tmp_path):
+    path = str(tmp_path / "companies.parquet")
+
+    with ParquetSink(path, batch_size=3) as sink:
+        for result in RESULTS:
+            sink.write(result)
+
+    df = pd.read_parquet(path, dtype_backend="numpy_nullable")
+    assert df["EBITDA 2023"].dtype == "Float64"
+    assert df["CIF"].dtype == "string"
+    assert df["CIF"].tolist() == ["A46103834", "A28049161"]
+
+
+def test_empty_parquet_sink_still_has_the_columns(tmp_path):
+    path = str(tmp_path / "companies.parquet")
+
+    create_sink("parquet", path).close()
+
+    assert pd.read_parquet(path).columns.tolist()[-1] == "EBITDA 2023"
+
+
+def test_file_sink_lists_the_filtered_companies(tmp_path):
+    filtered_path = tmp_path / "companies.filtered.csv"
+    with CsvSink(str(tmp_path / "companies.csv"), batch_size=2, filtered_path=str(filtered_path)) as sink:
+        for result in RESULTS:
+            sink.write(result)
+
+    filtered = pd.read_csv(filtered_path)
+    assert filtered.values.tolist() == [
+        ["SMALL SL", RESULTS[1][1], True],
+        ["NO CIF SA", RESULTS[3][1], False],
+    ]
+    assert len(pd.read_csv(tmp_path / "companies.csv", encoding="utf-8-sig")) == 2
+
+
+def test_create_sink_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        create_sink("xlsx")
+
+
+def test_every_sink_implements_the_result_sink():
+    with pytest.raises(TypeError):
+        ResultSink()
+    for sink_class in SINKS.values():
+        assert issubclass(sink_class, ResultSink)
+        assert not inspect.isabstract(sink_class)
+
+
+@patch("scrap_job.scrap.scrape_company")
+def test_scrape_pending_streams_to_the_sink(mock_scrape_company, tmp_path):
+    mock_scrape_company.side_effect = lambda fetcher, name, url, cif_index: (
+        next(result[2:] for result in RESULTS if result[0] == name)
+    )
+    sink = MagicMock()
+    companies = [result[:2] for result in RESULTS]
+
+    count = scrape_pending(None, companies, RunJournal(str(tmp_path / "run.jsonl")), workers=2, sink=sink)
+
+    assert count == 4
+    assert [call.args[0] for call in sink.write.call_args_list] == RESULTS
+
+
+@patch("db.load_companies.connect_to_database")
+def test_insert_data_reads_parquet(mock_connect, tmp_path):
+    path = str(tmp_path / "companies.parquet")
+    with ParquetSink(path) as sink:
+        sink.write(RESULTS[0])
+    mock_cursor = mock_connect.return_value.cursor.return_value
+
+    insert_data(path)
+
+    params = mock_cursor.execute.call_args[0][1]
+    assert params == (RESULTS[0][0], RESULTS[0][1], RESULTS[0][1], "A46103834", 1956941000.0)
+    assert isinstance(params[4], float)
+
+
+def merged(inserted=0, updated=0):
+    # What db.load_companies.merge_frame() reports for a batch
+    return {"inserted": inserted, "updated": updated, "skipped": 0, "rejected": 0, "duplicates": 0}
+
+
+@patch("scrap_job.sinks.create_table")
+@patch("scrap_job.sinks.connect_to_database")
+@patch("scrap_job.sinks.record_filtered")
+@patch("scrap_job.sinks.merge_frame")
+def test_postgres_sink_writes_full_batches(mock_merge_frame, mock_record_filtered, mock_connect, mock_create_table):
+    mock_merge_frame.side_effect = lambda cur, df, mode: merged(inserted=len(df))
+    mock_record_filtered.side_effect = lambda cur, dropped: (int(dropped["below_threshold"].sum()), 0)
+
+    sink = PostgresSink(batch_size=2, flush_interval=60)
+    for result in RESULTS:
+        sink.write(result)
+    sink.close()
+
+    mock_create_table.assert_called_once()
+    frames = [call.args[1] for call in mock_merge_frame.call_args_list]
+    assert [df["CIF"].tolist() for df in frames] == [["A46103834"], ["A28049161"]]
+    assert all(call.args[2] == "sync" for call in mock_merge_frame.call_args_list)
+    # The companies filtered out are recorded with their batch, for the next delta sync
+    dropped = [call.args[1] for call in mock_record_filtered.call_args_list]
+    assert [df["Nombre de la empresa"].tolist() for df in dropped] == [["SMALL SL"], ["NO CIF SA"]]
+    assert [df["below_threshold"].tolist() for df in dropped] == [[True], [False]]
+    # One connection for the whole run, one transaction per batch
+    mock_connect.assert_called_once()
+    assert mock_connect.return_value.commit.call_count == 2
+    assert sink.report["inserted"] == 2
+    assert sink.report["deleted"] == 1
+    assert sink.report["failed"] == 0
+
+
+@patch("scrap_job.sinks.create_table")
+@patch("scrap_job.sinks.connect_to_database")
+@patch("scrap_job.sinks.record_filtered")
+@patch("scrap_job.sinks.merge_frame")
+def test_postgres_sink_only_records_filtered_companies_in_sync_mode(
+    mock_merge_frame, mock_record_filtered, mock_connect, mock_create_table
+):
+    mock_merge_frame.return_value = merged(inserted=1)
+
+    sink = PostgresSink(batch_size=1, flush_interval=60, mode="skip")
+    sink.write(RESULTS[0])
+    sink.write(RESULTS[1])
+    sink.close()
+
+    mock_record_filtered.assert_not_called()
+    # The filtered company alone is not a batch
+    assert mock_connect.return_value.commit.call_count == 1
+
+
+@patch("scrap_job.sinks.create_table")
+@patch("scrap_job.sinks.connect_to_database")
+@patch("scrap_job.sinks.merge_frame")
+def test_postgres_sink_flushes_on_time(mock_merge_frame, mock_connect, mock_create_table):
+    mock_merge_frame.return_value = merged(inserted=1)
+
+    sink = PostgresSink(batch_size=100, flush_interval=0.05)
+    sink.write(RESULTS[0])
+    deadline = time.monotonic() + 5
+    while not mock_merge_frame.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # The batch is far from full, it went to the database anyway
+    assert mock_merge_frame.called
+    sink.close()
+    assert mock_merge_frame.call_count == 1
+
+
+@patch("scrap_job.sinks.create_table")
+@patch("scrap_job.sinks.connect_to_database")
+@patch("scrap_job.sinks.merge_frame")
+def test_postgres_sink_retries_failed_batches(mock_merge_frame, mock_connect, mock_create_table):
+    mock_merge_frame.side_effect = [Exception("connection lost"), merged(inserted=1), Exception("a"), Exception("b")]
+
+    sink = PostgresSink(batch_size=1, flush_interval=60, retries=1, backoff=0)
+    sink.write(RESULTS[0])
+    sink.write(RESULTS[2])
+    sink.close()
+
+    # The first batch made it on its retry, on a new connection; the second one gave up
+    assert mock_merge_frame.call_count == 4
+    assert mock_connect.call_count == 3
+    assert sink.report["inserted"] == 1
+    assert sink.report["failed"] == 1
+
+
+@patch("scrap_job.sinks.create_table")
+def test_postgres_sink_rejects_unknown_modes(mock_create_table):
+    with pytest.raises(ValueError):
+        create_sink("postgres", mode="merge")
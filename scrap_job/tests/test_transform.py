@@ -0,0 +1,121 @@
+import time
+import numpy as np
+import pandas as pd
+from scrap_job.cif_index import is_valid_cif
+from scrap_job.parsers import clean_ebitda_value
+from scrap_job.transform import (
+    COLUMNS,
+    corrupted_ebitda_mask,
+    normalize_cifs,
+    parse_spanish_currency,
+    split_results,
+    transform_results,
+    valid_cif_mask,
+)
+
+
+def results_frame(rows):
+    df = pd.DataFrame(rows, columns=["Nombre de la empresa", "EBITDA 2023", "CIF"])
+    df["Fuente de la información EBITDA"] = "https://ranking-empresas.eleconomista.es/X.html"
+    df["Fuente de la información CIF"] = df["Fuente de la información EBITDA"]
+    return df[COLUMNS]
+
+
+def test_parse_spanish_currency():
+    parsed = parse_spanish_currency(["1.956.941.000 €", "-12.500,75 €", "N/A", None, 3000000.0])
+
+    assert parsed.dtype == "Float64"
+    assert parsed.tolist()[:2] == [1956941000.0, -12500.75]
+    assert parsed.isna().tolist() == [False, False, True, True, False]
+    assert parsed[4] == 3000000.0
+
+
+def test_clean_ebitda_value_uses_the_comma_as_decimal_separator():
+    assert clean_ebitda_value("1.956.941.000 €") == 1956941000.0
+    assert clean_ebitda_value("12.500,75 €") == 12500.75
+
+
+def test_normalize_cifs():
+    cifs = normalize_cifs([" a-46.103.834 ", "N/A", "", None])
+
+    assert cifs[0] == "A46103834"
+    assert cifs[1:].isna().all()
+
+
+def test_valid_cif_mask_matches_is_valid_cif():
+    cifs = ["A46103834", "B82508441", "A46103835", "P2807900B", "P28079002", "X1234567", pd.NA]
+
+    mask = valid_cif_mask(normalize_cifs(cifs))
+
+    assert mask.tolist() == [is_valid_cif(cif if cif is not pd.NA else None) for cif in cifs]
+
+
+def test_corrupted_ebitda_mask():
+    ebitda = pd.Series([214748364772.0, 2147483647.0, 21474836470000.0, 2147483646.0, 1956941000.0, None])
+
+    assert corrupted_ebitda_mask(ebitda).tolist() == [True, True, True, False, False, False]
+
+
+def test_transform_results():
+    df = results_frame([
+        ("MERCADONA SA", "1.956.941.000 €", "A46103834"),
+        ("SMALL SL", "2.000.000 €", "B82508441"),
+        ("BROKEN SA", "214.748.364.772 €", "B82508441"),
+        ("NO EBITDA SA", None, "A46103834"),
+        ("BAD CIF SA", "9.000.000 €", "A46103835"),
+        ("NO CIF SA", "9.000.000 €", None),
+    ])
+
+    clean, report = transform_results(df)
+
+    assert clean["Nombre de la empresa"].tolist() == ["MERCADONA SA"]
+    assert clean["EBITDA 2023"].dtype == "Float64"
+    assert report == {
+        "rows": 6,
+        "corrupted_ebitda": 1,
+        "missing_ebitda": 1,
+        "invalid_cif": 2,
+        "below_threshold": 1,
+        "kept": 1,
+    }
+
+
+def test_split_results_keeps_the_dropped_companies():
+    df = results_frame([
+        ("MERCADONA SA", "1.956.941.000 €", "A46103834"),
+        ("SMALL SL", "2.000.000 €", "B82508441"),
+        ("NO EBITDA SA", None, "A46103834"),
+        ("NO CIF SA", "9.000.000 €", None),
+        ("SMALL WITHOUT CIF SL", "1.000.000 €", None),
+    ])
+
+    clean, dropped, report = split_results(df)
+
+    assert clean["Nombre de la empresa"].tolist() == ["MERCADONA SA"]
+    assert dropped["Nombre de la empresa"].tolist() == ["SMALL SL", "NO EBITDA SA", "NO CIF SA", "SMALL WITHOUT CIF SL"]
+    assert dropped["below_threshold"].tolist() == [True, False, False, True]
+    assert report["kept"] + len(dropped) == report["rows"]
+
+
+def test_transform_results_scales_to_100k_rows():
+    rng = np.random.default_rng(0)
+    size = 100000
+    amounts = rng.integers(0, 10 ** 10, size)
+    df = pd.DataFrame(
+        {
+            "Nombre de la empresa": [f"COMPANY {i} SA" for i in range(size)],
+            "EBITDA 2023": [f"{amount:,} €".replace(",", ".") for amount in amounts],
+            "CIF": np.where(rng.random(size) < 0.5, "A46103834", "A46103835"),
+        }
+    )
+    df["Fuente de la información EBITDA"] = "https://ranking-empresas.eleconomista.es/X.html"
+    df["Fuente de la información CIF"] = df["Fuente de la información EBITDA"]
+
+    start = time.perf_counter()
+    clean, report = transform_results(df)
+    elapsed = time.perf_counter() - start
+
+    assert report["rows"] == size
+    assert report["kept"] == len(clean) > 0
+    assert (clean["EBITDA 2023"] > 3000000).all()
+    assert elapsed < 10
@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import MagicMock
+from scrap_job.waits import AdaptiveWait, document_complete, percentile
+
+
+def test_percentile():
+    values = [0.1, 0.2, 0.3, 0.4, 1.0]
+
+    assert percentile(values, 50) == 0.3
+    assert percentile(values, 95) == 1.0
+    assert percentile([0.5], 95) == 0.5
+
+
+def test_document_complete():
+    mock_driver = MagicMock()
+    mock_driver.execute_script.return_value = "complete"
+    assert document_complete(mock_driver)
+
+    mock_driver.execute_script.return_value = "interactive"
+    assert not document_complete(mock_driver)
+
+
+def test_until_returns_as_soon_as_condition_is_met():
+    waits = AdaptiveWait(default_timeout=5)
+    element = MagicMock()
+
+    result = waits.until(MagicMock(), "ranking", condition=lambda driver: element)
+
+    assert result is element
+    report = waits.report()
+    assert report["ranking"]["waits"] == 1
+    assert report["ranking"]["timeouts"] == 0
+    assert report["total_wait_seconds"] < 1
+
+
+def test_until_returns_none_on_timeout():
+    waits = AdaptiveWait(default_timeout=0.2, poll_frequency=0.05)
+
+    result = waits.until(MagicMock(), "cif", condition=lambda driver: False)
+
+    assert result is None
+    report = waits.report()
+    assert report["cif"]["timeouts"] == 1
+    assert report["total_wait_seconds"] >= 0.2
+
+
+def test_timeout_is_learned_from_observed_loads():
+    waits = AdaptiveWait(default_timeout=10, min_timeout=0.5, max_timeout=30, percent=95, factor=2, min_samples=5)
+
+    for elapsed in [0.2, 0.3, 0.3, 0.4, 0.6]:
+        waits.record("ebitda", elapsed)
+
+    assert waits.timeout_for("ebitda") == pytest.approx(1.2)
+    assert waits.timeout_for("cif") == 10
+
+
+def test_learned_timeout_is_clamped():
+    waits = AdaptiveWait(min_timeout=2, max_timeout=30, min_samples=1)
+
+    waits.record("ebitda", 0.01)
+    assert waits.timeout_for("ebitda") == 2
+
+    waits = AdaptiveWait(min_timeout=2, max_timeout=30, min_samples=1)
+    waits.record("ebitda", 60)
+    assert waits.timeout_for("ebitda") == 30
+
+
+def test_timeouts_do_not_teach_the_timeout():
+    waits = AdaptiveWait(default_timeout=10, min_samples=1)
+
+    waits.record("ebitda", 10, timed_out=True)
+
+    assert waits.timeout_for("ebitda") == 10
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+
+
+EBITDA_THRESHOLD = 3000000
+INT32_MAX = 2147483647
+
+COLUMNS = [
+    "Nombre de la empresa",
+    "Fuente de la información EBITDA",
+    "Fuente de la información CIF",
+    "CIF",
+    "EBITDA 2023",
+]
+
+# CIF characters as ASCII codes, so that checksums are computed on a uint8 matrix
+CIF_CONTROL_LETTERS = np.frombuffer(b"JABCDEFGHI", dtype=np.uint8)
+CIF_LETTER_CONTROL = np.frombuffer(b"NPQRSW", dtype=np.uint8)
+CIF_DIGIT_CONTROL = np.frombuffer(b"ABEH", dtype=np.uint8)
+
+
+def parse_spanish_currency(values):
+    """
+    Parses amounts written the Spanish way ('1.956.941.000,50 €') into numbers, for a whole
+    column at once. Values that are already numbers are kept, anything else ('N/A', '-', None)
+    becomes <NA>.
+
+    Input:
+        values (pd.Series | list): The raw amounts.
+
+    Output:
+        pd.Series: The amounts as nullable Float64.
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("Float64")
+
+    series = series.astype("object")
+    if pd.api.types.infer_dtype(series, skipna=True) not in ("string", "mixed", "mixed-integer"):
+        return pd.to_numeric(series, errors="coerce").astype("Float64")
+
+    # .str only applies to the str elements, numbers give NaN
+    is_text = series.str.len().notna()
+
+    text = series.where(is_text).astype("string")
+    text = (
+        text.str.replace(r"[€\s]", "", regex=True)
+        .str.replace(".", "", regex=False)
+        .str.replace(",", ".", regex=False)
+    )
+    parsed = pd.to_numeric(text, errors="coerce")
+    numbers = pd.to_numeric(series.where(~is_text), errors="coerce")
+
+    return parsed.fillna(numbers).astype("Float64")
+
+
+def normalize_cifs(values):
+    """
+    Uppercases CIFs and removes spaces, dots and dashes for a whole column. Empty values and the
+    'N/A' placeholder become <NA>.
+
+    Input:
+        values (pd.Series | list): The raw CIFs.
+
+    Output:
+        pd.Series: The CIFs as nullable string.
+    """
+    cifs = pd.Series(values, dtype="object").astype("string")
+    cifs = cifs.str.upper().str.replace(r"[\s.\-]", "", regex=True)
+    return cifs.mask(cifs.isin(["", "N/A", "NA", "NAN", "NONE"]))
+
+
+def valid_cif_mask(cifs):
+    """
+    Vectorized version of scrap_job.cif_index.is_valid_cif: checks the format and the control
+    character of every CIF of a column.
+
+    Input:
+        cifs (pd.Series): CIFs normalized with normalize_cifs().
+
+    Output:
+        pd.Series: Boolean mask, True where the CIF is valid.
+    """
+    cifs = pd.Series(cifs, dtype="string")
+    well_formed = cifs.str.fullmatch(r"[ABCDEFGHJNPQRSUVW]\d{7}[0-9A-J]").fillna(False).astype(bool)
+    valid = pd.Series(False, index=cifs.index)
+    if not well_formed.any():
+        return valid
+
+    # One row of 9 ASCII codes per well-formed CIF
+    codes = np.array(cifs[well_formed].tolist(), dtype="S9").view(np.uint8).reshape(-1, 9)
+    digits = codes[:, 1:8].astype(np.int64) - ord("0")
+
+    # Digits in odd positions (1st, 3rd, 5th, 7th) are doubled and their digits added
+    doubled = digits[:, ::2] * 2
+    total = (doubled // 10 + doubled % 10).sum(axis=1) + digits[:, 1::2].sum(axis=1)
+    control_digit = (10 - total % 10) % 10
+
+    letter = codes[:, 0]
+    control = codes[:, 8]
+    matches_digit = control == control_digit + ord("0")
+    matches_letter = control == CIF_CONTROL_LETTERS[control_digit]
+
+    letter_only = np.isin(letter, CIF_LETTER_CONTROL)
+    digit_only = np.isin(letter, CIF_DIGIT_CONTROL)
+    ok = np.where(letter_only, matches_letter, np.where(digit_only, matches_digit, matches_digit | matches_letter))
+
+    valid[well_formed] = ok
+    return valid
+
+
+def corrupted_ebitda_mask(ebitda):
+    """
+    Flags EBITDA values that are int32-overflow artifacts of the source website: the digits start
+    with 2147483647 (the largest 32-bit integer), e.g. 214748364772.0.
+
+    Input:
+        ebitda (pd.Series): EBITDA values as numbers.
+
+    Output:
+        pd.Series: Boolean mask, True where the value is corrupted.
+    """
+    values = pd.Series(ebitda).astype("Float64").abs().to_numpy(dtype=float, na_value=np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        digit_count = np.floor(np.log10(values)) + 1
+        leading = np.floor(values / 10 ** (digit_count - 10))
+
+    corrupted = (digit_count >= 10) & (leading == INT32_MAX)
+    return pd.Series(corrupted, index=pd.Series(ebitda).index)
+
+
+def split_results(df, threshold=EBITDA_THRESHOLD):
+    """
+    Turns the raw scraped columns into the typed, filtered output, with vectorized operations only,
+    and keeps apart the companies that are filtered out.
+
+    EBITDA texts are parsed as Spanish amounts, CIFs are normalized and validated, int32-overflow
+    EBITDA values are discarded, and only companies with a valid CIF and an EBITDA above the
+    threshold are kept.
+
+    Input:
+        df (pd.DataFrame): Raw results with the COLUMNS columns.
+        threshold (float): Minimum EBITDA to keep a company.
+
+    Output:
+        tuple[pd.DataFrame, pd.DataFrame, dict]: The clean DataFrame (nullable dtypes); the name
+                                                 and URL of the companies dropped, with
+                                                 'below_threshold' set when their EBITDA is
+                                                 known and not above the threshold; and counts
+                                                 of the rows dropped at each step.
+    """
+    df = df[COLUMNS].copy()
+    for column in ("Nombre de la empresa", "Fuente de la información EBITDA", "Fuente de la información CIF"):
+        df[column] = df[column].astype("string")
+    df["EBITDA 2023"] = parse_spanish_currency(df["EBITDA 2023"])
+    df["CIF"] = normalize_cifs(df["CIF"])
+
+    corrupted = corrupted_ebitda_mask(df["EBITDA 2023"])
+    df.loc[corrupted, "EBITDA 2023"] = pd.NA
+
+    valid_cif = valid_cif_mask(df["CIF"])
+    above_threshold = (df["EBITDA 2023"] > threshold).fillna(False).astype(bool)
+    below_threshold = df["EBITDA 2023"].notna() & ~above_threshold
+
+    report = {
+        "rows": len(df),
+        "corrupted_ebitda": int(corrupted.sum()),
+        "missing_ebitda": int(df["EBITDA 2023"].isna().sum() - corrupted.sum()),
+        "invalid_cif": int((~valid_cif).sum()),
+        "below_threshold": int(below_threshold.sum()),
+    }
+
+    kept = valid_cif & above_threshold
+    dropped = df.loc[~kept, ["Nombre de la empresa", "Fuente de la información EBITDA"]].assign(
+        below_threshold=below_threshold[~kept].astype(bool)
+    ).reset_index(drop=True)
+    df = df[kept].reset_index(drop=True)
+    report["kept"] = len(df)
+    return df, dropped, report
+
+
+def transform_results(df, threshold=EBITDA_THRESHOLD):
+    """
+    Same as split_results(), for callers that only need the companies that are kept.
+
+    Output:
+        tuple[pd.DataFrame, dict]: The clean DataFrame and counts of the rows dropped at each step.
+    """
+    df, _, report = split_results(df, threshold)
+    return df, report
@@ -0,0 +1,158 @@
+import time
+import math
+import threading
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from metrics.registry import histogram
+
+
+PAGE_WAIT_SECONDS = histogram(
+    "scrap_page_wait_seconds", "Time waited for a page to be ready in the browser.", ("kind", "outcome")
+)
+
+
+def document_complete(driver):
+    """
+    Readiness condition met once the browser has finished loading the document. For the static
+    detail pages this is the definitive "not found" marker: if the field is still missing, it
+    will not appear.
+    """
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+READY_CONDITIONS = {
+    "ranking": EC.presence_of_element_located((By.ID, "tabla-ranking")),
+    "consent": EC.element_to_be_clickable((By.ID, "didomi-notice-agree-button")),
+    "consent_closed": EC.invisibility_of_element_located((By.ID, "didomi-notice")),
+    "ebitda": EC.any_of(
+        EC.presence_of_element_located((By.XPATH, "//td[contains(text(), 'Ebitda 2023')]")),
+        document_complete,
+    ),
+    "cif": EC.any_of(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "span[itemprop='taxID']")),
+        document_complete,
+    ),
+}
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    Input:
+        values (list[float]): The observed values.
+        percent (float): The percentile to compute, between 0 and 100.
+
+    Output:
+        float: The percentile value.
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class AdaptiveWait:
+    """
+    Waits for concrete readiness conditions instead of sleeping a fixed time.
+
+    The timeout of every page kind starts at default_timeout and, once min_samples loads
+    have been observed, becomes factor times the observed percentile, clamped between
+    min_timeout and max_timeout. Every wait is recorded, so the run can report how much
+    wall time was spent waiting.
+    """
+
+    def __init__(self, default_timeout=10, min_timeout=2, max_timeout=30, percent=95, factor=2,
+                 min_samples=5, poll_frequency=0.1):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.percent = percent
+        self.factor = factor
+        self.min_samples = min_samples
+        self.poll_frequency = poll_frequency
+        self.samples = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def timeout_for(self, kind):
+        """
+        Input:
+            kind (str): The page kind, a key of READY_CONDITIONS.
+
+        Output:
+            float: Seconds to wait for that kind of page before giving up.
+        """
+        with self.lock:
+            samples = list(self.samples.get(kind, []))
+
+        if len(samples) < self.min_samples:
+            return self.default_timeout
+
+        learned = percentile(samples, self.percent) * self.factor
+        return min(max(learned, self.min_timeout), self.max_timeout)
+
+    def until(self, driver, kind, condition=None):
+        """
+        Blocks until the readiness condition of a page kind is met or its timeout expires.
+
+        Input:
+            driver (WebDriver): The running browser.
+            kind (str): The page kind, a key of READY_CONDITIONS.
+            condition (callable | None): Overrides the condition registered for the kind.
+
+        Output:
+            The value returned by the condition, or None if the timeout expired.
+        """
+        condition = condition or READY_CONDITIONS[kind]
+        timeout = self.timeout_for(kind)
+        start = time.perf_counter()
+        try:
+            result = WebDriverWait(driver, timeout, poll_frequency=self.poll_frequency).until(condition)
+            self.record(kind, time.perf_counter() - start)
+            return result
+        except TimeoutException:
+            print(f"Timed out after {timeout:.1f}s waiting for {kind} page.")
+            self.record(kind, time.perf_counter() - start, timed_out=True)
+            return None
+
+    def record(self, kind, elapsed, timed_out=False):
+        PAGE_WAIT_SECONDS.observe(elapsed, kind=kind, outcome="timeout" if timed_out else "ready")
+        with self.lock:
+            self.samples.setdefault(kind, [])
+            stats = self.stats.setdefault(kind, {"waits": 0, "timeouts": 0, "total": 0.0})
+            stats["waits"] += 1
+            stats["total"] += elapsed
+            if timed_out:
+                stats["timeouts"] += 1
+            else:
+                # Only successful loads teach the timeout, otherwise timeouts would feed themselves
+                self.samples[kind].append(elapsed)
+
+    def report(self):
+        """
+        Summarises the waits of the run.
+
+        Input:
+            None
+
+        Output:
+            dict: Per page kind the number of waits, timeouts, total and percentile seconds,
+                  plus the overall 'total_wait_seconds'.
+        """
+        with self.lock:
+            report = {}
+            for kind, stats in self.stats.items():
+                samples = self.samples.get(kind) or [0.0]
+                report[kind] = {
+                    "waits": stats["waits"],
+                    "timeouts": stats["timeouts"],
+                    "total_seconds": round(stats["total"], 3),
+                    "p50_seconds": round(percentile(samples, 50), 3),
+                    f"p{self.percent}_seconds": round(percentile(samples, self.percent), 3),
+                }
+            total = sum(kind_stats["total"] for kind_stats in self.stats.values())
+
+        report["total_wait_seconds"] = round(total, 3)
+        return report
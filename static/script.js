@@ -1,10 +1,39 @@
-// Fetch all companies and display them
+const PAGE_SIZE = 50;
+
+// Cursor of the next page, null when every company has been shown
+let nextCursor = null;
+
+// Build the query string of the companies list from the filter form
+function companiesQuery(cursor) {
+    const params = new URLSearchParams({
+        limit: PAGE_SIZE,
+        sort: document.getElementById("filter-sort").value
+    });
+    const namePrefix = document.getElementById("filter-name").value.trim();
+    const ebitdaMin = document.getElementById("filter-ebitda-min").value;
+    if (namePrefix) params.set("name_prefix", namePrefix);
+    if (ebitdaMin) params.set("ebitda_min", ebitdaMin);
+    if (cursor) params.set("cursor", cursor);
+    return params.toString();
+}
+
+// Fetch the first page of companies and display it
 async function fetchCompanies() {
-    const response = await fetch("http://127.0.0.1:8000/companies/");
+    document.getElementById("companies-list").innerHTML = ""; // Clear the list
+    await fetchCompaniesPage(null);
+
+    // Show the companies card and "Hide Companies" button
+    document.getElementById("companies-card").style.display = "block";
+    document.getElementById("hide-companies-button").style.display = "inline-block";
+    document.getElementById("fetch-companies-button").style.display = "none";
+}
+
+// Fetch one page of companies and append it to the list
+async function fetchCompaniesPage(cursor) {
+    const response = await fetch(`http://127.0.0.1:8000/companies/?${companiesQuery(cursor)}`);
     const companies = await response.json();
     const companiesList = document.getElementById("companies-list");
 
-    companiesList.innerHTML = ""; // Clear the list
     companies.forEach(company => {
         const li = document.createElement("li");
         li.className = "list-group-item";
@@ -14,19 +43,15 @@ async function fetchCompanies() {
         const deleteButton = document.createElement("button");
         deleteButton.textContent = "Delete";
         deleteButton.classList.add("delete-button");
-        deleteButton.addEventListener("click", async () => {
-            await deleteCompany(company.cif);
-            fetchCompanies(); // Refresh the list
-        });
+        // deleteCompany() refreshes the list once the company is deleted
+        deleteButton.addEventListener("click", () => deleteCompany(company.cif));
 
         li.appendChild(deleteButton);
         companiesList.appendChild(li);
     });
 
-    // Show the companies card and "Hide Companies" button
-    document.getElementById("companies-card").style.display = "block";
-    document.getElementById("hide-companies-button").style.display = "inline-block";
-    document.getElementById("fetch-companies-button").style.display = "none";
+    nextCursor = response.headers.get("X-Next-Cursor");
+    document.getElementById("load-more-button").style.display = nextCursor ? "inline-block" : "none";
 }
 
 // Hide the companies list
@@ -92,6 +117,28 @@ document.getElementById("search-company-form").addEventListener("submit", async
     }
 });
 
+// Search for companies by name (prefix, accent-insensitive and fuzzy matches)
+document.getElementById("search-name-form").addEventListener("submit", async (event) => {
+    event.preventDefault();
+
+    const name = document.getElementById("search-name").value;
+    const response = await fetch(`http://127.0.0.1:8000/companies/search?${new URLSearchParams({ q: name })}`);
+    const results = document.getElementById("search-name-results");
+
+    if (!response.ok) {
+        results.innerHTML = "<li class=\"list-group-item\">Search failed.</li>";
+        return;
+    }
+
+    const companies = await response.json();
+    results.innerHTML = companies.length
+        ? companies.map(company => `
+            <li class="list-group-item">
+                <strong>${company.company_name}</strong> (${company.cif}) - EBITDA 2023: ${company.ebitda_2023}
+            </li>`).join("")
+        : "<li class=\"list-group-item\">No companies found.</li>";
+});
+
 // Delete a company by CIF
 async function deleteCompany(cif) {
     // Ask for confirmation
@@ -110,8 +157,17 @@ async function deleteCompany(cif) {
     }
 }
 
-// Show companies when the "Show All Companies" button is clicked
+// Show companies when the "Show Companies" button is clicked
 document.getElementById("fetch-companies-button").addEventListener("click", fetchCompanies);
 
 // Hide companies when the "Hide Companies" button is clicked
-document.getElementById("hide-companies-button").addEventListener("click", hideCompanies);
\ No newline at end of file
+document.getElementById("hide-companies-button").addEventListener("click", hideCompanies);
+
+// Load the next page when the "Load More" button is clicked
+document.getElementById("load-more-button").addEventListener("click", () => fetchCompaniesPage(nextCursor));
+
+// Apply the filters and sort order from the first page
+document.getElementById("filter-companies-form").addEventListener("submit", (event) => {
+    event.preventDefault();
+    fetchCompanies();
+});
\ No newline at end of file